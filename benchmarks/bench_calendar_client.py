@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark the discovery-based and REST Calendar clients
+
+Each client runs in a fresh interpreter against the local Google stub and
+reports cold-start time (imports + first events.list), peak RSS and
+per-call latency of warm events.list calls.
+
+Usage:
+    python benchmarks/bench_calendar_client.py --calls 100 --events 50
+"""
+
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda')
+
+CLIENTS = ('discovery', 'rest')
+
+
+def stub_credentials(base_url, client_id='stub-client'):
+    """
+    Base64 credentials with a long-lived access token, so neither client refreshes
+    """
+    creds = {
+        'token': 'stub-access-token',
+        'expiry': (datetime.now(timezone.utc) + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'refresh_token': 'stub-refresh-token',
+        'token_uri': f"{base_url}/token",
+        'client_id': client_id,
+        'client_secret': 'stub-secret'
+    }
+    return base64.b64encode(json.dumps(creds).encode()).decode()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def run_worker(calls):
+    """
+    Measure one client inside this (fresh) process and print the results as JSON
+    """
+    started = time.perf_counter()
+    sys.path.insert(0, LAMBDA_DIR)
+    import lambda_function
+
+    notifier = lambda_function.LambdaScheduleNotifier(store={}, backends=[])
+    service = notifier.get_google_calendar_service()
+    list(notifier.iter_calendar_events(service))
+    cold_start = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(calls):
+        call_started = time.perf_counter()
+        list(notifier.iter_calendar_events(service))
+        latencies.append(time.perf_counter() - call_started)
+
+    print(json.dumps({
+        'cold_start_ms': round(cold_start * 1000, 1),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the discovery and REST Calendar clients')
+    parser.add_argument('--calls', type=int, default=50, help='warm events.list calls per client')
+    parser.add_argument('--events', type=int, default=20, help='events per calendar in the stub')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.calls)
+        return
+
+    from stubs import GoogleStubServer
+
+    server = GoogleStubServer(events_per_calendar=args.events).start()
+
+    print(f"📊 Calendar client benchmark ({args.calls} calls, {args.events} events per call)")
+    print(f"{'client':<10} {'cold start':>12} {'peak RSS':>10} {'p50':>9} {'p95':>9}")
+
+    for client in CLIENTS:
+        env = dict(os.environ,
+                   CALENDAR_CLIENT=client,
+                   CALENDAR_API_URL=f"{server.base_url}/calendar/v3",
+                   GOOGLE_CALENDAR_CREDENTIALS=stub_credentials(server.base_url))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', '--calls', str(args.calls)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+
+        print(f"{client:<10} {result['cold_start_ms']:>9} ms {result['peak_rss_mb']:>7} MB "
+              f"{result['p50_ms']:>6} ms {result['p95_ms']:>6} ms")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
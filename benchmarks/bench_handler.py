@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark lambda_handler end to end against local Google and Pushover stubs
+
+Each scenario (events per calendar x users) runs in a fresh interpreter and
+reports cold-start time (imports + first invocation), per-invocation latency
+percentiles of warm invocations, peak RSS, fan-out throughput (users served
+per second), how many stub requests one invocation made and the slowest
+phases reported by the handler's instrumentation.
+
+Usage:
+    python benchmarks/bench_handler.py
+    python benchmarks/bench_handler.py --events 10 1000 10000 --users 1 25 --invocations 20
+    python benchmarks/bench_handler.py --latency 0.05 --error-rate 0.05 --client rest
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_calendar_client import LAMBDA_DIR, percentile, stub_credentials
+
+
+def build_tenants(google_url, users, calendars):
+    """
+    TENANTS_CONFIG with `users` tenants, each with its own credentials and `calendars` calendars
+    """
+    return json.dumps([
+        {
+            'id': f"user{index}",
+            'google_credentials': stub_credentials(google_url, client_id=f"stub-client-{index}"),
+            'calendars': [f"calendar{number}@example.com" for number in range(calendars)],
+            'pushover_user': f"stub-user-{index}"
+        }
+        for index in range(users)
+    ])
+
+
+def run_worker(invocations):
+    """
+    Invoke the handler inside this (fresh) process and print the results as JSON
+    """
+    started = time.perf_counter()
+    sys.path.insert(0, LAMBDA_DIR)
+
+    # The handler prints every digest; keep that out of the measurement output
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import lambda_function
+        lambda_function.lambda_handler({}, None)
+        cold_start = time.perf_counter() - started
+
+        latencies = []
+        body = {}
+        for _ in range(invocations):
+            call_started = time.perf_counter()
+            response = lambda_function.lambda_handler({}, None)
+            latencies.append(time.perf_counter() - call_started)
+            body = json.loads(response['body'])
+
+    total = sum(latencies)
+    users = body.get('users_count', 0)
+    print(json.dumps({
+        'cold_start_ms': round(cold_start * 1000, 1),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'users_per_s': round(users * len(latencies) / total, 1) if total else 0.0,
+        'events_count': body.get('events_count', 0),
+        'phases': {phase: stats['total_ms'] for phase, stats in body.get('metrics', {}).get('phases', {}).items()}
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark lambda_handler against local API stubs')
+    parser.add_argument('--events', type=int, nargs='+', default=[10, 1000, 10000],
+                        help='events per calendar (one scenario per value)')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 10],
+                        help='number of users (one scenario per value)')
+    parser.add_argument('--calendars', type=int, default=1, help='calendars per user')
+    parser.add_argument('--invocations', type=int, default=5, help='warm invocations per scenario')
+    parser.add_argument('--latency', type=float, default=0.0, help='stub latency per request (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of stub requests that fail')
+    parser.add_argument('--client', choices=('discovery', 'rest'), default='discovery', help='CALENDAR_CLIENT')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.invocations)
+        return
+
+    from stubs import GoogleStubServer, PushoverStubServer
+
+    pushover = PushoverStubServer(latency=args.latency, error_rate=args.error_rate).start()
+
+    print(f"📊 Handler benchmark ({args.client} client, {args.invocations} warm invocations, "
+          f"{args.latency * 1000:.0f} ms stub latency, {args.error_rate:.0%} errors)")
+    print(f"{'events':>7} {'users':>6} {'cold start':>12} {'p50':>10} {'p95':>10} {'p99':>10} "
+          f"{'peak RSS':>10} {'users/s':>9} {'API calls':>10} {'pushes':>7}  slowest phases")
+
+    for events in args.events:
+        google = GoogleStubServer(events_per_calendar=events, latency=args.latency,
+                                  error_rate=args.error_rate).start()
+
+        for users in args.users:
+            google.reset_counters()
+            pushover.reset_counters()
+
+            with tempfile.TemporaryDirectory() as state_dir:
+                env = dict(os.environ,
+                           CALENDAR_CLIENT=args.client,
+                           CALENDAR_API_URL=f"{google.base_url}/calendar/v3",
+                           TENANTS_CONFIG=build_tenants(google.base_url, users, args.calendars),
+                           PUSHOVER_TOKEN='stub-token',
+                           PUSHOVER_API_URL=pushover.api_url,
+                           NOTIFICATION_BACKENDS='pushover',
+                           STATE_STORE='file',
+                           STATE_DIR=os.path.join(state_dir, 'state'))
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--worker',
+                     '--invocations', str(args.invocations)],
+                    env=env, capture_output=True, text=True, check=True
+                ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+
+            # Requests per invocation (the cold invocation included)
+            runs = args.invocations + 1
+            slowest = sorted(result['phases'].items(), key=lambda item: item[1], reverse=True)[:3]
+            phases = ', '.join(f"{phase} {ms:.0f} ms" for phase, ms in slowest)
+
+            print(f"{events:>7} {users:>6} {result['cold_start_ms']:>9} ms {result['p50_ms']:>7} ms "
+                  f"{result['p95_ms']:>7} ms {result['p99_ms']:>7} ms {result['peak_rss_mb']:>7} MB "
+                  f"{result['users_per_s']:>9} {google.requests / runs:>10.1f} {pushover.requests / runs:>7.1f}  "
+                  f"{phases}")
+
+        google.shutdown()
+
+    pushover.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Local stand-ins for the Google and Pushover APIs used by the Lambda function
+
+Serve on 127.0.0.1 so the function can be benchmarked without network access.
+
+GoogleStubServer:
+
+    POST /token                                    OAuth token refresh
+    GET  /calendar/v3/calendars/<id>/events        events.list (paginated, synthetic events, ETag/304)
+    POST /calendar/v3/calendars/<id>/events/watch  events.watch (push channel registration)
+    POST /calendar/v3/channels/stop                channels.stop
+
+PushoverStubServer:
+
+    POST /1/messages.json                          send a message
+
+Both take a per-request `latency` (seconds) and inject errors: `error_rate`
+is the fraction of requests answered with `error_status`, decided by a
+seeded RNG so runs are repeatable.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Page size Google uses when maxResults is not given
+DEFAULT_PAGE_SIZE = 250
+
+
+def synthetic_events(count, day=None):
+    """
+    Build `count` events spread across one day, in the API's response format
+    """
+    day = day or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    step = timedelta(days=1) / max(count, 1)
+
+    events = []
+    for index in range(count):
+        start = day + step * index
+        events.append({
+            'id': f"event{index}",
+            'status': 'confirmed',
+            'summary': f"Event {index}",
+            'location': f"Room {index % 10}" if index % 3 else '',
+            'description': 'Agenda: ' + 'x' * 200,
+            'start': {'dateTime': start.isoformat()},
+            'end': {'dateTime': (start + timedelta(minutes=30)).isoformat()}
+        })
+
+    return events
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8') if status not in (204, 304) else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def handle_stub_request(self, route):
+        """
+        Apply the server's latency and error injection, then answer with `route()`
+        """
+        error = self.server.begin_request()
+        if error is not None:
+            self.send_json(error, {'error': {'code': error, 'message': 'injected error'}}, {'Retry-After': '0'})
+            return
+
+        status, body, headers = route()
+        self.send_json(status, body, headers)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency=0.0, error_rate=0.0, error_status=503, seed=0):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def begin_request(self):
+        """
+        Count a request, sleep for the configured latency and decide whether it fails
+        """
+        with self._lock:
+            self.requests += 1
+            failed = self.error_rate > 0 and self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        return self.error_status if failed else None
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class GoogleStubHandler(StubHandler):
+    def conditional(self, body):
+        """
+        Answer with the body and its ETag, or 304 when the client already has it (If-None-Match)
+        """
+        etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            with self.server._lock:
+                self.server.not_modified += 1
+            return 304, None, {'ETag': etag}
+        return 200, body, {'ETag': etag}
+
+    def do_POST(self):
+        self.read_body()
+        parts = urlparse(self.path).path.split('/')
+
+        if parts[1:] == ['token']:
+            self.handle_stub_request(lambda: (200, {
+                'access_token': 'stub-access-token', 'expires_in': 3600, 'token_type': 'Bearer'
+            }, None))
+        # /calendar/v3/calendars/<id>/events/watch
+        elif len(parts) == 7 and parts[1:4] == ['calendar', 'v3', 'calendars'] and parts[5:] == ['events', 'watch']:
+            self.handle_stub_request(lambda: (200, self.server.watch(unquote(parts[4])), None))
+        elif parts[1:] == ['calendar', 'v3', 'channels', 'stop']:
+            self.handle_stub_request(lambda: (204, {}, None))
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.split('/')
+
+        # /calendar/v3/calendars/<id>/events
+        if len(parts) == 6 and parts[1:4] == ['calendar', 'v3', 'calendars'] and parts[5] == 'events':
+            self.handle_stub_request(lambda: self.conditional(
+                self.server.list_events(unquote(parts[4]), parse_qs(url.query))
+            ))
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+
+class GoogleStubServer(StubServer):
+    """
+    Calendar API stand-in; every calendar holds the same `events_per_calendar` events
+
+    Pages honour maxResults and pageToken like the real API; the last page
+    carries a nextSyncToken.
+    """
+
+    def __init__(self, events_per_calendar=20, **options):
+        super().__init__(GoogleStubHandler, **options)
+        self.events = synthetic_events(events_per_calendar)
+        self.watches = 0
+        self.not_modified = 0
+
+    def list_events(self, calendar_id, query):
+        page_size = int(query.get('maxResults', [DEFAULT_PAGE_SIZE])[0])
+        offset = int(query.get('pageToken', ['0'])[0])
+
+        response = {'kind': 'calendar#events', 'items': self.events[offset:offset + page_size]}
+        if offset + page_size < len(self.events):
+            response['nextPageToken'] = str(offset + page_size)
+        else:
+            response['nextSyncToken'] = 'stub-sync-token'
+        return response
+
+    def watch(self, calendar_id):
+        with self._lock:
+            self.watches += 1
+
+        expiration = datetime.now(timezone.utc) + timedelta(days=7)
+        return {
+            'kind': 'api#channel',
+            'id': str(uuid.uuid4()),
+            'resourceId': f"resource-{calendar_id}",
+            'resourceUri': f"{self.base_url}/calendar/v3/calendars/{calendar_id}/events",
+            'expiration': str(int(expiration.timestamp() * 1000))
+        }
+
+
+class PushoverStubHandler(StubHandler):
+    def do_POST(self):
+        body = self.read_body()
+
+        if urlparse(self.path).path == '/1/messages.json':
+            self.handle_stub_request(lambda: self.server.message(parse_qs(body.decode('utf-8'))))
+        else:
+            self.send_json(404, {'status': 0, 'errors': ['not found']})
+
+
+class PushoverStubServer(StubServer):
+    """
+    Pushover API stand-in that accepts every message and reports a generous app limit
+    """
+
+    def __init__(self, **options):
+        options.setdefault('error_status', 500)
+        super().__init__(PushoverStubHandler, **options)
+        self.messages = 0
+        self.bytes = 0
+
+    @property
+    def api_url(self):
+        return f"{self.base_url}/1/messages.json"
+
+    def message(self, data):
+        with self._lock:
+            self.messages += 1
+            self.bytes += len(data.get('message', [''])[0].encode('utf-8'))
+
+        headers = {'X-Limit-App-Limit': '10000', 'X-Limit-App-Remaining': '9999', 'X-Limit-App-Reset': '0'}
+        return 200, {'status': 1, 'request': str(uuid.uuid4())}, headers
@@ -0,0 +1,229 @@
+"""
+Notification backends
+
+Every backend implements the same async contract:
+
+    result = await backend.send_many([(recipient, title, message), ...])
+
+and returns the dispatcher's {'results': [...], 'summary': {...}} shape, so
+run() can deliver to several channels at once with asyncio.gather.
+Blocking network work runs in a thread (asyncio.to_thread) so channels
+never wait on each other.
+
+NOTIFICATION_BACKENDS picks the channels (comma separated):
+pushover (default), webhook, smtp, memory.
+
+Backends declare their title and message size limits (max_title,
+max_message; None is unlimited) and notifications are split to fit them
+(see rendering.py). Messages rendered as HTML arrive as rendering.Markup.
+"""
+
+import os
+import time
+
+from dispatcher import NotificationDispatcher, summarize_results
+from http_session import TIMEOUTS, get_session
+from pushover import get_pushover_client
+from rendering import Markup
+
+
+class NotificationBackend:
+    name = 'base'
+    max_title = None
+    max_message = None
+
+    def recipient_for(self, tenant):
+        """
+        Get this backend's address for a tenant (None skips the tenant)
+        """
+        raise NotImplementedError
+
+    async def send_many(self, jobs):
+        """
+        Send (recipient, title, message) jobs and return results with a summary
+        """
+        raise NotImplementedError
+
+
+class PushoverBackend(NotificationBackend):
+    name = 'pushover'
+    max_title = 250
+    max_message = 1024
+
+    def __init__(self, token=None):
+        self.token = token or os.environ.get('PUSHOVER_TOKEN')
+
+    def recipient_for(self, tenant):
+        return tenant.get('pushover_user')
+
+    def send(self, recipient, title, message):
+        if not self.token:
+            print("Pushover credentials not found in environment variables")
+            return False
+        options = {'html': 1} if isinstance(message, Markup) else {}
+        return get_pushover_client(self.token).send(recipient, title, message, **options)
+
+    async def send_many(self, jobs):
+        import asyncio
+
+        dispatcher = NotificationDispatcher(self.send)
+        return await asyncio.to_thread(dispatcher.dispatch, jobs)
+
+
+class WebhookBackend(NotificationBackend):
+    """
+    POST each notification as JSON to a URL (per tenant `webhook_url` or NOTIFY_WEBHOOK_URL)
+    """
+    name = 'webhook'
+
+    def __init__(self, default_url=None, max_concurrency=8):
+        self.default_url = default_url or os.environ.get('NOTIFY_WEBHOOK_URL')
+        self.max_concurrency = max_concurrency
+
+    def recipient_for(self, tenant):
+        return tenant.get('webhook_url') or self.default_url
+
+    def send(self, recipient, title, message):
+        payload = {'title': title, 'message': message, 'html': isinstance(message, Markup)}
+        response = get_session().post(recipient, json=payload, timeout=TIMEOUTS)
+        return 200 <= response.status_code < 300
+
+    async def send_many(self, jobs):
+        import asyncio
+
+        dispatcher = NotificationDispatcher(self.send, max_concurrency=self.max_concurrency)
+        return await asyncio.to_thread(dispatcher.dispatch, jobs)
+
+
+class SmtpBackend(NotificationBackend):
+    """
+    Email notifications through an SMTP server (per tenant `email` or SMTP_TO)
+
+    All messages in a batch share one SMTP connection.
+    """
+    name = 'smtp'
+
+    def __init__(self, host=None, port=None, sender=None, default_to=None):
+        self.host = host or os.environ.get('SMTP_HOST', 'localhost')
+        self.port = int(port or os.environ.get('SMTP_PORT', '25'))
+        self.sender = sender or os.environ.get('SMTP_FROM', 'calendar-notifier@localhost')
+        self.default_to = default_to or os.environ.get('SMTP_TO')
+
+    def recipient_for(self, tenant):
+        return tenant.get('email') or self.default_to
+
+    def send_all(self, jobs):
+        import smtplib
+        from email.message import EmailMessage
+
+        started = time.perf_counter()
+        results = []
+
+        try:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=10)
+        except Exception as e:
+            print(f"Error connecting to SMTP server: {e}")
+            results = [{'recipient': recipient, 'title': title, 'sent': False, 'latency_ms': 0.0, 'error': str(e)}
+                       for recipient, title, _ in jobs]
+            return summarize_results(results, time.perf_counter() - started)
+
+        with smtp:
+            for recipient, title, message in jobs:
+                sent_at = time.perf_counter()
+                email = EmailMessage()
+                email['From'] = self.sender
+                email['To'] = recipient
+                email['Subject'] = title
+                if isinstance(message, Markup):
+                    email.set_content(message.replace('\n', '<br>\n'), subtype='html')
+                else:
+                    email.set_content(message)
+
+                error = None
+                try:
+                    smtp.send_message(email)
+                except Exception as e:
+                    error = str(e)
+
+                results.append({
+                    'recipient': recipient,
+                    'title': title,
+                    'sent': error is None,
+                    'latency_ms': round((time.perf_counter() - sent_at) * 1000, 1),
+                    'error': error
+                })
+
+        return summarize_results(results, time.perf_counter() - started)
+
+    async def send_many(self, jobs):
+        import asyncio
+
+        return await asyncio.to_thread(self.send_all, list(jobs))
+
+
+class MemoryBackend(NotificationBackend):
+    """
+    Keep notifications in memory instead of sending them (tests and local runs)
+    """
+    name = 'memory'
+
+    def __init__(self):
+        self.sent = []
+
+    def recipient_for(self, tenant):
+        return tenant['id']
+
+    async def send_many(self, jobs):
+        results = []
+        for recipient, title, message in jobs:
+            self.sent.append({'recipient': recipient, 'title': title, 'message': message})
+            results.append({'recipient': recipient, 'title': title, 'sent': True, 'latency_ms': 0.0, 'error': None})
+        return summarize_results(results, 0)
+
+
+BACKENDS = {
+    'pushover': PushoverBackend,
+    'webhook': WebhookBackend,
+    'smtp': SmtpBackend,
+    'memory': MemoryBackend
+}
+
+
+def get_backends(names=None):
+    """
+    Create the backends named in NOTIFICATION_BACKENDS (default: pushover)
+    """
+    if names is None:
+        names = os.environ.get('NOTIFICATION_BACKENDS', 'pushover')
+
+    backends = []
+    for name in names.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown notification backend: {name}")
+        backends.append(BACKENDS[name]())
+
+    return backends
+
+
+def deliver(backends, jobs_by_backend):
+    """
+    Run send_many on every backend in parallel and wait for all of them
+
+    `jobs_by_backend` lists the jobs for each backend, in the same order.
+    A backend that raises gets its error in place of a result. asyncio is
+    imported here rather than at module level: it costs tens of milliseconds
+    that invocations which never deliver (dropped webhook pings, runs with
+    nothing due) should not pay.
+    """
+    import asyncio
+
+    async def send_all():
+        return await asyncio.gather(
+            *(backend.send_many(jobs) for backend, jobs in zip(backends, jobs_by_backend)),
+            return_exceptions=True
+        )
+
+    return asyncio.run(send_all())
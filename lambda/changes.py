@@ -0,0 +1,103 @@
+"""
+Change detection between calendar snapshots
+
+A snapshot maps event ID -> a fingerprint of the fields that show up in
+notifications (start time, title, location) plus those fields themselves.
+Comparing two snapshots is a single pass over each dict, and events whose
+fingerprint did not change are skipped without looking at their fields, so
+pings caused by invisible edits (RSVPs, descriptions, colours) produce no
+changes at all.
+"""
+
+import hashlib
+
+VISIBLE_FIELDS = ('start', 'title', 'location')
+
+
+def fingerprint(event):
+    """
+    Hash the visible fields of a formatted event
+    """
+    data = '\x1f'.join(str(event.get(field, '')) for field in VISIBLE_FIELDS)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+def build_snapshot(events):
+    """
+    Index formatted events by ID with their fingerprints
+    """
+    return {
+        event['id']: {
+            'fingerprint': fingerprint(event),
+            'start': event['start'],
+            'time': event['time'],
+            'title': event['title'],
+            'location': event['location']
+        }
+        for event in events
+    }
+
+
+def diff_snapshots(old, new):
+    """
+    Compare two snapshots and group the differences
+
+    Returns a dict with lists of added, removed, moved, renamed and
+    relocated events (an edit can be in more than one group).
+    """
+    changes = {'added': [], 'removed': [], 'moved': [], 'renamed': [], 'relocated': []}
+
+    for event_id, event in new.items():
+        previous = old.get(event_id)
+        if previous is None:
+            changes['added'].append(event)
+            continue
+
+        if previous['fingerprint'] == event['fingerprint']:
+            continue
+
+        if previous['start'] != event['start']:
+            changes['moved'].append((previous, event))
+        if previous['title'] != event['title']:
+            changes['renamed'].append((previous, event))
+        if previous['location'] != event['location']:
+            changes['relocated'].append((previous, event))
+
+    for event_id, event in old.items():
+        if event_id not in new:
+            changes['removed'].append(event)
+
+    return changes
+
+
+def count_changes(changes):
+    return sum(len(group) for group in changes.values())
+
+
+def format_change_message(changes):
+    """
+    Format changes into a compact notification (None when nothing visible changed)
+    """
+    lines = []
+
+    for event in sorted(changes['added'], key=lambda event: event['start']):
+        location_text = f" ({event['location']})" if event['location'] else ""
+        lines.append(f"➕ {event['time']} - {event['title']}{location_text}")
+
+    for event in sorted(changes['removed'], key=lambda event: event['start']):
+        lines.append(f"➖ {event['time']} - {event['title']} (cancelled)")
+
+    for previous, event in changes['moved']:
+        lines.append(f"🕒 {event['title']} moved {previous['time']} → {event['time']}")
+
+    for previous, event in changes['renamed']:
+        lines.append(f"✏️ {event['time']} - {previous['title']} renamed to {event['title']}")
+
+    for previous, event in changes['relocated']:
+        location = event['location'] or 'no location'
+        lines.append(f"📍 {event['time']} - {event['title']} now at {location}")
+
+    if not lines:
+        return None
+
+    return "\n".join(lines) + "\n"
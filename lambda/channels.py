@@ -0,0 +1,260 @@
+"""
+Google Calendar push channel lifecycle
+
+Google push channels (events.watch) expire after at most a few days. The
+ChannelManager keeps one channel per tenant calendar pointing at LAMBDA_WEBHOOK_URL
+and an index of every active channel, across all tenants, ordered by
+expiry and persisted in the state store (channels:index, split into
+bucket documents so thousands of channels never outgrow one DynamoDB
+item). Each sync:
+
+- creates channels for calendars that have none
+- renews channels expiring within CHANNEL_RENEW_AHEAD_HOURS: the new
+  channel is created first, then the superseded one is stopped
+- stops channels of calendars that were removed from a tenant
+
+Only the front of the index (the channels that are due) is looked at, and
+each tenant's watch/stop calls go out in batch requests, with tenants
+handled in parallel. Channels carry the tenant ID as their token, which is
+how webhooks.find_tenant_for_channel routes their pings.
+
+Run it from a schedule with {"action": "renew_channels"}.
+"""
+
+import os
+import uuid
+
+import timesource
+from store import load_buckets, save_buckets
+
+INDEX_KEY = 'channels:index'
+
+# Channel lifetime requested from Google (it may grant less)
+CHANNEL_TTL_DAYS = 6
+
+# Renew channels this long before they expire (longer than the schedule interval)
+RENEW_AHEAD_HOURS = float(os.environ.get('CHANNEL_RENEW_AHEAD_HOURS', '36'))
+
+# Calls per batch request (Google recommends no more than 50)
+CHANNEL_BATCH_SIZE = 50
+
+
+def channel_key(tenant_id, calendar_id):
+    return f"{tenant_id}:{calendar_id}"
+
+
+def execute_requests(service, requests):
+    """
+    Execute requests made with one service, in batch requests when the client supports them
+
+    Returns a (response, error) pair per request, in order.
+    """
+    results = [(None, None)] * len(requests)
+
+    # The REST client has no batch support: send the requests one by one
+    if not hasattr(service, 'new_batch_http_request'):
+        for index, request in enumerate(requests):
+            try:
+                results[index] = (request.execute(), None)
+            except Exception as e:
+                results[index] = (None, e)
+        return results
+
+    def handle_response(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    for offset in range(0, len(requests), CHANNEL_BATCH_SIZE):
+        indexes = range(offset, min(offset + CHANNEL_BATCH_SIZE, len(requests)))
+        batch = service.new_batch_http_request(callback=handle_response)
+        for index in indexes:
+            batch.add(requests[index], request_id=str(index))
+        try:
+            batch.execute()
+        except Exception as e:
+            for index in indexes:
+                results[index] = (None, e)
+
+    return results
+
+
+def load_index(store):
+    """
+    Load the channel index as (channels ordered by expiry, bucket documents as loaded)
+    """
+    head = store.get(INDEX_KEY) or {}
+    if 'channels' in head:
+        # Written before the index was split into buckets
+        channels, buckets = list(head['channels']), []
+    else:
+        buckets = load_buckets(store, INDEX_KEY, head)
+        channels = [channel for bucket in buckets for channel in bucket.values()]
+    channels.sort(key=lambda channel: (channel['expiration'], channel['key']))
+    return channels, buckets
+
+
+def save_index(store, channels, stored_buckets):
+    """
+    Save the channel index, rewriting only the buckets whose channels changed
+    """
+    save_buckets(store, INDEX_KEY, {channel['channel_id']: channel for channel in channels}, {}, stored_buckets)
+
+
+def is_not_found(error):
+    # HttpError (discovery client) and RestCalendarError both carry resp.status
+    return getattr(getattr(error, 'resp', None), 'status', None) == 404
+
+
+class ChannelManager:
+    def __init__(self, store, get_service, executor=None, address=None, clock=timesource.time):
+        self.store = store
+        self.get_service = get_service
+        self.executor = executor
+        self.address = address or os.environ.get('LAMBDA_WEBHOOK_URL')
+        self.clock = clock
+
+    def due_channels(self, channels, now):
+        """
+        Get the channels expiring within the renewal window (a prefix of the ordered index)
+        """
+        horizon = now + RENEW_AHEAD_HOURS * 3600
+        due = []
+        for channel in channels:
+            if channel['expiration'] >= horizon:
+                break
+            due.append(channel)
+        return due
+
+    def watch_request(self, service, tenant, calendar_id, now):
+        body = {
+            'id': f"calendar-{uuid.uuid4()}",
+            'type': 'web_hook',
+            'address': self.address,
+            'token': tenant['id'],
+            'expiration': int((now + CHANNEL_TTL_DAYS * 86400) * 1000)
+        }
+        return service.events().watch(calendarId=calendar_id, body=body)
+
+    def stop_request(self, service, channel):
+        return service.channels().stop(body={'id': channel['channel_id'], 'resourceId': channel['resource_id']})
+
+    def sync_tenant(self, tenant, watch_calendars, stop_channels, now):
+        """
+        Create channels for `watch_calendars`, then stop `stop_channels`, for one tenant
+
+        Channels that are being replaced are only stopped once their replacement
+        exists. Returns (created channels, stopped channels, failures).
+        """
+        service = self.get_service(tenant['google_credentials'])
+        if not service:
+            return [], [], len(watch_calendars)
+
+        created = []
+        failed = 0
+        requests = [self.watch_request(service, tenant, calendar_id, now) for calendar_id in watch_calendars]
+        for calendar_id, (response, error) in zip(watch_calendars, execute_requests(service, requests)):
+            if error is not None:
+                print(f"Error watching {calendar_id} for {tenant['id']}: {error}")
+                failed += 1
+                continue
+
+            created.append({
+                'key': channel_key(tenant['id'], calendar_id),
+                'tenant_id': tenant['id'],
+                'calendar_id': calendar_id,
+                'channel_id': response['id'],
+                'resource_id': response['resourceId'],
+                'address': self.address,
+                'expiration': int(response['expiration']) / 1000
+            })
+
+        # Keep a channel that is being replaced running until its replacement exists
+        replacing = {channel_key(tenant['id'], calendar_id) for calendar_id in watch_calendars}
+        replaced = {channel['key'] for channel in created}
+        stop_channels = [channel for channel in stop_channels
+                         if channel['key'] not in replacing or channel['key'] in replaced]
+
+        stopped = []
+        requests = [self.stop_request(service, channel) for channel in stop_channels]
+        for channel, (_, error) in zip(stop_channels, execute_requests(service, requests)):
+            if error is not None and not is_not_found(error):
+                # It still expires on its own; Google drops its pings once it does
+                print(f"Error stopping channel {channel['channel_id']} for {tenant['id']}: {error}")
+            stopped.append(channel)
+
+        return created, stopped, failed
+
+    def sync(self, tenants):
+        """
+        Bring every tenant's channels up to date and return counts of what changed
+        """
+        if not self.address:
+            print("LAMBDA_WEBHOOK_URL is not set, not managing webhook channels")
+            return {'created': 0, 'renewed': 0, 'stopped': 0, 'dropped': 0, 'failed': 0, 'active': 0}
+
+        now = self.clock()
+        channels, stored_buckets = load_index(self.store)
+        by_key = {channel['key']: channel for channel in channels}
+        tenants_by_id = {tenant['id']: tenant for tenant in tenants}
+
+        # Work out, per tenant, which calendars need a new channel and which channels must go
+        work = {tenant['id']: ([], []) for tenant in tenants}
+        wanted = set()
+        for tenant in tenants:
+            for calendar_id in tenant['calendars']:
+                key = channel_key(tenant['id'], calendar_id)
+                wanted.add(key)
+                channel = by_key.get(key)
+                if channel is None or channel['address'] != self.address:
+                    work[tenant['id']][0].append(calendar_id)
+                    if channel is not None:
+                        work[tenant['id']][1].append(channel)
+
+        for channel in self.due_channels(channels, now):
+            if channel['key'] in wanted and channel['address'] == self.address:
+                work[channel['tenant_id']][0].append(channel['calendar_id'])
+                work[channel['tenant_id']][1].append(channel)
+
+        dropped = []
+        for channel in channels:
+            if channel['key'] in wanted:
+                continue
+            if channel['tenant_id'] in tenants_by_id:
+                work[channel['tenant_id']][1].append(channel)
+            else:
+                # Tenant removed: its credentials are gone, so let the channel expire
+                dropped.append(channel)
+
+        jobs = {tenant_id: job for tenant_id, job in work.items() if job[0] or job[1]}
+        if self.executor is not None:
+            futures = {tenant_id: self.executor.submit(self.sync_tenant, tenants_by_id[tenant_id], *job, now)
+                       for tenant_id, job in jobs.items()}
+            outcomes = {}
+            for tenant_id, future in futures.items():
+                try:
+                    outcomes[tenant_id] = future.result()
+                except Exception as e:
+                    print(f"Error syncing channels for {tenant_id}: {e}")
+                    outcomes[tenant_id] = ([], [], len(jobs[tenant_id][0]))
+        else:
+            outcomes = {tenant_id: self.sync_tenant(tenants_by_id[tenant_id], *job, now)
+                        for tenant_id, job in jobs.items()}
+
+        created = [channel for outcome in outcomes.values() for channel in outcome[0]]
+        stopped = {channel['channel_id'] for outcome in outcomes.values() for channel in outcome[1]}
+        removed = stopped | {channel['channel_id'] for channel in dropped}
+
+        remaining = [channel for channel in channels if channel['channel_id'] not in removed]
+        save_index(self.store, remaining + created, stored_buckets)
+
+        renewed = sum(1 for channel in created if channel['key'] in by_key)
+        summary = {
+            'created': len(created) - renewed,
+            'renewed': renewed,
+            'stopped': len(stopped),
+            'dropped': len(dropped),
+            'failed': sum(outcome[2] for outcome in outcomes.values()),
+            'active': len(remaining) + len(created)
+        }
+        print(f"🔗 Webhook channels: {summary['created']} created, {summary['renewed']} renewed, "
+              f"{summary['stopped']} stopped, {summary['dropped']} dropped, {summary['failed']} failed, {summary['active']} active")
+        return summary
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Cold-start import profiler
+
+Runs `python -X importtime` in a fresh interpreter for each code path of the
+Lambda function and reports where the import time goes, per top-level module.
+
+Usage:
+    python coldstart.py                 # every path
+    python coldstart.py calendar --top 20
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# What each code path imports on a cold start
+COLD_START_PATHS = {
+    'handler': 'import lambda_function',
+    'calendar': (
+        'import lambda_function, google.auth.transport.requests, '
+        'google.oauth2.credentials, googleapiclient.discovery, googleapiclient.errors'
+    ),
+    'delivery': 'import lambda_function, requests, requests.adapters',
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output into [(module, self_us, cumulative_us, depth)]
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+
+    return modules
+
+
+def measure_import_time(statement, python=sys.executable):
+    """
+    Run `statement` in a fresh interpreter and return per-module import timings
+
+    Modules the interpreter loads at startup (site, encodings, ...) are left out.
+    """
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', statement],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = parse_importtime(result.stderr)
+    if statement == 'pass':
+        return modules
+
+    startup = {module[0] for module in measure_import_time('pass', python)}
+    return [module for module in modules if module[0] not in startup]
+
+
+def summarize(modules, top=10):
+    """
+    Total import time, the slowest top-level imports (cumulative) and the
+    slowest individual modules (self time)
+    """
+    top_level = [module for module in modules if module[3] == 0]
+    return {
+        'total_ms': round(sum(module[2] for module in top_level) / 1000, 1),
+        'modules': [
+            {'module': name, 'cumulative_ms': round(cumulative_us / 1000, 1)}
+            for name, _, cumulative_us, _ in sorted(top_level, key=lambda module: -module[2])[:top]
+        ],
+        'self': [
+            {'module': name, 'self_ms': round(self_us / 1000, 1)}
+            for name, self_us, _, _ in sorted(modules, key=lambda module: -module[1])[:top]
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', help=f"code paths to measure ({', '.join(COLD_START_PATHS)})")
+    parser.add_argument('--top', type=int, default=10, help='modules to list per path')
+    args = parser.parse_args()
+
+    unknown = [path for path in args.paths if path not in COLD_START_PATHS]
+    if unknown:
+        parser.error(f"unknown code path: {', '.join(unknown)}")
+
+    for path in args.paths or COLD_START_PATHS:
+        report = summarize(measure_import_time(COLD_START_PATHS[path]), args.top)
+
+        print(f"⏱️  {path}: {report['total_ms']} ms of imports")
+        for module in report['modules']:
+            print(f"   {module['cumulative_ms']:>8} ms  {module['module']}")
+        print("   slowest modules (self time):")
+        for module in report['self']:
+            print(f"   {module['self_ms']:>8} ms  {module['module']}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Bulk notification dispatcher
+
+Sends a batch of (recipient, title, message) jobs concurrently under a
+concurrency limit and a token-bucket rate limit, and reports per-job
+results plus a throughput summary. Used for the 8 AM fan-out, when every
+user's digest is due in the same minute.
+
+Pushover asks clients to keep to two concurrent connections, hence the
+default DISPATCH_CONCURRENCY of 2.
+"""
+
+import os
+import threading
+import time
+
+import instrumentation
+
+DEFAULT_CONCURRENCY = int(os.environ.get('DISPATCH_CONCURRENCY', '2'))
+
+# Messages per second (0 disables rate limiting)
+DEFAULT_RATE = float(os.environ.get('DISPATCH_RATE', '0'))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, blocking until one is available
+        """
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            self.sleep(wait)
+
+
+class NotificationDispatcher:
+    def __init__(self, send, max_concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, burst=None):
+        """
+        `send(recipient, title, message)` delivers one notification and returns True on success
+        """
+        self.send = send
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+
+    def send_job(self, job):
+        recipient, title, message = job
+
+        if self.bucket:
+            self.bucket.acquire()
+
+        started = time.perf_counter()
+        error = None
+        try:
+            sent = bool(self.send(recipient, title, message))
+        except Exception as e:
+            sent = False
+            error = str(e)
+
+        return {
+            'recipient': recipient,
+            'title': title,
+            'sent': sent,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+            'error': error
+        }
+
+    def dispatch(self, jobs):
+        """
+        Send every job and return per-job results (in job order) and a summary
+        """
+        jobs = list(jobs)
+        started = time.perf_counter()
+
+        if jobs:
+            workers = min(self.max_concurrency, len(jobs))
+            with instrumentation.ContextThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self.send_job, jobs))
+        else:
+            results = []
+
+        return summarize_results(results, time.perf_counter() - started)
+
+
+def summarize_results(results, elapsed):
+    """
+    Wrap per-job results with a throughput summary
+    """
+    sent = sum(1 for result in results if result['sent'])
+
+    return {
+        'results': results,
+        'summary': {
+            'jobs': len(results),
+            'sent': sent,
+            'failed': len(results) - sent,
+            'elapsed_s': round(elapsed, 3),
+            'throughput_per_s': round(len(results) / elapsed, 2) if elapsed > 0 else 0.0
+        }
+    }
@@ -0,0 +1,41 @@
+"""
+Shared HTTP session for the Lambda function
+
+One pooled keep-alive requests.Session per container, shared by the
+Pushover client, the webhook backend and the REST Calendar client, so
+warm invocations reuse open TLS connections.
+"""
+
+import os
+import threading
+
+# (connect, read) timeouts in seconds
+TIMEOUTS = (3.05, 10)
+
+# Hosts kept in the pool (Pushover, Calendar API, OAuth token endpoint, webhooks)
+POOL_HOSTS = 4
+
+# Connections kept open per host (matches the notifier's worker pool)
+POOL_SIZE = int(os.environ.get('MAX_WORKERS', '16'))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Get the shared HTTP session (created once per container)
+    """
+    global _session
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+
+    return _session
@@ -0,0 +1,173 @@
+"""
+Per-invocation performance instrumentation
+
+Phases are timed with the monotonic perf_counter clock and counters track
+API calls, pages, retries and bytes. Each Lambda invocation starts a fresh
+Instrumentation (start_invocation) that every module and worker thread
+records into through the module-level timer(), record() and count()
+helpers, so nothing has to be passed around.
+
+The current Instrumentation is a context variable, so invocations running
+side by side in one process (local_server.py runs schedules and webhook
+pings in concurrent threads) each record into their own. Worker pools
+must be ContextThreadPoolExecutor, which runs every task in the context
+of the code that submitted it.
+
+At the end of the invocation the handler prints one JSON line in CloudWatch
+Embedded Metric Format (EMF), which CloudWatch turns into metrics without
+any API calls, and returns the same summary in the response body.
+Phases with several calls (one per Calendar page or Pushover request)
+report every sample, up to EMF's 100 values, so CloudWatch can compute
+per-call percentiles.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'ScheduleNotifier')
+
+# EMF accepts at most 100 values per metric
+MAX_SAMPLES = 100
+
+
+class Instrumentation:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.counters = {}
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        Time a block of code as one sample of `phase`
+        """
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.record(phase, self.clock() - started)
+
+    def record(self, phase, seconds):
+        with self._lock:
+            stats = self.phases.get(phase)
+            if stats is None:
+                stats = self.phases[phase] = {'count': 0, 'total': 0.0, 'max': 0.0, 'samples': []}
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            if len(stats['samples']) < MAX_SAMPLES:
+                stats['samples'].append(seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """
+        Summarise phase timings (milliseconds) and counters
+        """
+        with self._lock:
+            phases = {
+                phase: {
+                    'count': stats['count'],
+                    'total_ms': round(stats['total'] * 1000, 1),
+                    'max_ms': round(stats['max'] * 1000, 1)
+                }
+                for phase, stats in self.phases.items()
+            }
+            counters = dict(self.counters)
+
+        return {
+            'duration_ms': round((self.clock() - self.started) * 1000, 1),
+            'phases': phases,
+            'counters': counters
+        }
+
+    def emf(self, namespace=METRICS_NAMESPACE, dimensions=None, properties=None):
+        """
+        Build the invocation's metrics as a CloudWatch Embedded Metric Format document
+        """
+        dimensions = dimensions or {}
+        summary = self.summary()
+
+        document = dict(properties or {})
+        document.update(dimensions)
+        metrics = [{'Name': 'duration_ms', 'Unit': 'Milliseconds'}]
+        document['duration_ms'] = summary['duration_ms']
+
+        with self._lock:
+            for phase, stats in self.phases.items():
+                name = f"{phase}_ms"
+                samples = [round(sample * 1000, 1) for sample in stats['samples']]
+                metrics.append({'Name': name, 'Unit': 'Milliseconds'})
+                document[name] = samples if len(samples) > 1 else samples[0]
+
+        for name, value in summary['counters'].items():
+            unit = 'Bytes' if name.endswith('bytes') else 'Count'
+            metrics.append({'Name': name, 'Unit': unit})
+            document[name] = value
+
+        document['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace,
+                'Dimensions': [list(dimensions)],
+                'Metrics': metrics
+            }]
+        }
+        return document
+
+
+# Used outside of any invocation (imports, scripts)
+_current = contextvars.ContextVar('instrumentation', default=Instrumentation())
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    Thread pool whose tasks record into the Instrumentation of the code that submitted them
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def start_invocation():
+    """
+    Start recording a new invocation (in the current context) and return its Instrumentation
+    """
+    instrumentation = Instrumentation()
+    _current.set(instrumentation)
+    return instrumentation
+
+
+def current():
+    return _current.get()
+
+
+def timer(phase):
+    return _current.get().timer(phase)
+
+
+def record(phase, seconds):
+    _current.get().record(phase, seconds)
+
+
+def count(name, value=1):
+    _current.get().count(name, value)
+
+
+def emit(properties=None):
+    """
+    Print the current invocation's metrics as one EMF log line and return its summary
+    """
+    dimensions = {'FunctionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')}
+    instrumentation = _current.get()
+    print(json.dumps(instrumentation.emf(dimensions=dimensions, properties=properties)))
+    return instrumentation.summary()
@@ -1,33 +1,221 @@
 import json
 import os
-import boto3
-from datetime import datetime, timedelta
-import requests
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from datetime import datetime, timedelta, timezone
 import base64
+import threading
+from store import get_store, load_buckets, save_buckets
+from tenants import load_tenants
+from token_cache import get_token_cache
+from response_cache import get_response_cache, response_key
+from timezones import format_event_time, local_date, localize_event_start, parse_event_start, parse_iso, rfc3339
+from pushover import get_pushover_client
+from digests import DIGEST_MODE, covers_today, digest_title, digest_window, parse_digest_mode
+from backends import get_backends, deliver
+from changes import build_snapshot, count_changes, diff_snapshots, format_change_message
+from rendering import get_renderer
+from reminders import REMINDER_MINUTES, ReminderScheduler
+from reconciler import desired_schedules, get_schedule_backend, reconcile
+import recurrence
+from webhooks import WebhookDebouncer, find_tenant_for_channel, parse_webhook_event
+from channels import ChannelManager
+import instrumentation
+import timesource
+
+# The Google client libraries are imported inside the methods that use them, so
+# invocations that never reach the Calendar API (webhook pings that get dropped,
+# reminder sends) don't pay for loading them. See coldstart.py to measure.
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 
+# Static copy of the Calendar v3 discovery document, shipped with the function
+DISCOVERY_DOC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calendar_v3_discovery.json')
+
+# Refresh the access token this long before Google reports it as expired
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Event fields requested from the API and kept in the local copy used by incremental sync
+STORED_EVENT_FIELDS = ('id', 'start', 'end', 'summary', 'location')
+
+# With SYNC_MODE=expand recurring masters and their exceptions are kept too (see recurrence.py)
+STORED_MASTER_FIELDS = STORED_EVENT_FIELDS + ('status', 'recurrence', 'recurringEventId', 'originalStartTime')
+
+# Field masks so Google only sends the parts of each event the notifier uses
+EVENT_LIST_FIELDS = 'nextPageToken,items(id,summary,location,start,end)'
+EVENT_SYNC_FIELDS = 'nextPageToken,nextSyncToken,items(id,status,summary,location,start,end)'
+EVENT_MASTER_FIELDS = ('nextPageToken,nextSyncToken,'
+                       'items(id,status,summary,location,start,end,recurrence,recurringEventId,originalStartTime)')
+
+# Events per page (Google allows up to 2500; 250 is the API default)
+EVENTS_PAGE_SIZE = 250
+
+# Calls per batch request (Google recommends no more than 50)
+BATCH_SIZE = 50
+
+# Stored calendar copies are split into buckets of at most this much JSON (DynamoDB items are capped at 400 KB)
+EVENT_BUCKET_BYTES = 256 * 1024
+
+# Worker threads used to fetch calendars and deliver digests concurrently
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '16'))
+
+# Module-level caches, kept alive between warm invocations of the same container.
+# Credentials are shared between threads; built services are not thread-safe,
+# so each worker thread keeps its own.
+_credentials_cache = {}
+_credentials_lock = threading.Lock()
+_thread_clients = threading.local()
+_rest_clients = {}
+_discovery_document = None
+_executor = None
+
+def load_discovery_document():
+    """
+    Load the bundled Calendar discovery document (read from disk once per container)
+    """
+    global _discovery_document
+    
+    if _discovery_document is None:
+        with open(DISCOVERY_DOC_PATH, 'r') as f:
+            _discovery_document = json.load(f)
+    
+    return _discovery_document
+
+def token_needs_refresh(creds):
+    """
+    Check whether the access token is missing, expired or about to expire
+    """
+    if not creds.token or not creds.expiry:
+        return True
+    
+    # google-auth stores expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - now < TOKEN_REFRESH_MARGIN
+
+def count_response_bytes(request):
+    """
+    Count the response bytes of a discovery-client request (the REST client counts its own)
+    """
+    postproc = getattr(request, 'postproc', None)
+    if postproc is not None:
+        def counting_postproc(resp, content):
+            instrumentation.count('calendar_bytes', len(content or b''))
+            return postproc(resp, content)
+        request.postproc = counting_postproc
+    return request
+
+def get_executor():
+    """
+    Get the shared worker pool (its threads, and their clients, survive warm invocations)
+    """
+    global _executor
+    
+    if _executor is None:
+        _executor = instrumentation.ContextThreadPoolExecutor(max_workers=MAX_WORKERS)
+    
+    return _executor
+
 def lambda_handler(event, context):
     """
     AWS Lambda handler function
+    
+    Times every phase of the invocation, logs the timings and counters as one
+    CloudWatch Embedded Metric Format line and adds them to the response body.
+    """
+    instrumentation.start_invocation()
+    response = handle_event(event, context)
+    
+    summary = instrumentation.emit({
+        'action': (event or {}).get('action', 'digest'),
+        'statusCode': response['statusCode'],
+        'requestId': getattr(context, 'aws_request_id', None)
+    })
+    
+    body = json.loads(response['body'])
+    body['metrics'] = summary
+    response['body'] = json.dumps(body)
+    return response
+
+def handle_event(event, context):
+    """
+    Route one invocation: reminder sends, webhook pings or the scheduled digest
     """
     try:
+        tenants = None
+        
+        # Single reminder fired by its own EventBridge schedule (SCHEDULE_BACKEND=eventbridge)
+        if (event or {}).get('action') == 'send_reminder':
+            notifier = LambdaScheduleNotifier()
+            success = notifier.send_reminder(event)
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Reminder sent' if success else 'Reminder not sent',
+                    'timestamp': datetime.now().isoformat()
+                })
+            }
+        
+        # Reminder tick (EventBridge schedule with {"action": "send_reminders"})
+        if (event or {}).get('action') == 'send_reminders':
+            result = LambdaScheduleNotifier().send_due_reminders()
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Reminders sent',
+                    'reminders_count': result['reminders_count'],
+                    'sent_count': result['sent_count'],
+                    'timestamp': datetime.now().isoformat()
+                })
+            }
+        
+        # Push channel renewal (EventBridge schedule with {"action": "renew_channels"})
+        if (event or {}).get('action') == 'renew_channels':
+            result = LambdaScheduleNotifier().renew_channels()
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Webhook channels renewed',
+                    'channels': result,
+                    'timestamp': datetime.now().isoformat()
+                })
+            }
+        
+        # Google Calendar push notification (Function URL request with X-Goog-* headers)
+        notification = parse_webhook_event(event)
+        if notification:
+            print(f"📞 Calendar webhook received: channel {notification['channel_id']} "
+                  f"({notification['resource_state']} #{notification['message_number']})")
+            
+            tenant = find_tenant_for_channel(load_tenants(), notification)
+            if tenant is None:
+                should_sync, reason = False, 'unknown_channel'
+            else:
+                should_sync, reason = WebhookDebouncer(get_store()).should_sync(notification)
+            
+            if not should_sync:
+                print(f"Webhook ignored: {reason}")
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({
+                        'message': 'Webhook ignored',
+                        'reason': reason,
+                        'timestamp': datetime.now().isoformat()
+                    })
+                }
+            
+            tenants = [tenant]
+        
         # Initialize the notifier
         notifier = LambdaScheduleNotifier()
         
         # Get today's events and send notifications
-        result = notifier.run()
+        result = notifier.run(tenants, changes_only=notification is not None, digest=(event or {}).get('digest'))
         
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Schedule notifications sent successfully',
                 'events_count': result.get('events_count', 0),
+                'users_count': len(result.get('users', [])),
                 'timestamp': datetime.now().isoformat()
             })
         }
@@ -43,169 +231,839 @@ def lambda_handler(event, context):
         }
 
 class LambdaScheduleNotifier:
-    def __init__(self):
-        self.today = datetime.now()
+    def __init__(self, store=None, backends=None):
+        self.now = timesource.now()
+        self._windows = {}
+        self.sync_mode = os.environ.get('SYNC_MODE', 'full')
+        if self.sync_mode == 'expand' and not recurrence.is_available():
+            print("SYNC_MODE=expand needs python-dateutil, falling back to incremental sync")
+            self.sync_mode = 'incremental'
+        self.store = store if store is not None else get_store()
+        self.batch_requests = os.environ.get('BATCH_REQUESTS', 'false').lower() == 'true'
+        self.backends = backends if backends is not None else get_backends()
+        self.calendar_client = os.environ.get('CALENDAR_CLIENT', 'discovery')
         
-    def get_google_calendar_service(self):
-        """
-        Get Google Calendar service using credentials from environment variables
+    def get_google_calendar_service(self, creds_data=None):
         """
-        creds = None
+        Get Google Calendar service using base64 credentials (defaults to the environment)
         
+        Credentials and built services are cached at module level, so warm
+        invocations reuse them until the access token is close to expiry.
+        """
         # Get credentials from environment variable (base64 encoded)
-        creds_data = os.environ.get('GOOGLE_CALENDAR_CREDENTIALS')
-        if creds_data:
-            try:
-                # Decode base64 credentials
-                creds_json = base64.b64decode(creds_data).decode('utf-8')
-                creds_dict = json.loads(creds_json)
-                
-                creds = Credentials.from_authorized_user_info(creds_dict, SCOPES)
-                
-                # If there are no (valid) credentials available, return None
-                if not creds or not creds.valid:
-                    if creds and creds.expired and creds.refresh_token:
-                        creds.refresh(Request())
-                    else:
-                        print("Invalid credentials")
-                        return None
-                        
-            except Exception as e:
-                print(f"Error processing credentials: {e}")
-                return None
-        else:
+        if creds_data is None:
+            creds_data = os.environ.get('GOOGLE_CALENDAR_CREDENTIALS')
+        if not creds_data:
             print("No Google Calendar credentials found in environment")
             return None
         
-        service = build('calendar', 'v3', credentials=creds)
+        if self.calendar_client == 'rest':
+            return self.get_rest_calendar_client(creds_data)
+        
+        with instrumentation.timer('google_import'):
+            from google.auth.transport.requests import Request
+            from google.oauth2.credentials import Credentials
+            from googleapiclient.discovery import build_from_document
+        
+        with _credentials_lock:
+            creds = _credentials_cache.get(creds_data)
+            if creds is None:
+                try:
+                    # Decode base64 credentials
+                    creds_json = base64.b64decode(creds_data).decode('utf-8')
+                    creds_dict = json.loads(creds_json)
+                    
+                    creds = _credentials_cache[creds_data] = Credentials.from_authorized_user_info(creds_dict, SCOPES)
+                except Exception as e:
+                    print(f"Error processing credentials: {e}")
+                    return None
+        
+        try:
+            # Refresh only when the current access token is about to run out. The token
+            # cache collapses concurrent refreshes and reuses tokens other threads,
+            # invocations or containers already refreshed.
+            if token_needs_refresh(creds):
+                if creds.refresh_token:
+                    def refresh():
+                        with instrumentation.timer('token_refresh'):
+                            creds.refresh(Request())
+                        instrumentation.count('token_refreshes')
+                        return creds.token, creds.expiry.replace(tzinfo=timezone.utc).timestamp()
+                    
+                    token, expires_at = get_token_cache().get_token(
+                        creds.client_id, creds.refresh_token, creds.client_secret, refresh
+                    )
+                    creds.token = token
+                    # google-auth keeps expiry as a naive UTC datetime
+                    creds.expiry = datetime.fromtimestamp(expires_at, timezone.utc).replace(tzinfo=None)
+                elif not creds.valid:
+                    print("Invalid credentials")
+                    _credentials_cache.pop(creds_data, None)
+                    return None
+        except Exception as e:
+            print(f"Error refreshing credentials: {e}")
+            _credentials_cache.pop(creds_data, None)
+            return None
+        
+        services = getattr(_thread_clients, 'services', None)
+        if services is None:
+            services = _thread_clients.services = {}
+        
+        service = services.get(creds_data)
+        if service is None:
+            # Build from the bundled discovery document instead of fetching it
+            client_options = None
+            if os.environ.get('CALENDAR_API_URL'):
+                client_options = {'api_endpoint': os.environ['CALENDAR_API_URL'].rstrip('/') + '/'}
+            with instrumentation.timer('discovery_build'):
+                service = build_from_document(load_discovery_document(), credentials=creds,
+                                              client_options=client_options)
+            services[creds_data] = service
+        
         return service
     
-    def get_calendar_events(self):
+    def get_rest_calendar_client(self, creds_data):
+        """
+        Get the lightweight REST Calendar client (CALENDAR_CLIENT=rest), cached per credentials
+        
+        The client is thread-safe, so one instance is shared by all workers.
+        """
+        from rest_calendar import RestCalendarClient
+        
+        with _credentials_lock:
+            client = _rest_clients.get(creds_data)
+            if client is None:
+                try:
+                    # Decode base64 credentials
+                    creds_dict = json.loads(base64.b64decode(creds_data).decode('utf-8'))
+                except Exception as e:
+                    print(f"Error processing credentials: {e}")
+                    return None
+                
+                client = _rest_clients[creds_data] = RestCalendarClient(creds_dict)
+        
+        return client
+    
+    def get_today(self, tz_name=None):
+        """
+        Get today's date in a timezone
+        """
+        return local_date(self.now, tz_name)
+    
+    def get_today_window(self, tz_name=None):
+        """
+        Get the aware start and end of today in a timezone
+        """
+        return self.get_window(tz_name, 'today')
+    
+    def get_window(self, tz_name=None, mode='today'):
+        """
+        Get the aware start and end of the days a digest mode covers in a timezone
+        
+        Windows are computed once per timezone and mode per run and shared by
+        every tenant and calendar using them.
+        """
+        window = self._windows.get((tz_name, mode))
+        if window is None:
+            window = self._windows[(tz_name, mode)] = digest_window(self.get_today(tz_name), tz_name, mode)
+        return window
+    
+    def format_event(self, event, tz_name=None):
+        """
+        Convert a Google Calendar event into the notifier's event dict (times in tz_name)
+        """
+        start = event['start'].get('dateTime', event['start'].get('date'))
+        
+        return {
+            'id': event.get('id'),
+            'start': localize_event_start(start, tz_name),
+            'time': format_event_time(start, tz_name),
+            'title': event.get('summary', 'No title'),
+            'location': event.get('location', '')
+        }
+    
+    def get_event_start(self, event, tz_name=None):
         """
-        Get today's events from Google Calendar
+        Get an event's start as a timezone-aware datetime (all-day events start at local midnight)
+        """
+        return parse_event_start(event['start'].get('dateTime', event['start'].get('date')), tz_name)
+    
+    def get_calendar_events(self, calendar_id='primary', creds_data=None, tenant_id='default', tz_name=None,
+                            mode='today'):
+        """
+        Get the events of a digest mode's window (today by default) from a Google Calendar
         """
         try:
-            service = self.get_google_calendar_service()
+            service = self.get_google_calendar_service(creds_data)
             if not service:
                 return []
             
-            # Get start and end of today
-            today_start = self.today.replace(hour=0, minute=0, second=0, microsecond=0)
-            today_end = today_start + timedelta(days=1)
+            if self.sync_mode in ('incremental', 'expand'):
+                return self.get_synced_events(service, calendar_id, tenant_id, tz_name, mode)
             
-            # Convert to RFC3339 format
-            time_min = today_start.isoformat() + 'Z'
-            time_max = today_end.isoformat() + 'Z'
+            return list(self.iter_calendar_events(service, calendar_id, tz_name, mode, tenant_id))
             
+        except Exception as e:
+            print(f"Error getting calendar events: {e}")
+            return []
+    
+    def build_events_list_request(self, service, calendar_id, page_token=None, tz_name=None, mode='today'):
+        """
+        Build (but do not execute) the events.list request for one page of the window's events
+        
+        The whole window is one ranged query however many days it covers.
+        """
+        window_start, window_end = self.get_window(tz_name, mode)
+        
+        return count_response_bytes(service.events().list(
+            calendarId=calendar_id,
+            timeMin=rfc3339(window_start),
+            timeMax=rfc3339(window_end),
+            singleEvents=True,
+            orderBy='startTime',
+            maxResults=EVENTS_PAGE_SIZE,
+            fields=EVENT_LIST_FIELDS,
+            pageToken=page_token
+        ))
+    
+    def iter_calendar_events(self, service, calendar_id='primary', tz_name=None, mode='today', tenant_id='default'):
+        """
+        Yield the window's events one at a time, fetching further pages only when needed
+        
+        Pages go through the response cache, so unchanged pages cost a 304.
+        """
+        cache = get_response_cache()
+        window_start, window_end = self.get_window(tz_name, mode)
+        page_token = None
+        while True:
             # Call the Calendar API
-            events_result = service.events().list(
-                calendarId='primary',
-                timeMin=time_min,
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-            
-            events = events_result.get('items', [])
-            
-            formatted_events = []
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                
-                # Parse the datetime
-                if 'T' in start:
-                    event_time = datetime.fromisoformat(start.replace('Z', '+00:00'))
-                    time_str = event_time.strftime('%H:%M')
+            request = self.build_events_list_request(service, calendar_id, page_token, tz_name, mode)
+            with instrumentation.timer('calendar_api'):
+                if cache is None:
+                    events_result = request.execute()
                 else:
-                    time_str = 'All day'
+                    key = response_key(tenant_id, calendar_id, rfc3339(window_start), rfc3339(window_end),
+                                       EVENT_LIST_FIELDS, page_token)
+                    events_result = cache.execute(request, key)
+            instrumentation.count('calendar_api_calls')
+            instrumentation.count('calendar_pages')
+            
+            # Format the page outside the generator's yields so only formatting is timed
+            with instrumentation.timer('format'):
+                events = [self.format_event(event, tz_name) for event in events_result.get('items', [])]
+            instrumentation.count('calendar_events', len(events))
+            
+            yield from events
+            
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return
+    
+    def batch_list_events(self, service, calendar_ids, tz_name=None, mode='today', tenant_id='default'):
+        """
+        Get the window's events for several calendars using Google API batch requests
+        
+        Each round sends one batch with the next page of every unfinished calendar.
+        Sub-requests that fail, and every calendar of a batch that fails as a
+        whole, are read individually afterwards. Returns a dict of calendar ID ->
+        events.
+        """
+        results = {calendar_id: [] for calendar_id in calendar_ids}
+        pending = {calendar_id: None for calendar_id in calendar_ids}
+        failed = []
+        
+        # The REST client has no batch support: read the calendars one by one
+        if not hasattr(service, 'new_batch_http_request'):
+            pending = {}
+            failed = list(calendar_ids)
+        
+        while pending:
+            next_pending = {}
+            pending_items = list(pending.items())
+            answered = set()
+            
+            def handle_response(request_id, response, exception):
+                answered.add(int(request_id))
+                calendar_id = pending_items[int(request_id)][0]
+                if exception is not None:
+                    print(f"Batched request for {calendar_id} failed: {exception}")
+                    failed.append(calendar_id)
+                    return
                 
-                formatted_events.append({
-                    'time': time_str,
-                    'title': event.get('summary', 'No title'),
-                    'location': event.get('location', ''),
-                    'description': event.get('description', '')
-                })
+                with instrumentation.timer('format'):
+                    events = [self.format_event(event, tz_name) for event in response.get('items', [])]
+                results[calendar_id].extend(events)
+                instrumentation.count('calendar_pages')
+                instrumentation.count('calendar_events', len(events))
+                if response.get('nextPageToken'):
+                    next_pending[calendar_id] = response['nextPageToken']
+            
+            for offset in range(0, len(pending_items), BATCH_SIZE):
+                indexes = range(offset, min(offset + BATCH_SIZE, len(pending_items)))
+                batch = service.new_batch_http_request(callback=handle_response)
+                for index in indexes:
+                    calendar_id, page_token = pending_items[index]
+                    batch.add(self.build_events_list_request(service, calendar_id, page_token, tz_name, mode),
+                              request_id=str(index))
+                try:
+                    with instrumentation.timer('calendar_batch'):
+                        batch.execute()
+                except Exception as e:
+                    # The batch request itself failed (auth, quota, network)
+                    unanswered = [pending_items[index][0] for index in indexes if index not in answered]
+                    print(f"Batch request failed, reading {len(unanswered)} calendars one by one: {e}")
+                    failed.extend(unanswered)
+                instrumentation.count('calendar_api_calls')
+            
+            pending = next_pending
+        
+        for calendar_id in failed:
+            instrumentation.count('calendar_retries')
+            try:
+                results[calendar_id] = list(self.iter_calendar_events(service, calendar_id, tz_name, mode, tenant_id))
+            except Exception as e:
+                print(f"Error getting calendar events for {calendar_id}: {e}")
+                results[calendar_id] = []
+        
+        return results
+    
+    def get_batched_calendar_events(self, calendar_ids, creds_data=None, tz_name=None, mode='today',
+                                    tenant_id='default'):
+        """
+        Get the window's events for all of a tenant's calendars in batched round-trips
+        """
+        try:
+            service = self.get_google_calendar_service(creds_data)
+            if not service:
+                return []
             
-            return formatted_events
+            events = []
+            for calendar_events in self.batch_list_events(service, calendar_ids, tz_name, mode, tenant_id).values():
+                events.extend(calendar_events)
+            return events
             
         except Exception as e:
             print(f"Error getting calendar events: {e}")
             return []
     
-    def send_pushover_notification(self, title, message):
+    def sync_calendar(self, service, calendar_id='primary', tenant_id='default', tz_name=None, expand=False):
         """
-        Send notification using Pushover
+        Bring the stored copy of a calendar up to date using Google sync tokens
+        
+        Only the changes since the last run are fetched. A full resync happens on
+        the first run and whenever Google rejects the sync token (410 Gone).
+        With `expand` the copy holds recurring masters and their exceptions
+        instead of every instance (singleEvents=False).
+        """
+        key = f"masters:{tenant_id}:{calendar_id}" if expand else f"events:{tenant_id}:{calendar_id}"
+        stored_fields = STORED_MASTER_FIELDS if expand else STORED_EVENT_FIELDS
+        sync_token, events, stored_buckets = self.load_event_copy(key)
+        if not sync_token:
+            events = {}
+        
+        today_start, _ = self.get_today_window(tz_name)
+        
+        try:
+            changes, next_sync_token = self.list_event_changes(service, calendar_id, sync_token, today_start, expand)
+        except Exception as e:
+            # HttpError (discovery client) and RestCalendarError both carry resp.status
+            if getattr(getattr(e, 'resp', None), 'status', None) != 410:
+                raise
+            
+            print(f"Sync token expired for {calendar_id}, running full resync")
+            instrumentation.count('calendar_resyncs')
+            sync_token = None
+            events = {}
+            changes, next_sync_token = self.list_event_changes(service, calendar_id, None, today_start, expand)
+        
+        for event in changes:
+            # A cancelled instance of a series is an override the expansion needs to know about
+            if event.get('status') == 'cancelled' and not (expand and 'recurringEventId' in event):
+                events.pop(event['id'], None)
+                if expand:
+                    events = {event_id: stored for event_id, stored in events.items()
+                              if stored.get('recurringEventId') != event['id']}
+            else:
+                events[event['id']] = {field: event[field] for field in stored_fields if field in event}
+        
+        # Drop events that have already started before today so the copy stays small
+        events = {event_id: event for event_id, event in events.items()
+                  if self.is_upcoming(event, today_start, tz_name)}
+        
+        print(f"Applied {len(changes)} calendar changes ({'incremental' if sync_token else 'full sync'})")
+        
+        self.save_event_copy(key, events, next_sync_token, stored_buckets)
+        return events
+    
+    def load_event_copy(self, key):
+        """
+        Load a calendar's stored copy as (sync_token, events, buckets)
+        
+        The copy is split into bucket documents (see store.save_buckets) so a
+        busy calendar never outgrows one DynamoDB item. `buckets` is the list
+        of bucket documents as loaded.
+        """
+        head = self.store.get(key) or {}
+        if 'events' in head:
+            # Written before copies were split into buckets
+            return head.get('sync_token'), dict(head['events']), []
+        
+        buckets = load_buckets(self.store, key, head)
+        events = {}
+        for bucket in buckets:
+            events.update(bucket)
+        return head.get('sync_token'), events, buckets
+    
+    def save_event_copy(self, key, events, sync_token, stored_buckets):
+        """
+        Save a calendar's copy in as few buckets as keep each under EVENT_BUCKET_BYTES, writing only changed ones
+        """
+        save_buckets(self.store, key, events, {'sync_token': sync_token}, stored_buckets, EVENT_BUCKET_BYTES)
+    
+    def is_upcoming(self, event, today_start, tz_name=None):
+        """
+        Check whether a stored event still matters: it starts today or later, or is a series that continues
+        """
+        if recurrence.is_master(event):
+            return recurrence.has_instances_after(event, today_start, tz_name)
+        
+        # Overrides are keyed by the instance they replace, which may be later than the override
+        starts = [event[field] for field in ('start', 'originalStartTime') if field in event]
+        return any(parse_event_start(start.get('dateTime', start.get('date')), tz_name) >= today_start
+                   for start in starts)
+    
+    def list_event_changes(self, service, calendar_id, sync_token, time_min, expand=False):
+        """
+        List changed events (or every event when there is no sync token yet)
+        
+        With `expand` recurring events come back as their master and exceptions.
+        """
+        changes = []
+        page_token = None
+        
+        while True:
+            params = {
+                'calendarId': calendar_id,
+                'singleEvents': not expand,
+                'showDeleted': True,
+                'maxResults': EVENTS_PAGE_SIZE,
+                'fields': EVENT_MASTER_FIELDS if expand else EVENT_SYNC_FIELDS
+            }
+            if sync_token:
+                params['syncToken'] = sync_token
+            else:
+                # Initial sync: skip past events, the daily digest never needs them
+                params['timeMin'] = rfc3339(time_min)
+            if page_token:
+                params['pageToken'] = page_token
+            
+            request = count_response_bytes(service.events().list(**params))
+            with instrumentation.timer('calendar_api'):
+                events_result = request.execute()
+            instrumentation.count('calendar_api_calls')
+            instrumentation.count('calendar_pages')
+            changes.extend(events_result.get('items', []))
+            
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return changes, events_result.get('nextSyncToken')
+    
+    def get_synced_events(self, service, calendar_id='primary', tenant_id='default', tz_name=None, mode='today'):
+        """
+        Get the window's events from the incrementally synced local copy
+        
+        With SYNC_MODE=expand recurring series are expanded locally for the window.
+        """
+        expand = self.sync_mode == 'expand'
+        events = self.sync_calendar(service, calendar_id, tenant_id, tz_name, expand).values()
+        
+        window_start, window_end = self.get_window(tz_name, mode)
+        if expand:
+            with instrumentation.timer('expand'):
+                events = list(recurrence.expand_events(events, window_start, window_end, tz_name))
+        
+        window_events = []
+        for event in events:
+            event_start = self.get_event_start(event, tz_name)
+            if window_start <= event_start < window_end:
+                window_events.append((event_start, event))
+        
+        window_events.sort(key=lambda item: item[0])
+        return [self.format_event(event, tz_name) for _, event in window_events]
+    
+    def send_pushover_notification(self, title, message, user=None):
+        """
+        Send notification using Pushover (to PUSHOVER_USER unless a user key is given)
         """
         try:
             # Get Pushover credentials from environment variables
             token = os.environ.get('PUSHOVER_TOKEN')
-            user = os.environ.get('PUSHOVER_USER')
+            if user is None:
+                user = os.environ.get('PUSHOVER_USER')
             
             if not token or not user:
                 print("Pushover credentials not found in environment variables")
                 return False
             
-            url = "https://api.pushover.net/1/messages.json"
-            data = {
-                "token": token,
-                "user": user,
-                "title": title,
-                "message": message,
-                "priority": 0,
-                "sound": "default"
-            }
-            
-            response = requests.post(url, data=data)
-            
-            if response.status_code == 200:
-                print("Pushover notification sent successfully")
-                return True
-            else:
-                print(f"Error sending Pushover notification: {response.text}")
-                return False
+            return get_pushover_client(token).send(user, title, message)
                 
         except Exception as e:
             print(f"Error sending Pushover notification: {e}")
             return False
     
-    def format_schedule_message(self, events):
+    def get_tenant_events(self, tenant, calendar_futures):
         """
-        Format events into a readable message
+        Merge one tenant's per-calendar results into a single list ordered by start time
         """
-        if not events:
-            return "No events scheduled for today! 🎉"
+        events = []
+        for future in calendar_futures:
+            events.extend(future.result())
         
-        message = f"Today's Schedule ({len(events)} events):\n\n"
+        events.sort(key=lambda event: parse_iso(event['start']))
+        return events
+    
+    def build_digest(self, tenant, events, mode='today'):
+        """
+        Render one tenant's schedule for a digest mode with their templates (see rendering.py)
+        """
+        today = self.get_today(tenant.get('timezone'))
+        title = digest_title(today, mode)
+        renderer = get_renderer(tenant)
         
-        for event in events:
-            location_text = f" ({event['location']})" if event['location'] else ""
-            message += f"• {event['time']} - {event['title']}{location_text}\n"
+        offset, days = parse_digest_mode(mode)
+        if days > 1:
+            document = renderer.multi_day(title, events, today + timedelta(days=offset))
+        else:
+            document = renderer.schedule(title, events, 'Tomorrow' if offset else 'Today')
+        
+        print(f"\n{title} ({tenant['id']})")
+        print(f"{document.text}")
         
-        return message
+        return document
     
-    def run(self):
+    def build_change_notification(self, tenant, events, mode='today'):
         """
-        Main function to get events and send notifications
+        Compare a tenant's events with the last notified snapshot
+        
+        Returns (notification, snapshot, changes_count). The notification is a
+        rendered document with only what changed, the full digest when
+        nothing has been sent today (or the digest mode changed), or None when
+        no visible change happened.
         """
-        print("Fetching today's calendar events from Google Calendar...")
-        events = self.get_calendar_events()
+        snapshot = build_snapshot(events)
+        previous = self.store.get(f"snapshot:{tenant['id']}")
         
-        title = f"Daily Schedule - {self.today.strftime('%A, %B %d')}"
-        message = self.format_schedule_message(events)
+        if not previous or previous.get('date') != self.get_today(tenant.get('timezone')).isoformat() \
+                or previous.get('mode', 'today') != mode:
+            return self.build_digest(tenant, events, mode), snapshot, len(snapshot)
         
-        print(f"\n{title}")
+        changes = diff_snapshots(previous['events'], snapshot)
+        message = format_change_message(changes)
+        if message is None:
+            print(f"No visible changes for {tenant['id']}, not sending a notification")
+            return None, snapshot, 0
+        
+        title = "Calendar Updated"
+        print(f"\n{title} ({tenant['id']})")
         print(f"{message}")
         
-        # Send notification
-        success = self.send_pushover_notification(title, message)
+        return get_renderer(tenant).lines(title, message.splitlines()), snapshot, count_changes(changes)
+    
+    def save_snapshot(self, tenant, snapshot, mode='today'):
+        today = self.get_today(tenant.get('timezone')).isoformat()
+        self.store.put(f"snapshot:{tenant['id']}", {'date': today, 'mode': mode, 'events': snapshot})
+    
+    def update_reminders(self, tenants, tenant_events, modes=None):
+        """
+        Bring the stored reminders of each tenant in line with their events
+        
+        Reminders always track today's events, so longer windows are cut to
+        today and tenants whose window does not include today are left alone.
+        """
+        if not REMINDER_MINUTES:
+            return
+        
+        modes = modes or {}
+        tenants = [tenant for tenant in tenants if covers_today(modes.get(tenant['id'], 'today'))]
+        
+        try:
+            scheduler = ReminderScheduler.load(self.store, [tenant['id'] for tenant in tenants])
+            for tenant in tenants:
+                _, today_end = self.get_today_window(tenant.get('timezone'))
+                events = [event for event in tenant_events[tenant['id']] if parse_iso(event['start']) < today_end]
+                scheduled, cancelled = scheduler.sync_tenant_events(tenant, events, self.now.timestamp())
+                if scheduled or cancelled:
+                    print(f"⏰ Reminders for {tenant['id']}: {scheduled} scheduled, {cancelled} cancelled")
+            scheduler.save(self.store)
+        except Exception as e:
+            print(f"Error updating reminders: {e}")
+            return
+        
+        # Push the reminders to the scheduler backend, changing only what differs
+        schedule_backend = get_schedule_backend(self.store)
+        if schedule_backend is None:
+            return
+        
+        try:
+            tenant_ids = [tenant['id'] for tenant in tenants]
+            reminders = [reminder for tenant_id in tenant_ids for reminder in scheduler.reminders_for(tenant_id)]
+            counts = reconcile(desired_schedules(reminders), schedule_backend, tenant_ids)
+            print(f"📅 Reminder schedules: {counts['created']} created, {counts['updated']} updated, "
+                  f"{counts['deleted']} deleted, {counts['unchanged']} unchanged")
+        except Exception as e:
+            print(f"Error reconciling reminder schedules: {e}")
+    
+    def deliver_reminders(self, tenants, reminders):
+        """
+        Send reminders through all configured backends; returns whether each one was sent
+        """
+        tenants_by_id = {tenant['id']: tenant for tenant in tenants}
+        notifications = []
+        for reminder in reminders:
+            tenant = tenants_by_id[reminder['tenant_id']]
+            notifications.append((tenant['id'], get_renderer(tenant).lines(reminder['title'], [reminder['message']])))
+        
+        sent, _ = self.deliver_notifications(tenants, notifications)
+        return sent
+    
+    def send_due_reminders(self, tenants=None):
+        """
+        Send every stored reminder that is due now
+        
+        Reminders that could not be sent stay scheduled, so the next run
+        retries them until their event starts. Tenants with nothing due are
+        not loaded.
+        """
+        if tenants is None:
+            tenants = load_tenants()
+        
+        now = timesource.time()
+        scheduler = ReminderScheduler.load(self.store, [tenant['id'] for tenant in tenants], due_by=now)
+        due = scheduler.pop_due(now)
+        
+        sent = self.deliver_reminders(tenants, due) if due else []
+        scheduler.retry_unsent(due, sent, now)
+        scheduler.save(self.store)
+        
+        print(f"⏰ Sent {sum(sent)} of {len(due)} due reminders")
+        return {'reminders_count': len(due), 'sent_count': sum(sent)}
+    
+    def send_reminder(self, event):
+        """
+        Send one reminder fired by its own schedule (SCHEDULE_BACKEND=eventbridge)
+        """
+        tenants = load_tenants()
+        tenant = next((tenant for tenant in tenants if tenant['id'] == event.get('tenant_id')), None)
+        if tenant is None and event.get('recipient'):
+            # Scheduled before reminders carried their tenant: find it by Pushover user
+            tenant = next((tenant for tenant in tenants if tenant.get('pushover_user') == event['recipient']), None)
+        if tenant is None:
+            print(f"No user found for reminder {event['title']!r}")
+            return False
+        
+        reminder = {'tenant_id': tenant['id'], 'title': event['title'], 'message': event['message']}
+        return self.deliver_reminders([tenant], [reminder])[0]
+    
+    def renew_channels(self, tenants=None):
+        """
+        Create, renew and stop every tenant's webhook push channels (see channels.py)
+        """
+        if tenants is None:
+            tenants = load_tenants()
+        
+        with instrumentation.timer('channels'):
+            return ChannelManager(self.store, self.get_google_calendar_service, get_executor()).sync(tenants)
+    
+    def deliver_notifications(self, tenants, notifications):
+        """
+        Send rendered documents through all configured backends in parallel
+        
+        `notifications` lists (tenant ID, document) pairs. Each backend gets
+        every document paginated for its own size limits, so one document may
+        be several messages; backends without an address for a tenant skip it.
+        
+        Returns whether each notification was sent everywhere it was due (in
+        order), plus a summary per backend.
+        """
+        tenants_by_id = {tenant['id']: tenant for tenant in tenants}
+        owners_by_backend = []
+        jobs_by_backend = []
+        for backend in self.backends:
+            owners = []
+            jobs = []
+            for index, (tenant_id, document) in enumerate(notifications):
+                recipient = backend.recipient_for(tenants_by_id[tenant_id])
+                if recipient:
+                    for title, message in document.paginate(backend.max_title, backend.max_message):
+                        owners.append(index)
+                        jobs.append((recipient, title, message))
+            owners_by_backend.append(owners)
+            jobs_by_backend.append(jobs)
+        
+        outcomes = deliver(self.backends, jobs_by_backend)
+        
+        sent = [bool(self.backends)] * len(notifications)
+        summaries = {}
+        for backend, owners, outcome in zip(self.backends, owners_by_backend, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"Error delivering through {backend.name}: {outcome}")
+                summaries[backend.name] = {'error': str(outcome)}
+                for index in owners:
+                    sent[index] = False
+                continue
+            
+            summaries[backend.name] = outcome['summary']
+            for index, result in zip(owners, outcome['results']):
+                if result['error']:
+                    print(f"Error sending to {notifications[index][0]} through {backend.name}: {result['error']}")
+                if not result['sent']:
+                    sent[index] = False
+        
+        return sent, summaries
+    
+    def deliver_digests(self, tenants, digests):
+        """
+        Send every tenant's digest through all configured backends in parallel
+        
+        `digests` maps tenant ID to a rendered document; tenants without an
+        entry get nothing. Returns whether each tenant got all of their
+        notifications, plus a summary per backend.
+        """
+        tenant_ids = [tenant['id'] for tenant in tenants if tenant['id'] in digests]
+        delivered, summaries = self.deliver_notifications(
+            tenants, [(tenant_id, digests[tenant_id]) for tenant_id in tenant_ids]
+        )
+        
+        sent = {tenant['id']: False for tenant in tenants}
+        sent.update(zip(tenant_ids, delivered))
+        return sent, summaries
+    
+    def run(self, tenants=None, changes_only=False, digest=None):
+        """
+        Main function to get events and send notifications
+        
+        Every calendar of every tenant is fetched concurrently on the shared worker
+        pool, then every tenant's digest goes out through all notification backends
+        in parallel. A failing tenant, calendar or backend never affects the others.
+        
+        Each tenant gets their first digest mode; with `digest` only the tenants
+        that list that mode are included and they get it instead. With
+        changes_only (webhook runs) each tenant only gets a notification
+        listing what changed since the last one, or nothing at all.
+        """
+        if tenants is None:
+            tenants = load_tenants()
+        
+        if digest:
+            parse_digest_mode(digest)
+            tenants = [tenant for tenant in tenants if digest in tenant.get('digests', [DIGEST_MODE])]
+        modes = {tenant['id']: digest or tenant.get('digests', [DIGEST_MODE])[0] for tenant in tenants}
+        
+        executor = get_executor()
+        pushover_client = None
+        if os.environ.get('PUSHOVER_TOKEN'):
+            pushover_client = get_pushover_client(os.environ['PUSHOVER_TOKEN'])
+            pushover_client.reset_metrics()
+        
+        print(f"Fetching today's calendar events for {len(tenants)} user(s) from Google Calendar...")
+        
+        with instrumentation.timer('fetch'):
+            calendar_futures = {tenant['id']: [] for tenant in tenants}
+            
+            # Batched mode: one task per tenant reads all of its calendars in one round-trip
+            if self.batch_requests and self.sync_mode not in ('incremental', 'expand'):
+                for tenant in tenants:
+                    future = executor.submit(
+                        self.get_batched_calendar_events,
+                        tenant['calendars'],
+                        tenant['google_credentials'],
+                        tenant.get('timezone'),
+                        modes[tenant['id']],
+                        tenant['id']
+                    )
+                    calendar_futures[tenant['id']].append(future)
+                tenants_to_fetch = []
+            else:
+                tenants_to_fetch = tenants
+            
+            # Submit calendars round-robin across tenants so one user with many calendars
+            # cannot hold every worker while the others wait
+            max_calendars = max((len(tenant['calendars']) for tenant in tenants_to_fetch), default=0)
+            for index in range(max_calendars):
+                for tenant in tenants_to_fetch:
+                    if index < len(tenant['calendars']):
+                        future = executor.submit(
+                            self.get_calendar_events,
+                            tenant['calendars'][index],
+                            tenant['google_credentials'],
+                            tenant['id'],
+                            tenant.get('timezone'),
+                            modes[tenant['id']]
+                        )
+                        calendar_futures[tenant['id']].append(future)
+            
+            tenant_events = {}
+            for tenant in tenants:
+                try:
+                    tenant_events[tenant['id']] = self.get_tenant_events(tenant, calendar_futures[tenant['id']])
+                except Exception as e:
+                    print(f"Error getting events for {tenant['id']}: {e}")
+                    tenant_events[tenant['id']] = []
+        
+        with instrumentation.timer('reminders'):
+            self.update_reminders(tenants, tenant_events, modes)
+        
+        # Work out what each tenant should be told
+        with instrumentation.timer('compose'):
+            digests = {}
+            snapshots = {}
+            changes_counts = {}
+            for tenant in tenants:
+                events = tenant_events[tenant['id']]
+                if changes_only:
+                    notification, snapshots[tenant['id']], changes_counts[tenant['id']] = \
+                        self.build_change_notification(tenant, events, modes[tenant['id']])
+                else:
+                    notification = self.build_digest(tenant, events, modes[tenant['id']])
+                    snapshots[tenant['id']] = build_snapshot(events)
+                    changes_counts[tenant['id']] = None
+                
+                if notification:
+                    digests[tenant['id']] = notification
+        
+        # Send notifications
+        with instrumentation.timer('delivery'):
+            sent, dispatch = self.deliver_digests(tenants, digests)
+        
+        users = []
+        for tenant in tenants:
+            # Only move the snapshot forward once the tenant has been told about it; webhook
+            # change notifications compare against the tenant's first mode only
+            primary_mode = modes[tenant['id']] == tenant.get('digests', [DIGEST_MODE])[0]
+            if primary_mode and (sent[tenant['id']] or tenant['id'] not in digests):
+                try:
+                    with instrumentation.timer('snapshot'):
+                        self.save_snapshot(tenant, snapshots[tenant['id']], modes[tenant['id']])
+                except Exception as e:
+                    print(f"Error saving snapshot for {tenant['id']}: {e}")
+            
+            users.append({
+                'id': tenant['id'],
+                'events_count': len(tenant_events[tenant['id']]),
+                'changes_count': changes_counts[tenant['id']],
+                'notification_sent': sent[tenant['id']],
+                'events': tenant_events[tenant['id']]
+            })
         
         return {
-            'events_count': len(events),
-            'notification_sent': success,
-            'events': events
+            'events_count': sum(user['events_count'] for user in users),
+            'notification_sent': all(user['notification_sent'] for user in users),
+            'users': users,
+            'delivery': pushover_client.metrics() if pushover_client else {},
+            'dispatch': dispatch
         }
 
-# For local testing
+# For local testing (local_server.py runs the function on a simulated clock with schedules and webhooks)
 if __name__ == "__main__":
     # Test the function locally
     test_event = {}
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Local development server
+
+Serves lambda_handler behind an HTTP endpoint shaped like a Lambda Function
+URL and runs the function's EventBridge schedules on a simulated clock, so
+a whole day of digests, reminder ticks and webhook bursts runs in seconds
+on one machine, without AWS or network access.
+
+- Any request to the server becomes a Function URL (payload 2.0) event, so
+  Google push notifications (X-Goog-* headers) take the webhook path.
+  POST /invoke with a JSON body invokes the function with that body as the
+  event, like an EventBridge target.
+- The clock starts at --start and runs --speed times faster than real
+  time; the function reads it through timesource.py. With --hours the
+  server simulates that many hours and exits, jumping over idle time
+  between invocations.
+- The schedules from SETUP.md fire on the simulated clock: the daily digest
+  at --digest-at (local time), the reminder tick every 5 minutes and the
+  channel renewal once a day.
+- --replay sends a recorded sequence of push notifications to the endpoint
+  at their recorded (simulated) times, concurrently for pings recorded at
+  the same moment; --record writes the pings the server receives in the
+  same format, one JSON object per line:
+
+      {"at": 3600, "headers": {"X-Goog-Channel-ID": "...", "X-Goog-Resource-State": "exists", ...}}
+
+  `at` is seconds after the start of the recording. --burst N adds a
+  synthetic burst of N pings to the first user's channel.
+- --stubs serves Google and Pushover from benchmarks/stubs.py, with --users
+  users and --events events per calendar on the simulated day.
+
+Usage:
+    python lambda/local_server.py --stubs --hours 24 --speed 3600
+    python lambda/local_server.py --stubs --hours 2 --burst 200 --log /tmp/handler.log
+    python lambda/local_server.py --stubs --replay pings.jsonl --speed 60
+    python lambda/local_server.py --port 8080 --record pings.jsonl
+"""
+
+import argparse
+import base64
+import heapq
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+LAMBDA_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS_DIR = os.path.join(os.path.dirname(LAMBDA_DIR), 'benchmarks')
+
+# Intervals of the schedules SETUP.md sets up
+REMINDER_TICK = 300
+CHANNEL_RENEWAL_AT = '03:00'
+
+
+def say(message):
+    # The handler's own output may be redirected to --log; server messages stay on stderr
+    print(message, file=sys.stderr, flush=True)
+
+
+class SimulatedClock:
+    """
+    A clock that starts at `start` and runs `speed` times faster than real time
+
+    advance_to() jumps forward (idle time); sleep() waits the real time
+    corresponding to a simulated duration.
+    """
+
+    def __init__(self, start, speed=1.0):
+        self.start = start
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._offset = 0.0
+        self._real_start = time.monotonic()
+
+    def time(self):
+        with self._lock:
+            return self.start + self._offset + (time.monotonic() - self._real_start) * self.speed
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def advance_to(self, moment):
+        with self._lock:
+            current = self.start + self._offset + (time.monotonic() - self._real_start) * self.speed
+            if moment > current:
+                self._offset += moment - current
+
+
+class LambdaContext:
+    """
+    The parts of the Lambda context object the function uses
+    """
+
+    def __init__(self):
+        self.aws_request_id = str(uuid.uuid4())
+        self.function_name = 'local'
+
+
+def function_url_event(method, path, query, headers, body):
+    """
+    Build a Lambda Function URL (payload format 2.0) event for an HTTP request
+    """
+    text = body.decode('utf-8', errors='replace')
+    return {
+        'version': '2.0',
+        'rawPath': path,
+        'rawQueryString': query,
+        'headers': {name.lower(): value for name, value in headers.items()},
+        'body': text,
+        'isBase64Encoded': False,
+        'requestContext': {
+            'http': {'method': method, 'path': path, 'sourceIp': '127.0.0.1'},
+            'requestId': str(uuid.uuid4())
+        }
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class LocalRuntime:
+    """
+    Invokes lambda_handler and keeps per-action statistics
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.active = 0
+        self.stats = {}
+
+    def invoke(self, event, action):
+        import lambda_function
+
+        with self._lock:
+            self.active += 1
+        started = time.perf_counter()
+        try:
+            response = lambda_function.lambda_handler(event, LambdaContext())
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.active -= 1
+
+        with self._lock:
+            stats = self.stats.setdefault(action, {'count': 0, 'errors': 0, 'latencies': []})
+            stats['count'] += 1
+            stats['latencies'].append(elapsed)
+            if response.get('statusCode') != 200:
+                stats['errors'] += 1
+        return response
+
+    def summary(self):
+        with self._lock:
+            return {
+                action: {
+                    'count': stats['count'],
+                    'errors': stats['errors'],
+                    'p50_ms': round(percentile(stats['latencies'], 0.50) * 1000, 1),
+                    'p95_ms': round(percentile(stats['latencies'], 0.95) * 1000, 1),
+                    'max_ms': round(max(stats['latencies']) * 1000, 1)
+                }
+                for action, stats in self.stats.items()
+            }
+
+
+class Recorder:
+    """
+    Append received push notifications to a JSONL file in the --replay format
+    """
+
+    def __init__(self, path, clock):
+        self.file = open(path, 'a')
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def record(self, headers):
+        line = json.dumps({'at': round(self.clock.time() - self.clock.start, 3), 'headers': headers})
+        with self._lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+
+class FunctionUrlHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_request(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        headers = dict(self.headers.items())
+
+        if self.command == 'POST' and url.path == '/invoke':
+            event = json.loads(body or b'{}')
+            action = event.get('action', 'digest')
+        else:
+            event = function_url_event(self.command, url.path, url.query, headers, body)
+            goog_headers = {name: value for name, value in headers.items() if name.lower().startswith('x-goog-')}
+            action = 'webhook' if goog_headers else 'http'
+            if goog_headers and self.server.recorder:
+                self.server.recorder.record(goog_headers)
+
+        response = self.server.runtime.invoke(event, action)
+
+        payload = response.get('body', '')
+        if response.get('isBase64Encoded'):
+            payload = base64.b64decode(payload)
+        elif not isinstance(payload, bytes):
+            payload = str(payload).encode('utf-8')
+
+        self.send_response(response.get('statusCode', 200))
+        for name, value in (response.get('headers') or {'Content-Type': 'application/json'}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = handle_request
+    do_POST = handle_request
+
+
+class LocalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, runtime, port=8080, recorder=None):
+        super().__init__(('127.0.0.1', port), FunctionUrlHandler)
+        self.runtime = runtime
+        self.recorder = recorder
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def next_daily(after, at, tz_name):
+    """
+    Next Unix timestamp after `after` at local time `at` (HH:MM) in a timezone
+    """
+    from timezones import get_zone
+
+    zone = get_zone(tz_name)
+    hour, minute = (int(part) for part in at.split(':'))
+    local = datetime.fromtimestamp(after, zone)
+    moment = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if moment.timestamp() <= after:
+        moment = datetime.combine(local.date() + timedelta(days=1), moment.time(), zone)
+    return moment.timestamp()
+
+
+class Schedule:
+    def __init__(self, name, event, interval=None, at=None, tz_name=None):
+        self.name = name
+        self.event = event
+        self.interval = interval
+        self.at = at
+        self.tz_name = tz_name
+
+    def next_fire(self, after):
+        if self.interval:
+            return (after // self.interval + 1) * self.interval
+        return next_daily(after, self.at, self.tz_name)
+
+
+def default_schedules(digest_at, tz_name):
+    return [
+        Schedule('digest', {}, at=digest_at, tz_name=tz_name),
+        Schedule('send_reminders', {'action': 'send_reminders'}, interval=REMINDER_TICK),
+        Schedule('renew_channels', {'action': 'renew_channels'}, at=CHANNEL_RENEWAL_AT, tz_name=tz_name)
+    ]
+
+
+def load_recording(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def burst_recording(channel_id, token, count, at):
+    """
+    A channel handshake followed by `count` change pings at the same moment
+    """
+    def ping(number, state):
+        return {'at': at, 'headers': {
+            'X-Goog-Channel-ID': channel_id,
+            'X-Goog-Channel-Token': token,
+            'X-Goog-Resource-ID': f"resource-{channel_id}",
+            'X-Goog-Resource-State': state,
+            'X-Goog-Message-Number': str(number)
+        }}
+
+    return [ping(1, 'sync')] + [ping(number, 'exists') for number in range(2, count + 2)]
+
+
+def post_ping(url, ping):
+    request = urllib.request.Request(url, data=b'', headers=ping['headers'], method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+    except Exception as e:
+        say(f"Error replaying ping: {e}")
+
+
+class Simulation:
+    """
+    Fire schedules and replayed pings in simulated-time order until `until`
+
+    Invocations that fall due together run concurrently, like separate Lambda
+    containers. When nothing is running the clock jumps to the next
+    invocation instead of waiting for it.
+    """
+
+    def __init__(self, clock, runtime, server_url, schedules, recording=(), until=None, skip_idle=True):
+        self.clock = clock
+        self.runtime = runtime
+        self.server_url = server_url
+        self.until = until
+        self.skip_idle = skip_idle
+        self._queue = []
+        self._sequence = itertools.count()
+
+        for schedule in schedules:
+            self.push(schedule.next_fire(clock.time()), 'schedule', schedule)
+        for ping in recording:
+            self.push(clock.start + ping['at'], 'ping', ping)
+
+    def push(self, moment, kind, item):
+        heapq.heappush(self._queue, (moment, next(self._sequence), kind, item))
+
+    def wait_until(self, moment):
+        while True:
+            remaining = moment - self.clock.time()
+            if remaining <= 0:
+                return
+            if self.skip_idle and self.runtime.active == 0:
+                self.clock.advance_to(moment)
+                return
+            # Poll at least every 50 ms of real time so jumps resume as soon as invocations finish
+            self.clock.sleep(min(remaining, self.clock.speed * 0.05))
+
+    def run(self):
+        while self._queue and (self.until is None or self._queue[0][0] <= self.until):
+            moment = self._queue[0][0]
+            self.wait_until(moment)
+
+            threads = []
+            while self._queue and self._queue[0][0] <= moment:
+                _, _, kind, item = heapq.heappop(self._queue)
+                if kind == 'schedule':
+                    threads.append(threading.Thread(target=self.runtime.invoke, args=(dict(item.event), item.name)))
+                    self.push(item.next_fire(moment), 'schedule', item)
+                else:
+                    threads.append(threading.Thread(target=post_ping, args=(self.server_url, item)))
+
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        if self.until is not None:
+            self.wait_until(self.until)
+
+
+def start_stubs(users, events, day, state_dir):
+    """
+    Start the Google and Pushover stubs and point the function at them
+    """
+    sys.path.insert(0, BENCHMARKS_DIR)
+    from bench_calendar_client import stub_credentials
+    from stubs import GoogleStubServer, PushoverStubServer, synthetic_events
+
+    google = GoogleStubServer(events_per_calendar=events).start()
+    google.events = synthetic_events(events, day)
+    pushover = PushoverStubServer().start()
+
+    os.environ.update(
+        CALENDAR_CLIENT='rest',
+        CALENDAR_API_URL=f"{google.base_url}/calendar/v3",
+        PUSHOVER_TOKEN='stub-token',
+        PUSHOVER_API_URL=pushover.api_url,
+        STATE_STORE='file',
+        STATE_DIR=os.path.join(state_dir, 'state'),
+        TOKEN_CACHE='memory',
+        TENANTS_CONFIG=json.dumps([
+            {
+                'id': f"user{index}",
+                'google_credentials': stub_credentials(google.base_url, client_id=f"stub-client-{index}"),
+                'calendars': ['primary'],
+                'pushover_user': f"stub-user-{index}"
+            }
+            for index in range(users)
+        ])
+    )
+    return google, pushover
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the function locally behind a Function URL-style endpoint')
+    parser.add_argument('--port', type=int, default=8080, help='port to serve on (0 picks a free one)')
+    parser.add_argument('--start', help='simulated start time (ISO 8601; default now, or local midnight with --hours)')
+    parser.add_argument('--speed', type=float, default=1.0, help='simulated seconds per real second')
+    parser.add_argument('--hours', type=float, help='simulate this many hours, then print a summary and exit')
+    parser.add_argument('--no-skip-idle', action='store_true', help='wait out idle time instead of jumping over it')
+    parser.add_argument('--digest-at', default='08:00', help='local time of the daily digest schedule')
+    parser.add_argument('--no-schedules', action='store_true', help="don't run the EventBridge schedules")
+    parser.add_argument('--replay', help='JSONL recording of push notifications to replay')
+    parser.add_argument('--record', help='append received push notifications to this JSONL file')
+    parser.add_argument('--burst', type=int, default=0, help='replay a burst of this many pings to user0')
+    parser.add_argument('--burst-at', type=float, default=1.0, help='hours after the start the burst arrives')
+    parser.add_argument('--stubs', action='store_true', help='serve Google and Pushover from local stubs')
+    parser.add_argument('--users', type=int, default=3, help='users served by the stubs')
+    parser.add_argument('--events', type=int, default=20, help='events per calendar served by the stubs')
+    parser.add_argument('--log', help="write the function's output to this file instead of stdout")
+    args = parser.parse_args()
+
+    sys.path.insert(0, LAMBDA_DIR)
+    import timesource
+    from timezones import DEFAULT_TIMEZONE, get_zone
+
+    if args.start:
+        start = datetime.fromisoformat(args.start.replace('Z', '+00:00'))
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=get_zone(DEFAULT_TIMEZONE))
+    elif args.hours:
+        start = datetime.combine(datetime.now(get_zone(DEFAULT_TIMEZONE)).date(), datetime.min.time(),
+                                 get_zone(DEFAULT_TIMEZONE))
+    else:
+        start = datetime.now(timezone.utc)
+
+    clock = SimulatedClock(start.timestamp(), args.speed)
+    timesource.install(clock)
+
+    state_dir = tempfile.mkdtemp(prefix='local-server-')
+    stubs = None
+    if args.stubs:
+        day = start.astimezone(get_zone(DEFAULT_TIMEZONE)).replace(hour=0, minute=0, second=0, microsecond=0)
+        stubs = start_stubs(args.users, args.events, day, state_dir)
+
+    if args.log:
+        sys.stdout = open(args.log, 'a', buffering=1)
+
+    runtime = LocalRuntime(clock)
+    recorder = Recorder(args.record, clock) if args.record else None
+    server = LocalServer(runtime, args.port, recorder).start()
+    say(f"🚀 Serving lambda_handler at {server.url} (simulated clock from {start.isoformat()}, x{args.speed:g})")
+
+    recording = load_recording(args.replay) if args.replay else []
+    if args.burst:
+        recording += burst_recording('local-burst-channel', 'user0', args.burst, args.burst_at * 3600)
+
+    schedules = [] if args.no_schedules else default_schedules(args.digest_at, DEFAULT_TIMEZONE)
+    until = clock.start + args.hours * 3600 if args.hours else None
+    simulation = Simulation(clock, runtime, server.url, schedules, recording, until, skip_idle=not args.no_skip_idle)
+
+    started = time.perf_counter()
+    try:
+        if until is None and not schedules and not recording:
+            threading.Event().wait()
+        simulation.run()
+        if until is None:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - started
+
+    simulated = datetime.fromtimestamp(clock.time(), timezone.utc) - start
+    say(f"\n📊 Simulated {simulated.total_seconds() / 3600:.1f} h in {elapsed:.1f} s")
+    say(f"{'invocation':>16} {'count':>6} {'errors':>7} {'p50':>10} {'p95':>10} {'max':>10}")
+    for action, stats in sorted(runtime.summary().items()):
+        say(f"{action:>16} {stats['count']:>6} {stats['errors']:>7} {stats['p50_ms']:>7} ms "
+            f"{stats['p95_ms']:>7} ms {stats['max_ms']:>7} ms")
+    if stubs:
+        google, pushover = stubs
+        say(f"Google API requests: {google.requests}, Pushover messages: {pushover.messages}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
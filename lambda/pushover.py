@@ -0,0 +1,195 @@
+"""
+Pushover delivery client
+
+Sends through the shared keep-alive session (http_session.py) so warm
+invocations reuse open TLS connections, applies connect/read timeouts,
+retries 429/5xx responses with exponential backoff and jitter, respects
+Pushover's application rate-limit headers and records per-call latency.
+
+Set PUSHOVER_API_URL to point the client at a local HTTP stub.
+"""
+
+import os
+import random
+import threading
+import time
+
+import instrumentation
+from http_session import TIMEOUTS, get_session
+
+PUSHOVER_API_URL = 'https://api.pushover.net/1/messages.json'
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_pushover_client(token):
+    """
+    Get the cached client for a Pushover application token
+    """
+    with _clients_lock:
+        client = _clients.get(token)
+        if client is None:
+            client = _clients[token] = PushoverClient(token)
+
+    return client
+
+
+def backoff_delay(attempt):
+    """
+    Exponential backoff with full jitter for the given retry attempt (0-based)
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class PushoverClient:
+    def __init__(self, token, api_url=None, session=None, max_retries=MAX_RETRIES, sleep=time.sleep):
+        self.token = token
+        self.api_url = api_url or os.environ.get('PUSHOVER_API_URL', PUSHOVER_API_URL)
+        self.session = session
+        self.max_retries = max_retries
+        self.sleep = sleep
+
+        # Application limits reported by Pushover on every response
+        self.limit_remaining = None
+        self.limit_reset = None
+
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.retries = 0
+        self.failures = 0
+
+    def update_rate_limit(self, headers):
+        """
+        Remember the X-Limit-App-* headers from a Pushover response
+        """
+        remaining = headers.get('X-Limit-App-Remaining')
+        reset = headers.get('X-Limit-App-Reset')
+
+        with self._lock:
+            if remaining is not None:
+                self.limit_remaining = int(remaining)
+            if reset is not None:
+                self.limit_reset = int(reset)
+
+    def rate_limited(self):
+        """
+        Check whether the application has used up its message allowance
+        """
+        with self._lock:
+            if self.limit_remaining is None or self.limit_remaining > 0:
+                return False
+            return self.limit_reset is None or time.time() < self.limit_reset
+
+    def record(self, latency, retried=False, failed=False):
+        instrumentation.record('pushover_request', latency)
+        instrumentation.count('pushover_requests')
+        if retried:
+            instrumentation.count('pushover_retries')
+        if failed:
+            instrumentation.count('pushover_failures')
+
+        with self._lock:
+            self.latencies.append(latency)
+            if retried:
+                self.retries += 1
+            if failed:
+                self.failures += 1
+
+    def send(self, user, title, message, priority=0, sound='default', **options):
+        """
+        Send one notification, retrying transient failures
+
+        Returns True once Pushover accepts the message.
+        """
+        import requests
+
+        if self.rate_limited():
+            print("Pushover application limit reached, not sending notification")
+            return False
+
+        session = self.session or get_session()
+        data = {
+            "token": self.token,
+            "user": user,
+            "title": title,
+            "message": message,
+            "priority": priority,
+            "sound": sound
+        }
+        data.update(options)
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            started = time.perf_counter()
+
+            try:
+                response = session.post(self.api_url, data=data, timeout=TIMEOUTS)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            else:
+                instrumentation.count('pushover_bytes', len(response.content))
+                self.update_rate_limit(response.headers)
+
+                if response.status_code == 200:
+                    self.record(time.perf_counter() - started)
+                    print("Pushover notification sent successfully")
+                    return True
+
+                error = response.text
+                if response.status_code != 429 and response.status_code < 500:
+                    # Other 4xx errors (bad user key, message too long, ...) will not succeed on retry
+                    self.record(time.perf_counter() - started, failed=True)
+                    print(f"Error sending Pushover notification: {error}")
+                    return False
+
+                if response.headers.get('Retry-After', '').isdigit():
+                    retry_after = int(response.headers['Retry-After'])
+
+            last_attempt = attempt == self.max_retries
+            self.record(time.perf_counter() - started, retried=not last_attempt, failed=last_attempt)
+
+            if last_attempt or self.rate_limited():
+                break
+
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            print(f"Pushover request failed ({error}), retrying in {delay:.2f}s")
+            self.sleep(min(delay, BACKOFF_MAX))
+
+        print(f"Error sending Pushover notification: {error}")
+        return False
+
+    def reset_metrics(self):
+        with self._lock:
+            self.latencies = []
+            self.retries = 0
+            self.failures = 0
+
+    def metrics(self):
+        """
+        Summarise delivery latency (milliseconds) and retry counts
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            retries = self.retries
+            failures = self.failures
+
+        if not latencies:
+            return {'calls': 0, 'retries': retries, 'failures': failures}
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            'calls': len(latencies),
+            'retries': retries,
+            'failures': failures,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(latencies[-1] * 1000, 1),
+            'limit_remaining': self.limit_remaining
+        }
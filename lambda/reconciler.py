@@ -0,0 +1,294 @@
+"""
+Reminder schedule reconciliation
+
+Pushes reminders to a scheduler backend with as few API calls as possible:
+the desired schedules (one per reminder) are compared with the registered
+ones and only the differences are applied - creates for new reminders,
+updates for moved or reworded ones, deletes for cancelled ones. Nothing is
+sent for reminders that did not change.
+
+Backends implement list_schedules(tenant_ids) and apply(creates, updates, deletes):
+
+- SqliteScheduleBackend: local/in-memory (':memory:') backend for tests and local runs
+- EventBridgeScheduleBackend: one-off EventBridge Scheduler schedules that
+  invoke this function with {"action": "send_reminder", ...}
+
+SCHEDULE_BACKEND selects one (eventbridge, sqlite); by default reminders are
+only sent by the polling {"action": "send_reminders"} schedule.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+import instrumentation
+import timesource
+
+# EventBridge Scheduler has no batch API; this many calls run in parallel instead
+EVENTBRIDGE_CONCURRENCY = 8
+
+
+def schedule_name(reminder_key):
+    """
+    Stable schedule name for a reminder (EventBridge allows at most 64 characters)
+    """
+    return f"reminder-{hashlib.sha1(reminder_key.encode('utf-8')).hexdigest()[:24]}"
+
+
+def schedule_fingerprint(schedule):
+    data = json.dumps([schedule['fire_at'], schedule['payload']], sort_keys=True)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+def desired_schedules(reminders):
+    """
+    Turn scheduler reminders into {name: schedule} for reconciliation
+    """
+    schedules = {}
+    for reminder in reminders:
+        schedule = {
+            'name': schedule_name(reminder['key']),
+            'tenant_id': reminder['tenant_id'],
+            'fire_at': reminder['fire_at'],
+            'payload': {
+                'action': 'send_reminder',
+                'tenant_id': reminder['tenant_id'],
+                'recipient': reminder['recipient'],
+                'title': reminder['title'],
+                'message': reminder['message']
+            }
+        }
+        schedule['fingerprint'] = schedule_fingerprint(schedule)
+        schedules[schedule['name']] = schedule
+    return schedules
+
+
+def reconcile(desired, backend, tenant_ids):
+    """
+    Apply the minimal set of changes to make the backend match `desired`
+
+    Only schedules owned by `tenant_ids` are considered, so reconciling one
+    tenant never touches another's reminders. Returns counts of creates,
+    updates, deletes and unchanged schedules.
+    """
+    current = backend.list_schedules(tenant_ids)
+
+    creates = []
+    updates = []
+    for name, schedule in desired.items():
+        existing = current.get(name)
+        if existing is None:
+            creates.append(schedule)
+        elif existing['fingerprint'] != schedule['fingerprint']:
+            updates.append(schedule)
+
+    deletes = [schedule for name, schedule in current.items() if name not in desired]
+
+    if creates or updates or deletes:
+        backend.apply(creates, updates, deletes)
+
+    return {
+        'created': len(creates),
+        'updated': len(updates),
+        'deleted': len(deletes),
+        'unchanged': len(desired) - len(creates) - len(updates)
+    }
+
+
+class SqliteScheduleBackend:
+    def __init__(self, path=':memory:'):
+        import sqlite3
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.api_calls = 0
+        with self._lock, self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS schedules ('
+                'name TEXT PRIMARY KEY, tenant_id TEXT, fire_at REAL, payload TEXT, fingerprint TEXT)'
+            )
+
+    def list_schedules(self, tenant_ids=None):
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT name, tenant_id, fire_at, payload, fingerprint FROM schedules'
+            ).fetchall()
+
+        if tenant_ids is not None:
+            tenant_ids = set(tenant_ids)
+            rows = [row for row in rows if row[1] in tenant_ids]
+
+        return {
+            name: {'name': name, 'tenant_id': tenant_id, 'fire_at': fire_at,
+                   'payload': json.loads(payload), 'fingerprint': fingerprint}
+            for name, tenant_id, fire_at, payload, fingerprint in rows
+        }
+
+    def apply(self, creates, updates, deletes):
+        """
+        Apply all changes in one transaction
+        """
+        rows = [
+            (schedule['name'], schedule['tenant_id'], schedule['fire_at'],
+             json.dumps(schedule['payload']), schedule['fingerprint'])
+            for schedule in creates + updates
+        ]
+        with self._lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO schedules VALUES (?, ?, ?, ?, ?)', rows)
+            self.connection.executemany('DELETE FROM schedules WHERE name = ?',
+                                        [(schedule['name'],) for schedule in deletes])
+            self.api_calls += len(rows) + len(deletes)
+
+    def pop_due(self, now):
+        """
+        Remove and return schedules due at or before `now` (stands in for the scheduler firing)
+        """
+        due = [schedule for schedule in self.list_schedules().values() if schedule['fire_at'] <= now]
+        self.apply([], [], due)
+        return sorted(due, key=lambda schedule: schedule['fire_at'])
+
+
+class EventBridgeScheduleBackend:
+    """
+    One-off EventBridge Scheduler schedules, deleted by AWS after they fire
+
+    EventBridge cannot list schedule targets without one GetSchedule call per
+    schedule, so the registered set is mirrored in the state store (one
+    document per tenant) and reconciliation never needs to read from AWS.
+    """
+
+    def __init__(self, store, target_arn=None, role_arn=None, group=None, client=None):
+        self.store = store
+        self.target_arn = target_arn or self.default_target_arn()
+        self.role_arn = role_arn or os.environ.get('SCHEDULER_ROLE_ARN')
+        self.group = group or os.environ.get('SCHEDULE_GROUP', 'default')
+        self._client = client
+        self.api_calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_target_arn():
+        if os.environ.get('LAMBDA_FUNCTION_ARN'):
+            return os.environ['LAMBDA_FUNCTION_ARN']
+        return (f"arn:aws:lambda:{os.environ.get('AWS_REGION')}:{os.environ.get('AWS_ACCOUNT_ID')}"
+                f":function:{os.environ.get('AWS_LAMBDA_FUNCTION_NAME')}")
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('scheduler')
+        return self._client
+
+    def mirror_key(self, tenant_id):
+        return f"schedules:eventbridge:{self.group}:{tenant_id}"
+
+    def list_schedules(self, tenant_ids):
+        schedules = {}
+        for tenant_id in tenant_ids:
+            schedules.update(self.store.get(self.mirror_key(tenant_id)) or {})
+        return schedules
+
+    def schedule_request(self, schedule):
+        fire_at = datetime.fromtimestamp(schedule['fire_at'], timezone.utc)
+        return {
+            'Name': schedule['name'],
+            'GroupName': self.group,
+            'ScheduleExpression': f"at({fire_at.strftime('%Y-%m-%dT%H:%M:%S')})",
+            'ScheduleExpressionTimezone': 'UTC',
+            'FlexibleTimeWindow': {'Mode': 'OFF'},
+            'ActionAfterCompletion': 'DELETE',
+            'Target': {
+                'Arn': self.target_arn,
+                'RoleArn': self.role_arn,
+                'Input': json.dumps(schedule['payload'])
+            }
+        }
+
+    def call(self, operation, schedule, fallback=True):
+        """
+        Run one scheduler API call, falling back when the schedule is not in the expected state
+
+        A create that conflicts becomes an update and an update of a missing
+        schedule becomes a create, once; if that fails too the error is raised.
+        """
+        client = self.client
+        errors = client.exceptions
+
+        with self._lock:
+            self.api_calls += 1
+
+        try:
+            if operation == 'delete':
+                client.delete_schedule(Name=schedule['name'], GroupName=self.group)
+            elif operation == 'create':
+                client.create_schedule(**self.schedule_request(schedule))
+            else:
+                client.update_schedule(**self.schedule_request(schedule))
+        except errors.ConflictException:
+            # Already exists (an earlier run was interrupted before saving the mirror)
+            if operation == 'create' and fallback:
+                return self.call('update', schedule, fallback=False)
+            raise
+        except errors.ResourceNotFoundException:
+            # Already fired and deleted by AWS, or removed by hand
+            if operation == 'update' and fallback:
+                return self.call('create', schedule, fallback=False)
+            if operation != 'delete':
+                raise
+
+        return schedule
+
+    def apply(self, creates, updates, deletes):
+        now = timesource.time()
+
+        # Schedules that already fired were deleted by AWS; just forget them
+        deletes_to_call = [schedule for schedule in deletes if schedule['fire_at'] > now]
+
+        operations = ([('create', schedule) for schedule in creates]
+                      + [('update', schedule) for schedule in updates]
+                      + [('delete', schedule) for schedule in deletes_to_call])
+
+        tenant_ids = {schedule['tenant_id'] for schedule in creates + updates + deletes}
+        mirrors = {tenant_id: self.store.get(self.mirror_key(tenant_id)) or {} for tenant_id in tenant_ids}
+        failed = 0
+        with instrumentation.ContextThreadPoolExecutor(max_workers=EVENTBRIDGE_CONCURRENCY) as executor:
+            futures = [(operation, schedule, executor.submit(self.call, operation, schedule))
+                       for operation, schedule in operations]
+
+            for operation, schedule, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error during EventBridge {operation} of {schedule['name']}: {e}")
+                    failed += 1
+                    continue
+
+                if operation == 'delete':
+                    mirrors[schedule['tenant_id']].pop(schedule['name'], None)
+                else:
+                    mirrors[schedule['tenant_id']][schedule['name']] = schedule
+
+        for schedule in deletes:
+            if schedule['fire_at'] <= now:
+                mirrors[schedule['tenant_id']].pop(schedule['name'], None)
+
+        for tenant_id, mirror in mirrors.items():
+            self.store.put(self.mirror_key(tenant_id), mirror)
+        if failed:
+            print(f"⚠️ {failed} EventBridge schedule changes failed; they will be retried on the next run")
+
+
+def get_schedule_backend(store):
+    """
+    Create the backend selected by SCHEDULE_BACKEND (None when reminders are only polled)
+    """
+    backend = os.environ.get('SCHEDULE_BACKEND', '')
+
+    if backend == 'eventbridge':
+        return EventBridgeScheduleBackend(store)
+    if backend == 'sqlite':
+        return SqliteScheduleBackend(os.environ.get('SCHEDULE_DB', '/tmp/schedules.db'))
+    return None
@@ -0,0 +1,304 @@
+"""
+Local expansion of recurring events
+
+With singleEvents=True Google expands every recurring series on the server,
+so a weekly standup contributes one event per week of the window to every
+page of every query. With SYNC_MODE=expand the function instead keeps the
+recurring masters (their RRULE/EXRULE/RDATE/EXDATE lines) in the
+incrementally synced copy of each calendar and expands them here, for
+whatever window a digest or reminder run asks for:
+
+- masters are fetched once and then only when they change (sync tokens)
+- each series' rules are compiled once per container and month and cached
+- instances are generated lazily, only as far as the window reaches, and
+  rules without COUNT start walking near the window instead of at DTSTART,
+  so a daily series started years ago costs as much as a new one
+- overrides apply: a modified instance (an exception event with
+  recurringEventId/originalStartTime) replaces the generated one and a
+  cancelled instance removes it
+
+Rules are expanded in the series' own timezone, so a 09:00 meeting stays at
+09:00 local time across clock changes. Needs python-dateutil (shipped with
+boto3 in the Lambda runtime), imported only when a series is expanded.
+"""
+
+import importlib.util
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+
+from timezones import get_zone, parse_event_start
+
+# Compiled rule sets kept per container (one per distinct series and month)
+RULE_CACHE_SIZE = 1024
+
+# How far ahead a series is searched for another instance before it counts as ended
+UPCOMING_HORIZON = timedelta(days=366 * 8)
+
+# Day, week, month and year rules; sub-daily rules always walk from DTSTART
+PERIOD_FREQUENCIES = ('YEARLY', 'MONTHLY', 'WEEKLY', 'DAILY')
+
+UNTIL_PATTERN = re.compile(r'UNTIL=(\d{8})(T\d{6})?(Z)?')
+
+
+def is_available():
+    """
+    Check that python-dateutil is installed without importing it
+    """
+    return importlib.util.find_spec('dateutil') is not None
+
+
+def is_master(event):
+    return bool(event.get('recurrence'))
+
+
+def is_all_day(event):
+    return 'dateTime' not in event['start']
+
+
+def instance_key(start):
+    """
+    Key of an instance by its original start ({'dateTime'} or {'date'}), as in Google's instance IDs
+    """
+    if 'dateTime' in start:
+        return parse_event_start(start['dateTime']).astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    return start['date'].replace('-', '')
+
+
+def parse_rule_date(value, params, zone, all_day):
+    """
+    Parse an RDATE/EXDATE/UNTIL value: aware in `zone` for timed series, naive for all-day ones
+    """
+    if 'T' not in value:
+        moment = datetime.combine(datetime.strptime(value, '%Y%m%d').date(), time())
+        return moment if all_day else moment.replace(tzinfo=zone)
+
+    moment = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if all_day:
+        return datetime.combine(moment.date(), time())
+    if value.endswith('Z'):
+        return moment.replace(tzinfo=timezone.utc).astimezone(zone)
+    return moment.replace(tzinfo=get_zone(params['TZID']) if 'TZID' in params else zone)
+
+
+def normalize_until(rule, zone, all_day):
+    """
+    Make a rule's UNTIL match DTSTART the way dateutil requires (UTC for timed, floating for all-day)
+    """
+    def replace(match):
+        day, clock, utc = match.groups()
+        if all_day:
+            return f"UNTIL={day}"
+        if utc:
+            return match.group(0)
+        # A date-only or floating UNTIL: the series' local time, through the end of that day
+        until = parse_rule_date(day + (clock or 'T235959'), {}, zone, False)
+        return f"UNTIL={until.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+
+    return UNTIL_PATTERN.sub(replace, rule)
+
+
+def month_before(moment):
+    """
+    Anchor month for a window starting at `moment`: its first day is on or before the window's date in any timezone
+    """
+    moment = moment - timedelta(days=1)
+    return moment.year, moment.month
+
+
+def advance_rule(rule, value, dtstart, anchor):
+    """
+    Move a rule's start forward to a whole number of periods before `anchor` (year, month)
+
+    Every period (day, week, month or year) of a rule repeats the same
+    pattern, so from the new start on the rule yields exactly the instances
+    it would have yielded from DTSTART. The BY* parts dateutil derives from
+    DTSTART are passed explicitly so they do not move with it. Rules with
+    COUNT number their instances from DTSTART and are left alone.
+    """
+    parts = dict(part.split('=', 1) for part in value.upper().split(';') if '=' in part)
+    freq = parts.get('FREQ')
+    if freq not in PERIOD_FREQUENCIES or 'COUNT' in parts:
+        return rule
+
+    interval = int(parts.get('INTERVAL', '1'))
+    year, month = anchor
+    if freq == 'YEARLY':
+        periods = year - dtstart.year
+    elif freq == 'MONTHLY':
+        periods = (year - dtstart.year) * 12 + month - dtstart.month
+    else:
+        days = (date(year, month, 1) - dtstart.date()).days
+        periods = days // 7 if freq == 'WEEKLY' else days
+
+    # Keep one more period of margin before the anchor
+    shift = (periods // interval - 1) * interval
+    if shift <= 0:
+        return rule
+
+    if freq == 'YEARLY':
+        new_start = dtstart.replace(year=dtstart.year + shift, month=1, day=1)
+    elif freq == 'MONTHLY':
+        months = dtstart.month - 1 + shift
+        new_start = dtstart.replace(year=dtstart.year + months // 12, month=months % 12 + 1, day=1)
+    else:
+        new_start = dtstart + timedelta(days=shift * (7 if freq == 'WEEKLY' else 1))
+
+    defaults = {}
+    if not any(part in parts for part in ('BYWEEKNO', 'BYYEARDAY', 'BYMONTHDAY', 'BYDAY', 'BYEASTER')):
+        if freq == 'YEARLY':
+            if 'BYMONTH' not in parts:
+                defaults['bymonth'] = dtstart.month
+            defaults['bymonthday'] = dtstart.day
+        elif freq == 'MONTHLY':
+            defaults['bymonthday'] = dtstart.day
+        elif freq == 'WEEKLY':
+            defaults['byweekday'] = dtstart.weekday()
+    for part, field in (('BYHOUR', 'hour'), ('BYMINUTE', 'minute'), ('BYSECOND', 'second')):
+        if part not in parts:
+            defaults[f"by{field}"] = getattr(dtstart, field)
+
+    return rule.replace(dtstart=new_start, **defaults)
+
+
+@lru_cache(maxsize=RULE_CACHE_SIZE)
+def compile_recurrence(recurrence, start, start_zone, anchor=None):
+    """
+    Compile a series' recurrence lines into a dateutil rruleset
+
+    `recurrence` is the tuple of RRULE/EXRULE/RDATE/EXDATE lines, `start` the
+    master's start value and `start_zone` its timeZone (if any). With an
+    `anchor` (year, month) the rules only yield instances from about a month
+    before it on (see advance_rule).
+    """
+    from dateutil.rrule import rrulestr, rruleset
+
+    all_day = 'T' not in start
+    zone = get_zone(start_zone) if start_zone else None
+    if all_day:
+        dtstart = datetime.combine(date.fromisoformat(start), time())
+    else:
+        dtstart = parse_event_start(start)
+        if zone is not None:
+            dtstart = dtstart.astimezone(zone)
+        zone = dtstart.tzinfo
+
+    # DTSTART is always the first instance, whatever the rules say
+    rules = rruleset()
+    rules.rdate(dtstart)
+    for line in recurrence:
+        name, _, value = line.partition(':')
+        name, *param_list = name.split(';')
+        name = name.upper()
+        params = dict(param.split('=', 1) for param in param_list if '=' in param)
+
+        if name in ('RRULE', 'EXRULE'):
+            rule = rrulestr(normalize_until(value, zone, all_day), dtstart=dtstart)
+            if anchor is not None:
+                rule = advance_rule(rule, value, dtstart, anchor)
+            if name == 'RRULE':
+                rules.rrule(rule)
+            else:
+                rules.exrule(rule)
+        elif name in ('RDATE', 'EXDATE'):
+            for item in value.split(','):
+                moment = parse_rule_date(item, params, zone, all_day)
+                if name == 'RDATE':
+                    rules.rdate(moment)
+                else:
+                    rules.exdate(moment)
+
+    return rules
+
+
+def iter_instances(master, window_start, window_end, tz_name=None):
+    """
+    Lazily yield (original start, end) of a master's instances starting inside the window
+
+    Timed instances are aware datetimes; all-day instances are dates.
+    """
+    start = master['start'].get('dateTime', master['start'].get('date'))
+    rules = compile_recurrence(tuple(master['recurrence']), start, master['start'].get('timeZone'),
+                               month_before(window_start))
+
+    if is_all_day(master):
+        # All-day instances start at local midnight in the tenant's timezone
+        zone = get_zone(tz_name)
+        length = date.fromisoformat(master['end']['date']) - date.fromisoformat(start)
+        after = window_start.astimezone(zone).replace(tzinfo=None)
+        before = window_end.astimezone(zone).replace(tzinfo=None)
+        for moment in rules.xafter(after, inc=True):
+            if moment >= before:
+                return
+            yield moment.date(), moment.date() + length
+    else:
+        length = parse_event_start(master['end']['dateTime']) - parse_event_start(start)
+        for moment in rules.xafter(window_start, inc=True):
+            if moment >= window_end:
+                return
+            yield moment, moment + length
+
+
+def has_instances_after(master, moment, tz_name=None):
+    """
+    Check whether a series has any instance starting at or after an aware datetime
+
+    Only UPCOMING_HORIZON ahead is searched, so a rule that never matches
+    (say February 30th) cannot walk on for centuries.
+    """
+    horizon = moment + UPCOMING_HORIZON
+    return next(iter_instances(master, moment, horizon, tz_name), None) is not None
+
+
+def make_instance(master, start, end):
+    """
+    Build an instance in the API's event format (as singleEvents=True would return it)
+    """
+    if isinstance(start, datetime):
+        start_value = {'dateTime': start.isoformat()}
+        end_value = {'dateTime': end.isoformat()}
+    else:
+        start_value = {'date': start.isoformat()}
+        end_value = {'date': end.isoformat()}
+
+    instance = {
+        'id': f"{master['id']}_{instance_key(start_value)}",
+        'recurringEventId': master['id'],
+        'start': start_value,
+        'end': end_value
+    }
+    for field in ('summary', 'location'):
+        if field in master:
+            instance[field] = master[field]
+    return instance
+
+
+def expand_events(events, window_start, window_end, tz_name=None):
+    """
+    Yield the events starting inside the window from a calendar's stored events
+
+    `events` holds single events, recurring masters and their exceptions (as
+    returned with singleEvents=False); masters are replaced by their
+    instances with overrides applied. Events come out unordered.
+    """
+    masters = []
+    overridden = set()
+    for event in events:
+        if is_master(event):
+            masters.append(event)
+            continue
+
+        if 'recurringEventId' in event and 'originalStartTime' in event:
+            overridden.add((event['recurringEventId'], instance_key(event['originalStartTime'])))
+        if event.get('status') == 'cancelled':
+            continue
+
+        event_start = parse_event_start(event['start'].get('dateTime', event['start'].get('date')), tz_name)
+        if window_start <= event_start < window_end:
+            yield event
+
+    for master in masters:
+        for start, end in iter_instances(master, window_start, window_end, tz_name):
+            instance = make_instance(master, start, end)
+            if (master['id'], instance_key(instance['start'])) not in overridden:
+                yield instance
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Event reminder scheduling
+
+ReminderScheduler keeps pending reminders in a min-heap ordered by fire
+time. Scheduling and rescheduling push a new heap entry (O(log n));
+cancelling only drops the reminder from the index (O(1)) and stale heap
+entries are skipped when they reach the top, with an occasional rebuild to
+keep the heap compact. Popping due reminders never scans reminders that are
+not due yet.
+
+Reminders are persisted per tenant in the state store (reminders:<tenant>)
+so concurrent runs for different tenants never overwrite each other. Each
+document also holds the tenant's earliest fire time, so the polling run
+skips tenants with nothing due without rebuilding their reminders.
+
+Run this file to schedule and send reminders locally without AWS:
+
+    python reminders.py            # fetch today's events and send reminders as they come due
+    python reminders.py --dry-run  # print reminders instead of sending them
+"""
+
+import heapq
+import itertools
+import os
+from datetime import timedelta
+
+import timesource
+from timezones import parse_iso
+
+# How long before an event its reminder fires (0 disables reminders)
+REMINDER_MINUTES = int(os.environ.get('REMINDER_MINUTES', '30'))
+
+
+def build_reminder(event, lead_minutes=REMINDER_MINUTES):
+    """
+    Build the reminder title and message for a formatted event
+    """
+    location_text = f" at {event['location']}" if event['location'] else ""
+    message = f"⏰ {event['title']} starts in {lead_minutes} minutes ({event['time']}){location_text}"
+    return "Event Reminder", message
+
+
+class ReminderScheduler:
+    def __init__(self, lead_minutes=REMINDER_MINUTES):
+        self.lead = timedelta(minutes=lead_minutes)
+        self.lead_minutes = lead_minutes
+        self._heap = []
+        self._reminders = {}
+        self._by_tenant = {}
+        self._dirty = set()
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._reminders)
+
+    def __contains__(self, key):
+        return key in self._reminders
+
+    def get(self, key):
+        return self._reminders.get(key)
+
+    def reminders_for(self, tenant_id):
+        return [self._reminders[key] for key in self._by_tenant.get(tenant_id, ())]
+
+    def schedule(self, key, fire_at, tenant_id, recipient, title, message):
+        """
+        Add or reschedule a reminder (fire_at is a Unix timestamp)
+        """
+        reminder = {
+            'key': key,
+            'fire_at': fire_at,
+            'tenant_id': tenant_id,
+            'recipient': recipient,
+            'title': title,
+            'message': message,
+            'sequence': next(self._sequence)
+        }
+        self._reminders[key] = reminder
+        self._by_tenant.setdefault(tenant_id, set()).add(key)
+        self._dirty.add(tenant_id)
+        heapq.heappush(self._heap, (fire_at, reminder['sequence'], key))
+
+    def cancel(self, key):
+        """
+        Cancel a reminder; its heap entry is discarded lazily
+        """
+        reminder = self._reminders.pop(key, None)
+        if reminder is None:
+            return False
+
+        self._by_tenant[reminder['tenant_id']].discard(key)
+        self._dirty.add(reminder['tenant_id'])
+
+        # Rebuild once stale entries dominate the heap
+        if len(self._heap) > 2 * len(self._reminders) + 64:
+            self._heap = [(r['fire_at'], r['sequence'], k) for k, r in self._reminders.items()]
+            heapq.heapify(self._heap)
+
+        return True
+
+    def _is_current(self, entry):
+        reminder = self._reminders.get(entry[2])
+        return reminder is not None and reminder['sequence'] == entry[1]
+
+    def next_fire_time(self):
+        """
+        Get the fire time of the next pending reminder (None when there are none)
+        """
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """
+        Remove and return every reminder due at or before `now`, earliest first
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._is_current(entry):
+                reminder = self._reminders.pop(entry[2])
+                self._by_tenant[reminder['tenant_id']].discard(entry[2])
+                self._dirty.add(reminder['tenant_id'])
+                due.append(reminder)
+        return due
+
+    def retry_unsent(self, reminders, sent, now):
+        """
+        Put back reminders that were not sent, until their event starts
+
+        `sent` holds a flag per reminder, as returned by the delivery. Returns
+        how many were put back.
+        """
+        retried = 0
+        for reminder, delivered in zip(reminders, sent):
+            if not delivered and now < reminder['fire_at'] + self.lead.total_seconds():
+                self.schedule(reminder['key'], reminder['fire_at'], reminder['tenant_id'],
+                              reminder['recipient'], reminder['title'], reminder['message'])
+                retried += 1
+        return retried
+
+    def sync_tenant_events(self, tenant, events, now=None):
+        """
+        Make a tenant's reminders match their current events
+
+        New events get a reminder, moved or renamed events are rescheduled,
+        and reminders for cancelled events are dropped. Unchanged reminders
+        are left alone until their event starts, even once due, so a sync
+        between a reminder's fire time and its delivery (or retry) keeps it.
+        All-day events are skipped, and so are new reminders whose fire time
+        has already passed. Returns (scheduled, cancelled) counts.
+        """
+        now = timesource.time() if now is None else now
+        wanted = set()
+        scheduled = 0
+
+        for event in events:
+            if event['time'] == 'All day' or not event.get('id'):
+                continue
+
+            start = parse_iso(event['start'])
+            fire_at = (start - self.lead).timestamp()
+            key = f"{tenant['id']}:{event['id']}"
+
+            title, message = build_reminder(event, self.lead_minutes)
+            existing = self._reminders.get(key)
+            if existing and existing['fire_at'] == fire_at and existing['message'] == message \
+                    and existing['recipient'] == tenant.get('pushover_user'):
+                if now < start.timestamp():
+                    wanted.add(key)
+                continue
+
+            if fire_at <= now:
+                continue
+
+            wanted.add(key)
+            self.schedule(key, fire_at, tenant['id'], tenant.get('pushover_user'), title, message)
+            scheduled += 1
+
+        cancelled = 0
+        for key in list(self._by_tenant.get(tenant['id'], ())):
+            if key not in wanted:
+                self.cancel(key)
+                cancelled += 1
+
+        return scheduled, cancelled
+
+    def save(self, store):
+        """
+        Persist the reminders of every tenant changed since the last save or load
+        """
+        for tenant_id in self._dirty:
+            reminders = [
+                {field: value for field, value in self._reminders[key].items() if field != 'sequence'}
+                for key in self._by_tenant.get(tenant_id, ())
+            ]
+            next_fire_at = min((reminder['fire_at'] for reminder in reminders), default=None)
+            store.put(f"reminders:{tenant_id}", {'next_fire_at': next_fire_at, 'reminders': reminders})
+        self._dirty.clear()
+
+    @classmethod
+    def load(cls, store, tenant_ids, lead_minutes=REMINDER_MINUTES, due_by=None):
+        """
+        Rebuild a scheduler from the reminders persisted for the given tenants
+
+        With `due_by` (a timestamp) only tenants with a reminder due by then
+        are loaded; the others are left out and untouched by save().
+        """
+        scheduler = cls(lead_minutes)
+        for tenant_id in tenant_ids:
+            document = store.get(f"reminders:{tenant_id}") or {'next_fire_at': None, 'reminders': []}
+            if isinstance(document, list):
+                # Written before the documents held the earliest fire time
+                next_fire_at = min((reminder['fire_at'] for reminder in document), default=None)
+                document = {'next_fire_at': next_fire_at, 'reminders': document}
+
+            next_fire_at = document['next_fire_at']
+            if due_by is not None and (next_fire_at is None or next_fire_at > due_by):
+                continue
+
+            for reminder in document['reminders']:
+                sequence = next(scheduler._sequence)
+                scheduler._reminders[reminder['key']] = dict(reminder, sequence=sequence)
+                scheduler._by_tenant.setdefault(tenant_id, set()).add(reminder['key'])
+                scheduler._heap.append((reminder['fire_at'], sequence, reminder['key']))
+
+        heapq.heapify(scheduler._heap)
+        return scheduler
+
+
+class LocalReminderRunner:
+    """
+    Send reminders as they come due, in-process (no EventBridge needed)
+
+    `send(reminders)` receives the due reminders and returns whether each
+    one was sent; reminders that were not are retried until their event
+    starts.
+    """
+
+    def __init__(self, scheduler, send, clock=timesource.time, sleep=timesource.sleep, max_sleep=60,
+                 retry_delay=60):
+        self.scheduler = scheduler
+        self.send = send
+        self.clock = clock
+        self.sleep = sleep
+        self.max_sleep = max_sleep
+        self.retry_delay = retry_delay
+
+    def run_pending(self):
+        """
+        Send every reminder that is due now and return the ones that were sent
+        """
+        now = self.clock()
+        due = self.scheduler.pop_due(now)
+        if not due:
+            return due
+
+        sent = self.send(due)
+        self.scheduler.retry_unsent(due, sent, now)
+        return [reminder for reminder, delivered in zip(due, sent) if delivered]
+
+    def run(self, until=None):
+        """
+        Keep sending reminders until `until` (a timestamp) or until none are left
+        """
+        while True:
+            self.run_pending()
+
+            next_fire = self.scheduler.next_fire_time()
+            now = self.clock()
+            if next_fire is None or (until is not None and now >= until):
+                return
+
+            # A reminder put back for retry is already due: wait before resending
+            wait = min(next_fire - now if next_fire > now else self.retry_delay, self.max_sleep)
+            if until is not None:
+                wait = min(wait, until - now)
+            self.sleep(max(wait, 0))
+
+
+def main():
+    import argparse
+
+    from lambda_function import LambdaScheduleNotifier
+    from tenants import load_tenants
+
+    parser = argparse.ArgumentParser(description='Send event reminders locally')
+    parser.add_argument('--dry-run', action='store_true', help='print reminders instead of sending them')
+    args = parser.parse_args()
+
+    notifier = LambdaScheduleNotifier()
+    scheduler = ReminderScheduler()
+    tenants = load_tenants()
+
+    for tenant in tenants:
+        events = []
+        for calendar_id in tenant['calendars']:
+            events.extend(notifier.get_calendar_events(calendar_id, tenant['google_credentials'], tenant['id'],
+                                                         tenant.get('timezone')))
+        scheduled, _ = scheduler.sync_tenant_events(tenant, events)
+        print(f"⏰ Scheduled {scheduled} reminders for {tenant['id']}")
+
+    def send(reminders):
+        if args.dry_run:
+            for reminder in reminders:
+                print(f"[{reminder['tenant_id']}] {reminder['title']}: {reminder['message']}")
+            return [True] * len(reminders)
+        return notifier.deliver_reminders(tenants, reminders)
+
+    LocalReminderRunner(scheduler, send).run()
+    print("✅ No reminders left for today")
+
+
+if __name__ == '__main__':
+    main()
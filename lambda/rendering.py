@@ -0,0 +1,349 @@
+"""
+Notification rendering
+
+Digests and change notifications are rendered into a Document (a header
+line and sections of lines) from templates, then paginated for each
+backend's size limits:
+
+- Pushover accepts titles of up to 250 and messages of up to 1024
+  characters. A schedule that does not fit is split at line boundaries into
+  numbered continuation messages ("Daily Schedule (2/3)"), a line that is
+  longer than a whole message is abbreviated, and past MAX_MESSAGES
+  messages the rest is summed up as "…and N more events".
+- Email and webhooks get the whole document in one message.
+
+Every tenant can override any of DEFAULT_TEMPLATES with `templates` and pick
+`render: "html"` (default RENDER_MODE) for HTML messages, which Pushover and
+email display with bold and italic text. Templates are compiled once per
+container and the compiled renderers are shared by every tenant with the
+same settings; rendering and pagination are a single pass over the lines,
+so fan-out stays linear in the size of the output.
+"""
+
+import html
+import os
+import re
+import string
+from datetime import date
+from functools import lru_cache
+
+from digests import group_events_by_day
+
+RENDER_MODE = os.environ.get('RENDER_MODE', 'text')
+
+# Most messages one notification may be split into
+MAX_MESSAGES = int(os.environ.get('MAX_MESSAGES', '4'))
+
+ELLIPSIS = '…'
+
+DEFAULT_TEMPLATES = {
+    'header': "{day}'s Schedule ({count} events):",
+    'multi_day_header': "Upcoming Schedule ({count} events):",
+    'day': "{date:%A, %B %d}",
+    'event': "• {time} - {title}{location}",
+    'location': " ({location})",
+    'empty': "No events scheduled for {day_lower}! 🎉",
+    'multi_day_empty': "No events scheduled! 🎉",
+    'continued': "(continued)",
+    'more': "…and {count} more events"
+}
+
+# Bold headings and times, italic locations
+HTML_TEMPLATES = dict(DEFAULT_TEMPLATES, **{
+    'header': "<b>{day}'s Schedule ({count} events):</b>",
+    'multi_day_header': "<b>Upcoming Schedule ({count} events):</b>",
+    'day': "<b>{date:%A, %B %d}</b>",
+    'event': "• <b>{time}</b> - {title}{location}",
+    'location': " <i>({location})</i>",
+    'continued': "<i>(continued)</i>",
+    'more': "<i>…and {count} more events</i>"
+})
+
+# Fields each template may use
+TEMPLATE_FIELDS = {
+    'header': {'day', 'count'},
+    'multi_day_header': {'count'},
+    'day': {'date'},
+    'event': {'time', 'title', 'location'},
+    'location': {'location'},
+    'empty': {'day', 'day_lower'},
+    'multi_day_empty': set(),
+    'continued': set(),
+    'more': {'count'}
+}
+
+RENDER_MODES = ('text', 'html')
+
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+class Markup(str):
+    """
+    A message rendered as HTML; backends that can display HTML send it as such
+    """
+
+
+class CompiledTemplate:
+    """
+    A template parsed once into literal text and (field, format spec) parts
+    """
+
+    def __init__(self, source):
+        self.parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if literal:
+                self.parts.append((literal, None))
+            if field is not None:
+                if not field or conversion:
+                    raise ValueError(f"Unsupported template field in {source!r}")
+                self.parts.append((field, spec))
+        self.fields = {field for field, spec in self.parts if spec is not None}
+
+    def render(self, values):
+        return ''.join(part if spec is None else format(values[part], spec) for part, spec in self.parts)
+
+
+@lru_cache(maxsize=256)
+def compile_template(source):
+    return CompiledTemplate(source)
+
+
+def validate_templates(templates):
+    """
+    Check a tenant's template overrides, raising ValueError for unknown templates or fields
+    """
+    for name, source in (templates or {}).items():
+        if name not in TEMPLATE_FIELDS:
+            raise ValueError(f"Unknown template: {name}")
+        unknown = compile_template(source).fields - TEMPLATE_FIELDS[name]
+        if unknown:
+            raise ValueError(f"Unknown fields in template {name}: {', '.join(sorted(unknown))}")
+
+
+class Document:
+    """
+    A rendered notification: title, optional header and sections of (heading, lines)
+
+    `events` is how many event lines it holds (what "…and N more" counts).
+    """
+
+    def __init__(self, title, header=None, sections=None, renderer=None, events=0):
+        self.title = title
+        self.header = header
+        self.sections = sections or []
+        self.renderer = renderer or get_renderer()
+        self.events = events
+
+    @property
+    def html(self):
+        return self.renderer.mode == 'html'
+
+    def wrap(self, text):
+        return Markup(text) if self.html else text
+
+    @property
+    def text(self):
+        """
+        The whole message as one string
+        """
+        parts = []
+        if self.header:
+            parts.append(self.header + ('\n\n' if self.sections else ''))
+        for index, (heading, lines) in enumerate(self.sections):
+            if index:
+                parts.append('\n')
+            if heading:
+                parts.append(heading + '\n')
+            parts.extend(line + '\n' for line in lines)
+        return self.wrap(''.join(parts))
+
+    def paginate(self, max_title=None, max_message=None, max_messages=MAX_MESSAGES):
+        """
+        Split into (title, message) pairs that fit the limits (None: unlimited)
+        """
+        text = self.text
+        if max_message is None or len(text) <= max_message:
+            return [(abbreviate(self.title, max_title), text)]
+
+        more_reserve = len(self.renderer.more(self.events)) + 1
+        continued = self.renderer.continued() + '\n\n'
+
+        pages = []
+        parts = []
+        length = 0
+        page_lines = 0
+        emitted = 0
+
+        def budget():
+            # The last allowed page keeps room for the "…and N more" line
+            return max_message - (more_reserve if len(pages) == max_messages - 1 else 0)
+
+        def add(piece):
+            nonlocal length
+            parts.append(piece)
+            length += len(piece)
+
+        def new_page(heading_text=''):
+            """
+            Start a continuation page (False when the message limit is reached)
+            """
+            nonlocal parts, length, page_lines
+            if len(pages) + 1 >= max_messages:
+                return False
+            pages.append(''.join(parts))
+            parts, length, page_lines = [], 0, 0
+            add(continued + heading_text)
+            return True
+
+        if self.header:
+            add(self.header + '\n\n')
+
+        truncated = False
+        for index, (heading, lines) in enumerate(self.sections):
+            heading_text = heading + '\n' if heading else ''
+            separator = '\n' if index and page_lines else ''
+            first_line = len(lines[0]) + 1 if lines else 0
+
+            # Move the section to the next page rather than leave its heading alone at the bottom
+            if page_lines and length + len(separator) + len(heading_text) + first_line > budget():
+                if not new_page():
+                    truncated = True
+                    break
+                separator = ''
+            add(separator + heading_text)
+
+            for line in lines:
+                line_text = line + '\n'
+                if page_lines and length + len(line_text) > budget():
+                    if not new_page(heading_text):
+                        truncated = True
+                        break
+                if length + len(line_text) > budget():
+                    # Longer than a whole page: abbreviate the line
+                    line_text = self.renderer.abbreviate_line(line, budget() - length - 1) + '\n'
+                add(line_text)
+                page_lines += 1
+                emitted += 1
+
+            if truncated:
+                break
+
+        if emitted < self.events:
+            add(self.renderer.more(self.events - emitted) + '\n')
+        pages.append(''.join(parts))
+
+        if len(pages) == 1:
+            return [(abbreviate(self.title, max_title), self.wrap(pages[0]))]
+
+        messages = []
+        for number, page in enumerate(pages, 1):
+            suffix = f" ({number}/{len(pages)})"
+            title = abbreviate(self.title, max_title - len(suffix) if max_title else None) + suffix
+            messages.append((title, self.wrap(page)))
+        return messages
+
+
+def abbreviate(text, limit):
+    """
+    Cut plain text to at most `limit` characters, ending with an ellipsis when cut
+    """
+    if limit is None or len(text) <= limit:
+        return text
+    return text[:max(limit - 1, 0)] + ELLIPSIS
+
+
+class Renderer:
+    """
+    Compiled templates for one render mode and set of template overrides
+    """
+
+    def __init__(self, mode='text', templates=None):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {mode}")
+        validate_templates(templates)
+
+        self.mode = mode
+        sources = dict(HTML_TEMPLATES if mode == 'html' else DEFAULT_TEMPLATES, **(templates or {}))
+        self.templates = {name: compile_template(source) for name, source in sources.items()}
+        self.escape = html.escape if mode == 'html' else str
+
+    def render(self, name, **values):
+        return self.templates[name].render(values)
+
+    def event_line(self, event):
+        location = ''
+        if event['location']:
+            location = self.render('location', location=self.escape(event['location']))
+        return self.render('event', time=event['time'], title=self.escape(event['title']), location=location)
+
+    def plain_line(self, line):
+        return self.escape(line)
+
+    def abbreviate_line(self, line, limit):
+        limit = max(limit, 1)
+        if self.mode != 'html':
+            return abbreviate(line, limit)
+
+        # Cutting through markup could leave a tag open: abbreviate the line's text without it
+        plain = html.unescape(TAG_PATTERN.sub('', line))
+        length = limit
+        while True:
+            escaped = html.escape(abbreviate(plain, length))
+            if len(escaped) <= limit or length <= 1:
+                return escaped
+            # Escaping lengthens the text: shrink in proportion until it fits
+            length = min(length - 1, length * limit // len(escaped))
+
+    def continued(self):
+        return self.render('continued')
+
+    def more(self, count):
+        return self.render('more', count=count)
+
+    def schedule(self, title, events, day='Today'):
+        """
+        One day's events under a "<day>'s Schedule" header
+        """
+        lines = [self.event_line(event) for event in events]
+        if not lines:
+            return Document(title, self.render('empty', day=day, day_lower=day.lower()), renderer=self)
+
+        header = self.render('header', day=day, count=len(lines))
+        return Document(title, header, [(None, lines)], renderer=self, events=len(lines))
+
+    def multi_day(self, title, events, first_day):
+        """
+        Several days of events, one section per day
+        """
+        sections = []
+        count = 0
+        for day, day_events in group_events_by_day(events, first_day):
+            heading = self.render('day', date=date.fromisoformat(day))
+            sections.append((heading, [self.event_line(event) for event in day_events]))
+            count += len(day_events)
+
+        if not sections:
+            return Document(title, self.render('multi_day_empty'), renderer=self)
+
+        return Document(title, self.render('multi_day_header', count=count), sections, renderer=self, events=count)
+
+    def lines(self, title, lines):
+        """
+        Pre-formatted plain text lines (change notifications)
+        """
+        return Document(title, sections=[(None, [self.plain_line(line) for line in lines])], renderer=self,
+                        events=len(lines))
+
+
+@lru_cache(maxsize=256)
+def _get_renderer(mode, templates):
+    return Renderer(mode, dict(templates))
+
+
+def get_renderer(tenant=None):
+    """
+    Get the (cached) renderer for a tenant's render mode and templates
+    """
+    tenant = tenant or {}
+    templates = tuple(sorted((tenant.get('templates') or {}).items()))
+    return _get_renderer(tenant.get('render') or RENDER_MODE, templates)
@@ -0,0 +1,277 @@
+"""
+Conditional-request cache for Calendar API reads
+
+Most invocations - the daily digest, webhook runs, reminder checks - read
+windows of calendars that have not changed since the last read. The
+ResponseCache keeps each events.list page with its ETag, keyed by tenant,
+calendar and query, and sends the ETag back as If-None-Match: an unchanged
+page then costs a 304 with no body, and the cached (already parsed) page is
+used instead of downloading and parsing it again.
+
+- an in-memory LRU layer shared by the worker threads of a warm container,
+  capped at RESPONSE_CACHE_MB of (serialized) responses
+- entries expire RESPONSE_CACHE_TTL seconds after they were last fetched or
+  revalidated, so pages of past windows do not linger
+- an optional on-disk tier (RESPONSE_CACHE_DIR, e.g. /tmp/calendar_responses,
+  capped at RESPONSE_CACHE_DISK_MB) that holds more than the memory layer and
+  survives runtime restarts within the same container
+
+Every read is still revalidated with Google, so a cached page is never
+served stale. Cached pages are shared: callers must not modify them.
+RESPONSE_CACHE_MB=0 turns the cache off.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import instrumentation
+import timesource
+
+# Memory the cached responses may take, in MB of serialized JSON (0: no caching)
+RESPONSE_CACHE_MB = float(os.environ.get('RESPONSE_CACHE_MB', '16'))
+
+# Seconds an entry is kept after it was last fetched or revalidated
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', '86400'))
+
+# On-disk tier (off unless a directory is given) and its size limit
+RESPONSE_CACHE_DIR = os.environ.get('RESPONSE_CACHE_DIR', '')
+RESPONSE_CACHE_DISK_MB = float(os.environ.get('RESPONSE_CACHE_DISK_MB', '64'))
+
+NOT_MODIFIED = 304
+
+
+def response_key(*parts):
+    """
+    Cache key for a request (also its file name on disk, so it holds no calendar IDs)
+    """
+    return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()[:32]
+
+
+def is_not_modified(error):
+    return getattr(getattr(error, 'resp', None), 'status', None) == NOT_MODIFIED
+
+
+class DiskTier:
+    """
+    Cached responses as one JSON file per key; the file's mtime is when it was last validated
+
+    The mtime is set from the cache's clock, so it follows a simulated clock too.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._bytes = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """
+        Read an entry as (etag, body, validated_at, size), None if missing or unreadable
+        """
+        try:
+            with open(self.path(key), 'r') as f:
+                payload = f.read()
+                validated_at = os.fstat(f.fileno()).st_mtime
+            entry = json.loads(payload)
+            return entry['etag'], entry['body'], validated_at, len(payload)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, etag, payload, validated_at):
+        data = f'{{"etag": {json.dumps(etag)}, "body": {payload}}}'
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.utime(tmp_path, (validated_at, validated_at))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing the response cache: {e}")
+            return
+
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += len(data)
+            if self._bytes is None or self._bytes > self.max_bytes:
+                self.prune()
+
+    def touch(self, key, validated_at):
+        try:
+            os.utime(self.path(key), (validated_at, validated_at))
+        except OSError:
+            pass
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def prune(self):
+        """
+        Recount the directory and delete the least recently validated files until it fits
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            # Leave files other threads are still writing alone
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._bytes = total
+
+
+class ResponseCache:
+    def __init__(self, max_bytes, ttl=RESPONSE_CACHE_TTL, disk=None, clock=timesource.time):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk = disk
+        self.clock = clock
+        # key -> (etag, body, validated_at, size), least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, key, entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[3]
+            if entry[3] > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry[3]
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[3]
+                instrumentation.count('response_cache_evictions')
+
+    def _remove(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[3]
+
+    def get(self, key):
+        """
+        Get an entry that has not expired as (etag, body, validated_at, size), or None
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None and now - entry[2] > self.ttl:
+            self._remove(key)
+            entry = None
+
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                if now - entry[2] > self.ttl:
+                    self.disk.delete(key)
+                    return None
+                instrumentation.count('response_cache_disk_reads')
+                self._store(key, entry)
+
+        return entry
+
+    def put(self, key, etag, body):
+        payload = json.dumps(body, separators=(',', ':'))
+        validated_at = self.clock()
+        self._store(key, (etag, body, validated_at, len(payload)))
+        if self.disk is not None:
+            self.disk.put(key, etag, payload, validated_at)
+
+    def revalidated(self, key, entry):
+        """
+        Record that the API confirmed an entry is still current (restarts its TTL)
+        """
+        validated_at = self.clock()
+        self._store(key, entry[:2] + (validated_at,) + entry[3:])
+        if self.disk is not None:
+            self.disk.touch(key, validated_at)
+
+    def execute(self, request, key):
+        """
+        Execute a GET request (discovery or REST client), answering from the cache when it is unchanged
+        """
+        entry = self.get(key)
+        if entry is not None:
+            request.headers['If-None-Match'] = entry[0]
+
+        # Discovery-client requests hand the raw response only to their postproc
+        postproc = getattr(request, 'postproc', None)
+        if postproc is not None:
+            def etag_postproc(resp, content):
+                request.etag = resp.get('etag')
+                return postproc(resp, content)
+            request.postproc = etag_postproc
+
+        try:
+            body = request.execute()
+        except Exception as e:
+            if entry is None or not is_not_modified(e):
+                raise
+            instrumentation.count('response_cache_hits')
+            self.revalidated(key, entry)
+            return entry[1]
+
+        instrumentation.count('response_cache_misses')
+        etag = getattr(request, 'etag', None)
+        if etag:
+            self.put(key, etag, body)
+        elif entry is not None:
+            self._remove(key)
+        return body
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Get the container's response cache (None when RESPONSE_CACHE_MB=0)
+    """
+    global _response_cache
+
+    if RESPONSE_CACHE_MB <= 0:
+        return None
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            disk = None
+            if RESPONSE_CACHE_DIR:
+                try:
+                    disk = DiskTier(RESPONSE_CACHE_DIR, int(RESPONSE_CACHE_DISK_MB * 1024 * 1024))
+                except OSError as e:
+                    print(f"Response cache directory unavailable, caching in memory only: {e}")
+            _response_cache = ResponseCache(int(RESPONSE_CACHE_MB * 1024 * 1024), RESPONSE_CACHE_TTL, disk)
+
+    return _response_cache
@@ -0,0 +1,172 @@
+"""
+Lightweight Google Calendar client
+
+Calls the Calendar v3 REST endpoint directly over the shared keep-alive
+session and refreshes the OAuth access token itself, so the function can
+skip importing google-auth and googleapiclient (and parsing the discovery
+document) entirely.
+
+It mirrors the small part of the googleapiclient interface the notifier
+uses - service.events().list(**params).execute(), events().watch() and
+channels().stop(), with request.headers for extra headers and request.etag
+holding the response's ETag - and raises errors with a `resp.status` like
+googleapiclient's HttpError, so it can be swapped in with
+CALENDAR_CLIENT=rest. Batch requests are not supported.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import instrumentation
+from http_session import TIMEOUTS, get_session
+from token_cache import get_token_cache
+
+CALENDAR_API_URL = 'https://www.googleapis.com/calendar/v3'
+TOKEN_URI = 'https://oauth2.googleapis.com/token'
+
+# Refresh the access token this long (seconds) before it expires
+TOKEN_REFRESH_MARGIN = 300
+
+
+class RestResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class RestCalendarError(Exception):
+    """
+    Error response from the Calendar API (e.resp.status holds the HTTP status)
+    """
+
+    def __init__(self, status, content):
+        super().__init__(f"Calendar API returned {status}: {content}")
+        self.resp = RestResponse(status)
+        self.content = content
+
+
+class RestRequest:
+    def __init__(self, client, method, path, params, body=None):
+        self.client = client
+        self.method = method
+        self.path = path
+        self.params = params
+        self.body = body
+        self.headers = {}
+        self.etag = None
+
+    def execute(self):
+        response = self.client.send(self.method, self.path, self.params, self.body, self.headers)
+        self.etag = response.headers.get('ETag')
+        # channels.stop answers 204 with no body
+        return response.json() if response.content else {}
+
+
+class RestEventsResource:
+    def __init__(self, client):
+        self.client = client
+
+    def list(self, calendarId, **params):
+        return RestRequest(self.client, 'GET', f"/calendars/{quote(calendarId, safe='')}/events", params)
+
+    def watch(self, calendarId, body, **params):
+        return RestRequest(self.client, 'POST', f"/calendars/{quote(calendarId, safe='')}/events/watch", params, body)
+
+
+class RestChannelsResource:
+    def __init__(self, client):
+        self.client = client
+
+    def stop(self, body):
+        return RestRequest(self.client, 'POST', '/channels/stop', {}, body)
+
+
+class RestCalendarClient:
+    def __init__(self, creds_dict, api_url=None, session=None):
+        self.api_url = (api_url or os.environ.get('CALENDAR_API_URL', CALENDAR_API_URL)).rstrip('/')
+        self.token_uri = creds_dict.get('token_uri') or TOKEN_URI
+        self.client_id = creds_dict.get('client_id')
+        self.client_secret = creds_dict.get('client_secret')
+        self.refresh_token = creds_dict.get('refresh_token')
+        self.session = session
+
+        # Reuse the embedded access token only when its expiry is known
+        self.access_token = None
+        self.expires_at = 0
+        if creds_dict.get('token') and creds_dict.get('expiry'):
+            expiry = datetime.fromisoformat(creds_dict['expiry'].replace('Z', '+00:00'))
+            if expiry.tzinfo is None:
+                expiry = expiry.replace(tzinfo=timezone.utc)
+            self.access_token = creds_dict['token']
+            self.expires_at = expiry.timestamp()
+        self._lock = threading.Lock()
+
+    def events(self):
+        return RestEventsResource(self)
+
+    def channels(self):
+        return RestChannelsResource(self)
+
+    def refresh_access_token(self):
+        """
+        Exchange the refresh token for a new access token, returning (token, expires_at)
+        """
+        with instrumentation.timer('token_refresh'):
+            response = (self.session or get_session()).post(self.token_uri, data={
+                'grant_type': 'refresh_token',
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'refresh_token': self.refresh_token
+            }, timeout=TIMEOUTS)
+        instrumentation.count('token_refreshes')
+
+        if response.status_code != 200:
+            raise RestCalendarError(response.status_code, response.text)
+
+        token = response.json()
+        return token['access_token'], time.time() + int(token.get('expires_in', 3600))
+
+    def get_access_token(self, force_refresh=False):
+        """
+        Get a valid access token, going through the shared token cache when it is close to expiry
+        """
+        with self._lock:
+            if force_refresh or not self.access_token or time.time() > self.expires_at - TOKEN_REFRESH_MARGIN:
+                if not self.refresh_token:
+                    raise RestCalendarError(401, 'No refresh token available')
+
+                self.access_token, self.expires_at = get_token_cache().get_token(
+                    self.client_id, self.refresh_token, self.client_secret, self.refresh_access_token,
+                    force=force_refresh
+                )
+
+            return self.access_token
+
+    def send(self, method, path, params, body=None, headers=None):
+        """
+        Send one API request, refreshing the token and retrying once on 401; returns the response
+        """
+        query = {}
+        for name, value in params.items():
+            if value is None:
+                continue
+            query[name] = ('true' if value else 'false') if isinstance(value, bool) else value
+
+        session = self.session or get_session()
+        for attempt in range(2):
+            access_token = self.get_access_token(force_refresh=attempt > 0)
+            request_headers = dict(headers or {}, Authorization=f"Bearer {access_token}")
+            response = session.request(method, f"{self.api_url}{path}", params=query, json=body,
+                                       headers=request_headers, timeout=TIMEOUTS)
+            instrumentation.count('calendar_bytes', len(response.content))
+
+            if response.status_code != 401:
+                break
+            instrumentation.count('calendar_retries')
+
+        if not 200 <= response.status_code < 300:
+            raise RestCalendarError(response.status_code, response.text)
+
+        return response
@@ -0,0 +1,225 @@
+"""
+Small key/value state stores for the Lambda function
+
+Every store keeps JSON-serialisable documents under string keys and offers
+get, put, delete, add (create only if the key is absent) and advance
+(replace only with a document whose counter field is higher). The JSON
+file backend suits local runs and a single warm container (/tmp); the
+DynamoDB backend shares state between containers using the existing
+calendar-webhook-info table (partition key: id).
+
+Collections that can outgrow one DynamoDB item (400 KB) are split into
+bucket documents with load_buckets/save_buckets.
+"""
+
+import json
+import os
+import threading
+import zlib
+from urllib.parse import quote
+
+DEFAULT_STATE_DIR = '/tmp/calendar_state'
+DEFAULT_STATE_TABLE = 'calendar-webhook-info'
+
+# Bucket documents hold at most this much JSON (DynamoDB items are capped at 400 KB)
+BUCKET_BYTES = 256 * 1024
+MAX_BUCKETS = 1024
+
+# One lock per state directory, shared by every JsonFileStore on it (get_store() creates a store per call)
+_dir_locks = {}
+_dir_locks_lock = threading.Lock()
+
+
+class JsonFileStore:
+    """
+    Store each document as its own JSON file in a directory on local disk
+
+    A write touches only its own document, so a run that saves state for
+    hundreds of users costs one small file write per user. Documents are
+    replaced atomically (written to a temporary file, then renamed), so
+    readers never see half a document and need no lock.
+    """
+
+    def __init__(self, directory=DEFAULT_STATE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        with _dir_locks_lock:
+            self._lock = _dir_locks.setdefault(os.path.abspath(directory), threading.Lock())
+
+    def path(self, key):
+        return os.path.join(self.directory, quote(key, safe='') + '.json')
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_temp(self, key, value):
+        tmp_path = f"{self.path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(value, f)
+        return tmp_path
+
+    def put(self, key, value):
+        os.replace(self._write_temp(key, value), self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def add(self, key, value):
+        """
+        Store a document only if the key is absent; returns whether it was stored
+        """
+        tmp_path = self._write_temp(key, value)
+        try:
+            # link() fails if the document exists, atomically, even across processes
+            os.link(tmp_path, self.path(key))
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def advance(self, key, value, field):
+        """
+        Store a document only if its `field` is greater than the stored document's; returns whether it was stored
+        """
+        with self._lock:
+            stored = self.get(key)
+            if stored is not None and field in stored and stored[field] >= value[field]:
+                return False
+            self.put(key, value)
+            return True
+
+
+class DynamoDBStore:
+    """
+    Store documents as items in a DynamoDB table ({'id': key, 'data': json})
+
+    Uses the low-level client, which (unlike boto3 resources) is safe to share
+    between the notifier's worker threads.
+    """
+
+    def __init__(self, table_name=DEFAULT_STATE_TABLE, client=None):
+        self.table_name = table_name
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('dynamodb')
+        return self._client
+
+    def get(self, key):
+        item = self.client.get_item(TableName=self.table_name, Key={'id': {'S': key}}).get('Item')
+        if not item:
+            return None
+        return json.loads(item['data']['S'])
+
+    def put(self, key, value):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={'id': {'S': key}, 'data': {'S': json.dumps(value)}}
+        )
+
+    def delete(self, key):
+        self.client.delete_item(TableName=self.table_name, Key={'id': {'S': key}})
+
+    def add(self, key, value):
+        """
+        Store a document only if the key is absent (conditional put); returns whether it was stored
+        """
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={'id': {'S': key}, 'data': {'S': json.dumps(value)}},
+                ConditionExpression='attribute_not_exists(id)'
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def advance(self, key, value, field):
+        """
+        Store a document only if its `field` is greater than the stored document's; returns whether it was stored
+
+        The field is also kept as a numeric attribute of the item so the
+        comparison runs inside DynamoDB as a conditional put.
+        """
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={'id': {'S': key}, 'data': {'S': json.dumps(value)}, field: {'N': str(value[field])}},
+                ConditionExpression='attribute_not_exists(#field) OR #field < :value',
+                ExpressionAttributeNames={'#field': field},
+                ExpressionAttributeValues={':value': {'N': str(value[field])}}
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+
+def get_store():
+    """
+    Create the state store selected by the STATE_STORE environment variable
+    """
+    backend = os.environ.get('STATE_STORE', 'file')
+
+    if backend == 'dynamodb':
+        return DynamoDBStore(os.environ.get('STATE_TABLE', DEFAULT_STATE_TABLE))
+
+    return JsonFileStore(os.environ.get('STATE_DIR', DEFAULT_STATE_DIR))
+
+
+def bucket_of(item_id, buckets):
+    """
+    Bucket that holds an item (stable across processes, unlike hash())
+    """
+    return zlib.crc32(item_id.encode('utf-8')) % buckets
+
+
+def load_buckets(store, key, head):
+    """
+    Load the bucket documents a head document points to, as a list of {item ID: item}
+
+    A collection saved by save_buckets is a head document {'buckets': n, ...}
+    and n bucket documents "<key>:<n>:<i>", each holding the items whose ID
+    hashes to bucket i.
+    """
+    count = head.get('buckets', 0)
+    return [store.get(f"{key}:{count}:{index}") or {} for index in range(count)]
+
+
+def save_buckets(store, key, items, head, stored_buckets, max_bytes=BUCKET_BYTES, max_buckets=MAX_BUCKETS):
+    """
+    Save {item ID: item} in as few buckets as keep each under `max_bytes`, then the head document
+
+    Only buckets that differ from `stored_buckets` (as loaded) are written.
+    When the number of buckets changes the new buckets get new keys and the
+    head switches to them in one write, so a run that fails halfway never
+    leaves a mixed collection; the old buckets are deleted afterwards.
+    """
+    count = 1
+    while True:
+        buckets = [{} for _ in range(count)]
+        for item_id, item in items.items():
+            buckets[bucket_of(item_id, count)][item_id] = item
+        if count >= max_buckets or all(len(json.dumps(bucket)) <= max_bytes for bucket in buckets):
+            break
+        count *= 2
+
+    stored_count = len(stored_buckets)
+    for index, bucket in enumerate(buckets):
+        if count != stored_count or bucket != stored_buckets[index]:
+            store.put(f"{key}:{count}:{index}", bucket)
+    store.put(key, dict(head, buckets=count))
+
+    if stored_count and stored_count != count:
+        for index in range(stored_count):
+            store.delete(f"{key}:{stored_count}:{index}")
@@ -0,0 +1,104 @@
+"""
+Tenant configuration for the Lambda function
+
+A tenant is one person who gets notifications: their Google credentials,
+the calendars to read and where to deliver to: `pushover_user`, `email`
+and/or `webhook_url`, for whichever NOTIFICATION_BACKENDS are enabled (see
+backends.py). Every tenant needs an address some enabled backend can use.
+
+TENANTS_CONFIG holds a JSON list of tenants, either as plain JSON, base64
+encoded JSON or a path to a JSON file:
+
+    [
+      {
+        "id": "alice",
+        "google_credentials": "<base64 credentials from generate_google_credentials.py>",
+        "calendars": ["primary", "team@group.calendar.google.com"],
+        "pushover_user": "<pushover user key>",
+        "timezone": "Europe/London",
+        "digests": ["today", "weekly"],
+        "render": "html",
+        "templates": {"event": "{time} {title}{location}"}
+      }
+    ]
+
+`timezone` is optional and defaults to TIMEZONE (Europe/London). `digests`
+lists the digest modes the tenant gets (see digests.py) and defaults to
+DIGEST_MODE. `render` (text or html, default RENDER_MODE) and `templates`
+control how their notifications look (see rendering.py).
+
+Without TENANTS_CONFIG the function serves a single tenant built from the
+original GOOGLE_CALENDAR_CREDENTIALS and PUSHOVER_USER variables.
+"""
+
+import base64
+import json
+import os
+
+from digests import DIGEST_MODE, parse_digest_mode
+from rendering import get_renderer
+from timezones import DEFAULT_TIMEZONE, get_zone
+
+DEFAULT_CALENDARS = ['primary']
+
+
+def parse_tenants_config(config, backends=None):
+    """
+    Parse TENANTS_CONFIG (JSON, base64 JSON or a file path) into a list of tenants
+
+    `backends` are the notification backends to check addresses against
+    (default: the ones NOTIFICATION_BACKENDS enables).
+    """
+    if backends is None:
+        from backends import get_backends
+        backends = get_backends()
+
+    config = config.strip()
+
+    if os.path.exists(config):
+        with open(config, 'r') as f:
+            raw_tenants = json.load(f)
+    elif config.startswith('['):
+        raw_tenants = json.loads(config)
+    else:
+        raw_tenants = json.loads(base64.b64decode(config).decode('utf-8'))
+
+    tenants = []
+    for index, raw in enumerate(raw_tenants):
+        if not raw.get('google_credentials'):
+            raise ValueError(f"Tenant {raw.get('id', index)} needs google_credentials")
+
+        tenant = dict(raw)
+        tenant['id'] = str(raw.get('id', index))
+        if not any(backend.recipient_for(tenant) for backend in backends):
+            names = ', '.join(backend.name for backend in backends) or 'none'
+            raise ValueError(f"Tenant {tenant['id']} has no address for the enabled notification backends ({names})")
+        tenant['calendars'] = raw.get('calendars') or DEFAULT_CALENDARS
+        tenant['timezone'] = raw.get('timezone') or DEFAULT_TIMEZONE
+        get_zone(tenant['timezone'])
+        tenant['digests'] = raw.get('digests') or [DIGEST_MODE]
+        for mode in tenant['digests']:
+            parse_digest_mode(mode)
+        get_renderer(tenant)
+        tenants.append(tenant)
+
+    return tenants
+
+
+def load_tenants():
+    """
+    Load tenants from the environment
+    """
+    config = os.environ.get('TENANTS_CONFIG')
+    if config:
+        return parse_tenants_config(config)
+
+    # Single-user deployment using the original environment variables
+    return [{
+        'id': 'default',
+        'google_credentials': os.environ.get('GOOGLE_CALENDAR_CREDENTIALS'),
+        'calendars': DEFAULT_CALENDARS,
+        'pushover_user': os.environ.get('PUSHOVER_USER'),
+        'timezone': DEFAULT_TIMEZONE,
+        'digests': [DIGEST_MODE]
+    }]
@@ -0,0 +1,49 @@
+"""
+The function's notion of the current time
+
+Everything that decides what is due (today's window, reminders, webhook
+coalescing, channel expiry) reads the time through now(), time() and
+sleep() instead of the system clock, so local_server.py can run the
+function on a simulated, accelerated clock. In Lambda they are the system
+clock.
+"""
+
+import time as _time
+from datetime import datetime, timezone
+
+
+class SystemClock:
+    def time(self):
+        return _time.time()
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+
+_clock = SystemClock()
+
+
+def install(clock=None):
+    """
+    Replace the time source (any object with time() and sleep()); None restores the system clock
+    """
+    global _clock
+    _clock = clock or SystemClock()
+
+
+def time():
+    """
+    Current Unix timestamp
+    """
+    return _clock.time()
+
+
+def now():
+    """
+    Current time as an aware UTC datetime
+    """
+    return datetime.fromtimestamp(_clock.time(), timezone.utc)
+
+
+def sleep(seconds):
+    _clock.sleep(seconds)
@@ -0,0 +1,97 @@
+"""
+Timezone handling
+
+Every tenant has an IANA timezone (the tenant's `timezone`, else TIMEZONE,
+else Europe/London). Their day runs from local midnight to local midnight,
+so it is 23 or 25 hours long on clock-change days, and event times are shown
+in their local time.
+
+Events shared by many tenants, and the instances of recurring events, carry
+the same start strings over and over. Parsing and formatting are memoized on
+(value, zone), so a fan-out across many users parses each distinct timestamp
+once per container instead of once per event per user.
+"""
+
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = os.environ.get('TIMEZONE', 'Europe/London')
+
+# Distinct timestamps kept by the parse/format caches
+TIMESTAMP_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=None)
+def get_zone(name=None):
+    """
+    Get a ZoneInfo by IANA name (the default timezone when name is empty)
+    """
+    name = name or DEFAULT_TIMEZONE
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def local_date(now, tz_name=None):
+    """
+    Get the calendar date of an aware datetime in the given timezone
+    """
+    return now.astimezone(get_zone(tz_name)).date()
+
+
+def day_window(day, tz_name=None, days=1):
+    """
+    Get the aware (start, end) datetimes spanning `days` local days from `day`
+    """
+    zone = get_zone(tz_name)
+    start = datetime.combine(day, time(), zone)
+    end = datetime.combine(day + timedelta(days=days), time(), zone)
+    return start, end
+
+
+def rfc3339(moment):
+    """
+    Format an aware datetime the way the Calendar API expects (UTC, Z suffix)
+    """
+    return moment.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_event_start(value, tz_name=None):
+    """
+    Parse a Google start value (dateTime or all-day date) into an aware datetime
+
+    All-day events start at local midnight in the given timezone.
+    """
+    if 'T' in value:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return datetime.combine(date.fromisoformat(value), time(), get_zone(tz_name))
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def localize_event_start(value, tz_name=None):
+    """
+    Get a Google start value as an ISO timestamp in the given timezone
+    """
+    return parse_event_start(value, tz_name).astimezone(get_zone(tz_name)).isoformat()
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def format_event_time(value, tz_name=None):
+    """
+    Format a Google start value as local HH:MM ('All day' for all-day events)
+    """
+    if 'T' not in value:
+        return 'All day'
+    return parse_event_start(value).astimezone(get_zone(tz_name)).strftime('%H:%M')
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_iso(value):
+    """
+    Parse an ISO timestamp produced by the notifier (event dict 'start' values)
+    """
+    return datetime.fromisoformat(value)
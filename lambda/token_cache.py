@@ -0,0 +1,206 @@
+"""
+Shared cache for OAuth access tokens
+
+Refreshing an access token costs a round-trip to Google's OAuth endpoint, and
+the token embedded in the credentials expires an hour after they were
+generated. TokenCache keeps refreshed tokens with their expiry so they are
+reused until shortly before they expire:
+
+- an in-memory layer, shared by the worker threads of a warm container
+- the state store (STATE_STORE: /tmp file or DynamoDB), shared by
+  invocations and, with DynamoDB, by every container
+
+Tokens in the state store are encrypted with Fernet (the `cryptography`
+package), keyed by TOKEN_CACHE_KEY or, without it, by a key derived from
+the credentials' own client secret and refresh token. Without `cryptography`
+tokens are only cached in memory, never written anywhere in plain text.
+
+Concurrent refreshes of the same credentials are collapsed: threads of one
+container wait on a per-credentials lock, and containers take a short lease
+in the store so one of them refreshes while the others wait for its token.
+TOKEN_CACHE=memory turns the shared layer off.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Tokens are refreshed this long (seconds) before they expire
+REFRESH_MARGIN = 300
+
+# How long a container may hold the refresh lease, and how often waiters poll for its token
+LEASE_SECONDS = 10
+LEASE_POLL_INTERVAL = 0.25
+
+
+def cache_key(client_id, refresh_token):
+    """
+    Store key for a set of credentials (the refresh token itself is never stored)
+    """
+    digest = hashlib.sha256(f"{client_id}:{refresh_token}".encode('utf-8')).hexdigest()[:32]
+    return f"token:{digest}"
+
+
+class TokenCipher:
+    """
+    Fernet encryption for cached tokens (None when `cryptography` is not installed)
+    """
+
+    def __init__(self, fernet):
+        self.fernet = fernet
+
+    @classmethod
+    def create(cls, secret):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            return None
+
+        key = os.environ.get('TOKEN_CACHE_KEY')
+        if not key:
+            key = base64.urlsafe_b64encode(hashlib.sha256(b'token-cache:' + secret.encode('utf-8')).digest())
+        return cls(Fernet(key))
+
+    def encrypt(self, data):
+        return self.fernet.encrypt(json.dumps(data).encode('utf-8')).decode('ascii')
+
+    def decrypt(self, token):
+        from cryptography.fernet import InvalidToken
+
+        try:
+            return json.loads(self.fernet.decrypt(token.encode('ascii')))
+        except InvalidToken:
+            # Written with another key (TOKEN_CACHE_KEY rotated): treat as a miss
+            return None
+
+
+class TokenCache:
+    def __init__(self, store=None, clock=time.time, sleep=time.sleep):
+        self.store = store
+        self.clock = clock
+        self.sleep = sleep
+        self._memory = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._ciphers = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _cipher(self, key, secret):
+        with self._lock:
+            if key not in self._ciphers:
+                self._ciphers[key] = TokenCipher.create(secret)
+            return self._ciphers[key]
+
+    def _fresh(self, entry):
+        return entry is not None and entry['expires_at'] - self.clock() > REFRESH_MARGIN
+
+    def _load_shared(self, key, cipher):
+        document = self.store.get(key)
+        if not document or 'ciphertext' not in document:
+            return None
+        return cipher.decrypt(document['ciphertext'])
+
+    def _acquire_lease(self, key):
+        lease_key = f"{key}:lease"
+        if self.store.add(lease_key, {'expires_at': self.clock() + LEASE_SECONDS}):
+            return True
+
+        # Take over a lease left behind by a container that died mid-refresh
+        lease = self.store.get(lease_key)
+        if lease is None or lease['expires_at'] < self.clock():
+            self.store.delete(lease_key)
+            return self.store.add(lease_key, {'expires_at': self.clock() + LEASE_SECONDS})
+        return False
+
+    def _wait_for_shared(self, key, cipher):
+        deadline = self.clock() + LEASE_SECONDS
+        while self.clock() < deadline:
+            self.sleep(LEASE_POLL_INTERVAL)
+            entry = self._load_shared(key, cipher)
+            if self._fresh(entry):
+                return entry
+        return None
+
+    def get_token(self, client_id, refresh_token, client_secret, refresh, force=False):
+        """
+        Get a valid access token for the credentials as (token, expires_at)
+
+        `refresh()` is called only when no layer has a token that is valid
+        for more than REFRESH_MARGIN seconds, or with `force` (the API
+        rejected the cached token); it returns (token, expires_at) with
+        expires_at as a Unix timestamp.
+        """
+        key = cache_key(client_id, refresh_token)
+
+        entry = None if force else self._memory.get(key)
+        if self._fresh(entry):
+            return entry['token'], entry['expires_at']
+
+        with self._key_lock(key):
+            # Another thread may have refreshed while this one waited for the lock
+            entry = None if force else self._memory.get(key)
+            if self._fresh(entry):
+                return entry['token'], entry['expires_at']
+
+            cipher = self._cipher(key, f"{client_secret}:{refresh_token}") if self.store is not None else None
+            leased = False
+            if cipher is not None and not force:
+                try:
+                    entry = self._load_shared(key, cipher)
+                    if not self._fresh(entry):
+                        leased = self._acquire_lease(key)
+                        if not leased:
+                            entry = self._wait_for_shared(key, cipher)
+                except Exception as e:
+                    # The shared layer is an optimisation; never let it block a refresh
+                    print(f"Error reading the shared token cache: {e}")
+                    cipher = None
+
+            try:
+                if not self._fresh(entry):
+                    token, expires_at = refresh()
+                    entry = {'token': token, 'expires_at': expires_at}
+                    if cipher is not None:
+                        try:
+                            self.store.put(key, {'ciphertext': cipher.encrypt(entry)})
+                        except Exception as e:
+                            print(f"Error writing the shared token cache: {e}")
+            finally:
+                if leased:
+                    try:
+                        self.store.delete(f"{key}:lease")
+                    except Exception as e:
+                        print(f"Error releasing the token refresh lease: {e}")
+
+            self._memory[key] = entry
+            return entry['token'], entry['expires_at']
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """
+    Get the container's token cache (TOKEN_CACHE=memory disables the shared layer)
+    """
+    global _token_cache
+
+    with _token_cache_lock:
+        if _token_cache is None:
+            store = None
+            if os.environ.get('TOKEN_CACHE', 'store') != 'memory':
+                from store import get_store
+                store = get_store()
+            _token_cache = TokenCache(store)
+
+    return _token_cache
@@ -0,0 +1,115 @@
+"""
+Google Calendar push notification handling
+
+Google sends a `sync` message when a channel is created and then one or more
+`exists` messages per change, often several in a row for a single edit,
+and may redeliver a message. The WebhookDebouncer drops sync messages and
+duplicates and coalesces bursts: each ping records itself as the latest for
+its channel, waits for the coalescing window, and only the ping that is
+still the latest afterwards runs a sync. A burst of N pings therefore ends
+in one fetch that sees the final state of the calendar.
+
+Both steps are conditional writes (store.advance), so concurrent pings
+cannot overwrite a newer message number with an older one or claim the
+same sync twice. Concurrent invocations only see each other through the
+state store, so use STATE_STORE=dynamodb when webhooks are enabled.
+"""
+
+import os
+
+import timesource
+
+# Seconds to wait for more pings on the same channel before syncing
+COALESCE_WINDOW = float(os.environ.get('WEBHOOK_COALESCE_SECONDS', '5'))
+
+
+def parse_webhook_event(event):
+    """
+    Extract Google's X-Goog-* headers from a Function URL event
+
+    Returns None when the event is not a Google push notification.
+    """
+    headers = {name.lower(): value for name, value in ((event or {}).get('headers') or {}).items()}
+
+    channel_id = headers.get('x-goog-channel-id')
+    if not channel_id:
+        return None
+
+    message_number = headers.get('x-goog-message-number', '0')
+
+    return {
+        'channel_id': channel_id,
+        'resource_id': headers.get('x-goog-resource-id'),
+        'resource_state': headers.get('x-goog-resource-state', ''),
+        'message_number': int(message_number) if message_number.isdigit() else 0,
+        'channel_token': headers.get('x-goog-channel-token')
+    }
+
+
+def find_tenant_for_channel(tenants, notification):
+    """
+    Work out which tenant a push notification belongs to
+
+    Matches the channel token (set to the tenant ID when registering the
+    channel), then a tenant's `channel_ids`; a single-tenant deployment owns
+    every channel.
+    """
+    for tenant in tenants:
+        if notification['channel_token'] and notification['channel_token'] == tenant['id']:
+            return tenant
+
+    for tenant in tenants:
+        if notification['channel_id'] in tenant.get('channel_ids', []):
+            return tenant
+
+    if len(tenants) == 1:
+        return tenants[0]
+
+    return None
+
+
+class WebhookDebouncer:
+    def __init__(self, store, window=COALESCE_WINDOW, clock=timesource.time, sleep=timesource.sleep):
+        self.store = store
+        self.window = window
+        self.clock = clock
+        self.sleep = sleep
+
+    def key(self, channel_id):
+        return f"webhook:{channel_id}"
+
+    def synced_key(self, channel_id):
+        return f"webhook:{channel_id}:synced"
+
+    def should_sync(self, notification):
+        """
+        Decide whether this notification should trigger a sync
+
+        Returns (sync, reason) where reason is one of: sync, duplicate,
+        coalesced, changed.
+        """
+        key = self.key(notification['channel_id'])
+        number = notification['message_number']
+
+        if notification['resource_state'] == 'sync':
+            # Channel handshake: remember where the message numbers start
+            self.store.advance(key, {'latest_message': number}, 'latest_message')
+            return False, 'sync'
+
+        # Only a message newer than every one seen so far becomes the latest
+        if not self.store.advance(key, {'latest_message': number}, 'latest_message'):
+            return False, 'duplicate'
+
+        if self.window > 0:
+            self.sleep(self.window)
+
+            state = self.store.get(key) or {}
+            if state.get('latest_message', number) > number:
+                # A newer ping arrived during the window; it will run the sync
+                return False, 'coalesced'
+
+        # Claim the sync; fails if a newer ping already claimed one
+        synced = {'synced_message': number, 'synced_at': self.clock()}
+        if not self.store.advance(self.synced_key(notification['channel_id']), synced, 'synced_message'):
+            return False, 'coalesced'
+        return True, 'changed'
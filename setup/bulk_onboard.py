@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Bulk onboarding: validate many users' credentials and register their webhooks in one run
+
+generate_google_credentials.py and setup_webhook.py onboard one user at a
+time, interactively. This script onboards a whole team from a manifest,
+without prompts:
+
+1. every user's credentials are loaded, checked for the calendar scope and
+   refreshed, concurrently
+2. a push channel is registered for each of their calendars, in parallel,
+   under a shared rate limit (--rate requests per second), retrying rate
+   limit and server errors with exponential backoff
+3. every outcome is written to a journal (--state) as soon as it happens;
+   re-running the script skips what already succeeded and retries the rest
+4. the channels are written to one registry (--registry) as entries of the
+   function's channel index (see lambda/channels.py), together
+   with a TENANTS_CONFIG for all users (--tenants)
+
+With --publish the registry is also merged into the function's channel
+index in the state store (STATE_STORE / STATE_TABLE, e.g. the DynamoDB
+table), so the function's {"action": "renew_channels"} schedule renews
+these channels instead of creating its own. Channels already in the index
+are kept unless a newly registered channel replaces them, in which case
+they are stopped first, so no live channel is left untracked.
+
+Each user still has to authorize the app once: generate_google_credentials.py
+produces the credentials (base64, as in lambda_credentials.txt) or point
+the manifest at an authorized-user JSON file (token.json).
+
+Manifest (JSON):
+
+    {
+      "webhook_url": "https://xyz.lambda-url.region.on.aws/",
+      "users": [
+        {
+          "id": "alice",
+          "credentials": "creds/alice.json",
+          "calendars": ["primary", "team@group.calendar.google.com"],
+          "pushover_user": "<pushover user key>",
+          "timezone": "Europe/London"
+        }
+      ]
+    }
+
+Usage:
+    python setup/bulk_onboard.py team.json
+    python setup/bulk_onboard.py team.json --workers 32 --rate 20 --publish
+    python setup/bulk_onboard.py team.json --dry-run   # only validate and refresh credentials
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda')
+sys.path.insert(0, LAMBDA_DIR)
+
+from channels import CHANNEL_TTL_DAYS, RENEW_AHEAD_HOURS, channel_key, load_index, save_index  # noqa: E402
+
+SCOPES = [
+    'https://www.googleapis.com/auth/calendar.readonly',
+    'https://www.googleapis.com/auth/calendar.events.readonly'
+]
+
+# Errors worth retrying: rate limits and Google-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded'}
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 32.0
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all worker threads (`rate` requests per second)
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Journal:
+    """
+    Onboarding progress, saved to disk after every change so a run can resume
+
+    users: id -> {'status': 'valid' | 'invalid', 'error'}
+    channels: "<user>:<calendar>" -> channel index entry, or {'status': 'failed', 'error'}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {'users': {}, 'channels': {}}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.data = json.load(f)
+
+    def update(self, section, key, value):
+        with self._lock:
+            self.data[section][key] = value
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def channel(self, key):
+        return self.data['channels'].get(key)
+
+
+def load_manifest(path):
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+
+    if not manifest.get('webhook_url', '').startswith('https://'):
+        raise ValueError("The manifest needs an https:// webhook_url (the Lambda Function URL)")
+
+    seen = set()
+    for index, user in enumerate(manifest.get('users', [])):
+        if not user.get('id') or not user.get('credentials'):
+            raise ValueError(f"User {user.get('id', index)} needs an id and credentials")
+        if user['id'] in seen:
+            raise ValueError(f"Duplicate user id: {user['id']}")
+        seen.add(user['id'])
+        user.setdefault('calendars', ['primary'])
+
+    return manifest
+
+
+def load_credentials_info(value, base_dir):
+    """
+    Read credentials given as a file path (authorized-user JSON or lambda_credentials.txt) or base64
+    """
+    path = os.path.join(base_dir, value)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            value = f.read().strip()
+        if value.startswith('{'):
+            return json.loads(value)
+
+    value = value.replace('GOOGLE_CALENDAR_CREDENTIALS=', '')
+    return json.loads(base64.b64decode(value).decode('utf-8'))
+
+
+def is_retryable(error):
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status in RETRY_STATUSES:
+        return True
+    if error.resp.status == 403:
+        try:
+            reasons = {item.get('reason') for item in json.loads(error.content)['error'].get('errors', [])}
+        except (ValueError, KeyError, TypeError):
+            return False
+        return bool(reasons & RATE_LIMIT_REASONS)
+    return False
+
+
+def call_with_retries(limiter, call):
+    """
+    Run an API call under the rate limit, retrying rate limit and server errors with backoff
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            return call()
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_retryable(e):
+                raise
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))))
+
+
+class BulkOnboarding:
+    def __init__(self, manifest, base_dir, journal, limiter, workers=16, api_url=None, dry_run=False):
+        self.manifest = manifest
+        self.base_dir = base_dir
+        self.journal = journal
+        self.limiter = limiter
+        self.workers = workers
+        self.api_url = api_url
+        self.dry_run = dry_run
+        self.address = manifest['webhook_url']
+        self.credentials = {}
+
+    def build_service(self, creds):
+        client_options = {'api_endpoint': self.api_url.rstrip('/') + '/'} if self.api_url else None
+        return build('calendar', 'v3', credentials=creds, client_options=client_options, cache_discovery=False)
+
+    def validate_user(self, user):
+        """
+        Load, check and refresh one user's credentials; returns them (None when invalid)
+        """
+        try:
+            info = load_credentials_info(user['credentials'], self.base_dir)
+            granted = set(info.get('scopes') or SCOPES)
+            if not granted & set(SCOPES):
+                raise ValueError("credentials lack the calendar.readonly scope")
+
+            creds = Credentials.from_authorized_user_info(info, SCOPES)
+            if not creds.valid:
+                if not creds.refresh_token:
+                    raise ValueError("credentials have expired and have no refresh token")
+                call_with_retries(self.limiter, lambda: creds.refresh(Request()))
+        except Exception as e:
+            self.journal.update('users', user['id'], {'status': 'invalid', 'error': str(e)})
+            print(f"❌ {user['id']}: {e}")
+            return None
+
+        self.journal.update('users', user['id'], {'status': 'valid'})
+        return creds
+
+    def pending_calendars(self, user, now):
+        """
+        Calendars of a user without a registered channel that stays valid past the renewal window
+        """
+        horizon = now + RENEW_AHEAD_HOURS * 3600
+        pending = []
+        for calendar_id in user['calendars']:
+            entry = self.journal.channel(channel_key(user['id'], calendar_id))
+            if entry and entry.get('channel_id') and entry['address'] == self.address \
+                    and entry['expiration'] > horizon:
+                continue
+            pending.append(calendar_id)
+        return pending
+
+    def register_channel(self, service, user, calendar_id, now):
+        key = channel_key(user['id'], calendar_id)
+        body = {
+            'id': f"calendar-{uuid.uuid4()}",
+            'type': 'web_hook',
+            'address': self.address,
+            'token': user['id'],
+            'expiration': int((now + CHANNEL_TTL_DAYS * 86400) * 1000)
+        }
+
+        try:
+            response = call_with_retries(
+                self.limiter, lambda: service.events().watch(calendarId=calendar_id, body=body).execute()
+            )
+        except Exception as e:
+            self.journal.update('channels', key, {'status': 'failed', 'error': str(e)})
+            print(f"❌ {key}: {e}")
+            return False
+
+        self.journal.update('channels', key, {
+            'key': key,
+            'tenant_id': user['id'],
+            'calendar_id': calendar_id,
+            'channel_id': response['id'],
+            'resource_id': response['resourceId'],
+            'address': self.address,
+            'expiration': int(response['expiration']) / 1000
+        })
+        return True
+
+    def onboard_user(self, user, executor, now):
+        """
+        Validate one user and register their pending calendars (each calendar is its own task)
+        """
+        pending = self.pending_calendars(user, now)
+        creds = self.validate_user(user)
+        if creds is None:
+            return []
+        self.credentials[user['id']] = creds
+
+        if self.dry_run or not pending:
+            return []
+
+        # Built services are not thread-safe: one per calendar task
+        return [
+            executor.submit(lambda calendar_id: self.register_channel(self.build_service(creds), user,
+                                                                      calendar_id, now), calendar_id)
+            for calendar_id in pending
+        ]
+
+    def run(self):
+        now = time.time()
+        users = self.manifest['users']
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            user_futures = [executor.submit(self.onboard_user, user, executor, now) for user in users]
+            channel_futures = [future for user_future in user_futures for future in user_future.result()]
+            registered = sum(1 for future in channel_futures if future.result())
+
+        return {
+            'users': len(users),
+            'valid': len(self.credentials),
+            'registered': registered,
+            'failed': len(channel_futures) - registered
+        }
+
+    def registry(self):
+        """
+        Every registered channel of the manifest's calendars as channel index entries, ordered by expiry
+        """
+        channels = []
+        for user in self.manifest['users']:
+            for calendar_id in user['calendars']:
+                entry = self.journal.channel(channel_key(user['id'], calendar_id))
+                if entry and entry.get('channel_id'):
+                    channels.append(entry)
+        channels.sort(key=lambda channel: (channel['expiration'], channel['key']))
+        return {'channels': channels}
+
+    def stop_channel(self, channel):
+        """
+        Stop a channel that a newly registered one replaces (False when it could not be stopped)
+        """
+        creds = self.credentials.get(channel['tenant_id'])
+        if creds is None:
+            print(f"⚠️ {channel['key']}: no valid credentials to stop channel {channel['channel_id']}, "
+                  f"it expires on its own")
+            return False
+
+        body = {'id': channel['channel_id'], 'resourceId': channel['resource_id']}
+        try:
+            call_with_retries(self.limiter, lambda: self.build_service(creds).channels().stop(body=body).execute())
+        except Exception as e:
+            if isinstance(e, HttpError) and e.resp.status == 404:
+                # Already expired or stopped
+                return True
+            print(f"⚠️ {channel['key']}: could not stop channel {channel['channel_id']} ({e}), it expires on its own")
+            return False
+        return True
+
+    def publish(self, store):
+        """
+        Merge the registry into the function's channel index, stopping the channels it replaces
+
+        Returns (channels published, channels replaced).
+        """
+        registered = {channel['key']: channel for channel in self.registry()['channels']}
+        existing, stored_buckets = load_index(store)
+
+        kept = []
+        replaced = []
+        for channel in existing:
+            new = registered.get(channel['key'])
+            if new is None:
+                # Another user's channel, or a calendar whose registration failed this time
+                kept.append(channel)
+            elif new['channel_id'] != channel['channel_id']:
+                replaced.append(channel)
+
+        if replaced:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                list(executor.map(self.stop_channel, replaced))
+
+        channels = kept + list(registered.values())
+        save_index(store, channels, stored_buckets)
+        return len(registered), len(replaced)
+
+    def tenants_config(self):
+        """
+        TENANTS_CONFIG for every user whose credentials are valid, with their refreshed tokens
+        """
+        tenants = []
+        for user in self.manifest['users']:
+            creds = self.credentials.get(user['id'])
+            if creds is None:
+                continue
+            creds_dict = {
+                'token': creds.token,
+                'refresh_token': creds.refresh_token,
+                'token_uri': creds.token_uri,
+                'client_id': creds.client_id,
+                'client_secret': creds.client_secret,
+                'scopes': creds.scopes
+            }
+            tenant = {key: value for key, value in user.items() if key != 'credentials'}
+            tenant['google_credentials'] = base64.b64encode(json.dumps(creds_dict).encode()).decode()
+            tenants.append(tenant)
+        return tenants
+
+
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Onboard many users and register their webhooks from a manifest')
+    parser.add_argument('manifest', help='JSON manifest of users and calendars')
+    parser.add_argument('--workers', type=int, default=16, help='users and calendars processed in parallel')
+    parser.add_argument('--rate', type=float, default=10.0, help='Google API requests per second')
+    parser.add_argument('--state', default='onboarding_state.json', help='progress journal used to resume')
+    parser.add_argument('--registry', default='channels_registry.json', help='consolidated channel registry')
+    parser.add_argument('--tenants', default='tenants.json', help='TENANTS_CONFIG output for the Lambda function')
+    parser.add_argument('--publish', action='store_true',
+                        help="also write the registry to the function's state store (STATE_STORE, STATE_TABLE)")
+    parser.add_argument('--dry-run', action='store_true', help='only validate and refresh credentials')
+    parser.add_argument('--api-url', help='Calendar API base URL override, like CALENDAR_API_URL (e.g. a local stub)')
+    args = parser.parse_args()
+
+    print("👥 GOOGLE CALENDAR BULK ONBOARDING")
+    print("=" * 40)
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except Exception as e:
+        print(f"❌ Invalid manifest: {e}")
+        return False
+
+    journal = Journal(args.state)
+    onboarding = BulkOnboarding(manifest, os.path.dirname(os.path.abspath(args.manifest)), journal,
+                                RateLimiter(args.rate), args.workers, args.api_url, args.dry_run)
+
+    started = time.perf_counter()
+    summary = onboarding.run()
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ {summary['valid']} of {summary['users']} users have valid credentials")
+    if not args.dry_run:
+        print(f"🔗 {summary['registered']} channels registered, {summary['failed']} failed "
+              f"in {elapsed:.1f}s (progress saved to {args.state})")
+
+    registry = onboarding.registry()
+    write_json(args.registry, registry)
+    write_json(args.tenants, onboarding.tenants_config())
+    print(f"💾 {len(registry['channels'])} channels written to {args.registry}, TENANTS_CONFIG to {args.tenants}")
+
+    if args.publish and not args.dry_run:
+        from store import get_store
+
+        published, replaced = onboarding.publish(get_store())
+        print(f"📤 {published} channels published to the {os.environ.get('STATE_STORE', 'file')} state store "
+              f"(replacing {replaced} older channels)")
+
+    if summary['failed'] or summary['valid'] < summary['users']:
+        print("⚠️ Some users or calendars failed; fix them and re-run to resume")
+        return False
+
+    return True
+
+
+if __name__ == '__main__':
+    success = main()
+
+    if success:
+        print()
+        print("🎉 Onboarding complete!")
+    else:
+        print()
+        print("❌ Onboarding incomplete. Please resolve the issues above and re-run.")
+        sys.exit(1)
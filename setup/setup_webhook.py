@@ -159,8 +159,8 @@ def create_webhook(webhook_url, creds):
         print()
         print("🎉 WEBHOOK SETUP SUCCESSFUL!")
         print("=" * 40)
-        print(f"✅ Channel ID: {webhook_response.get('id')}")
-        print(f"✅ Resource ID: {webhook_response.get('resourceId')}")
+        print(f"✅ Channel ID: {watch_response.get('id')}")
+        print(f"✅ Resource ID: {watch_response.get('resourceId')}")
         print(f"✅ Expires: {expiration_time}")
         print()
         print("💾 Webhook info saved to: webhook_info.json")
@@ -236,8 +236,9 @@ def main():
         print("6. You should get notification: 'Calendar Updated'")
         print()
         print("⚠️ IMPORTANT NOTES:")
-        print("- Webhook expires in 6 days")
-        print("- Your Lambda function will auto-renew it")
+        print("- This webhook expires in 6 days")
+        print("- For automatic renewal set LAMBDA_WEBHOOK_URL on the function and schedule")
+        print('  {"action": "renew_channels"} daily (SETUP.md step 5.2)')
         print("- Manual renewal: re-run this script if needed")
         print()
         print("🎉 Setup complete! Your calendar is now connected to Lambda.")
@@ -0,0 +1,81 @@
+import lambda_function
+from lambda_function import LambdaScheduleNotifier
+from store import JsonFileStore
+
+
+class FakeRequest:
+    def __init__(self, service, calendar_id):
+        self.service = service
+        self.calendar_id = calendar_id
+
+    def execute(self):
+        self.service.calls.append(('list', self.calendar_id))
+        return self.service.page(self.calendar_id)
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        calendar_ids = [request.calendar_id for _, request in self.requests]
+        self.service.calls.append(('batch', calendar_ids))
+        if self.service.failing_batches:
+            self.service.failing_batches -= 1
+            raise RuntimeError('403 rateLimitExceeded')
+        for request_id, request in self.requests:
+            self.callback(request_id, self.service.page(request.calendar_id), None)
+
+
+class FakeService:
+    """
+    The discovery client's shape: events().list() requests and batches of them
+    """
+
+    def __init__(self, failing_batches=0):
+        self.failing_batches = failing_batches
+        self.calls = []
+
+    def events(self):
+        return self
+
+    def list(self, calendarId, **params):
+        return FakeRequest(self, calendarId)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def page(self, calendar_id):
+        return {'items': [{'id': f"{calendar_id}-standup", 'summary': 'Standup',
+                           'start': {'dateTime': '2026-10-17T09:00:00Z'}}]}
+
+
+def list_events(tmp_path, monkeypatch, service, calendar_ids):
+    monkeypatch.setattr(lambda_function, 'BATCH_SIZE', 2)
+    monkeypatch.setattr(lambda_function, 'get_response_cache', lambda: None)
+    notifier = LambdaScheduleNotifier(store=JsonFileStore(str(tmp_path)), backends=[])
+    results = notifier.batch_list_events(service, calendar_ids, 'Europe/London')
+    return {calendar_id: [event['id'] for event in events] for calendar_id, events in results.items()}
+
+
+def test_calendars_are_read_in_batches(tmp_path, monkeypatch):
+    service = FakeService()
+
+    results = list_events(tmp_path, monkeypatch, service, ['a', 'b', 'c'])
+
+    assert results == {'a': ['a-standup'], 'b': ['b-standup'], 'c': ['c-standup']}
+    assert service.calls == [('batch', ['a', 'b']), ('batch', ['c'])]
+
+
+def test_failed_batch_falls_back_to_reading_its_calendars_one_by_one(tmp_path, monkeypatch):
+    service = FakeService(failing_batches=1)
+
+    results = list_events(tmp_path, monkeypatch, service, ['a', 'b', 'c'])
+
+    assert results == {'a': ['a-standup'], 'b': ['b-standup'], 'c': ['c-standup']}
+    assert service.calls == [('batch', ['a', 'b']), ('batch', ['c']), ('list', 'a'), ('list', 'b')]
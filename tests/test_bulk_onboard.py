@@ -0,0 +1,79 @@
+import os
+import sys
+
+from channels import load_index, save_index
+from store import JsonFileStore
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'setup'))
+import bulk_onboard  # noqa: E402
+
+ADDRESS = 'https://example.lambda-url.eu-west-2.on.aws/'
+
+
+class Limiter:
+    def acquire(self):
+        pass
+
+
+class Journal:
+    def __init__(self, channels):
+        self.channels = channels
+
+    def channel(self, key):
+        return self.channels.get(key)
+
+
+class FakeStopService:
+    def __init__(self, stopped):
+        self.stopped = stopped
+
+    def channels(self):
+        return self
+
+    def stop(self, body):
+        service = self
+
+        class Request:
+            def execute(self):
+                service.stopped.append(body['id'])
+        return Request()
+
+
+def channel(tenant_id, calendar_id, channel_id, expiration):
+    return {
+        'key': f"{tenant_id}:{calendar_id}",
+        'tenant_id': tenant_id,
+        'calendar_id': calendar_id,
+        'channel_id': channel_id,
+        'resource_id': f"resource-{channel_id}",
+        'address': ADDRESS,
+        'expiration': expiration
+    }
+
+
+def test_publish_merges_into_the_index_and_stops_replaced_channels(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    save_index(store, [
+        channel('alice', 'primary', 'old-alice', 100),
+        channel('alice', 'team', 'kept-alice-team', 200),
+        channel('zoe', 'primary', 'zoe', 300)
+    ], [])
+
+    manifest = {'webhook_url': ADDRESS, 'users': [{'id': 'alice', 'credentials': 'x', 'calendars': ['primary', 'team']}]}
+    # The team calendar's registration failed this run, so only primary has a new channel
+    journal = Journal({'alice:primary': channel('alice', 'primary', 'new-alice', 400)})
+    onboarding = bulk_onboard.BulkOnboarding(manifest, str(tmp_path), journal, Limiter())
+    onboarding.credentials['alice'] = object()
+    stopped = []
+    onboarding.build_service = lambda creds: FakeStopService(stopped)
+
+    assert onboarding.publish(store) == (1, 1)
+
+    assert stopped == ['old-alice']
+    assert [entry['channel_id'] for entry in load_index(store)[0]] == ['kept-alice-team', 'zoe', 'new-alice']
+
+    # Publishing the same registry again changes nothing
+    stopped.clear()
+    assert onboarding.publish(store) == (1, 0)
+    assert stopped == []
+    assert len(load_index(store)[0]) == 3
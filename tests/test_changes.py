@@ -0,0 +1,60 @@
+from changes import build_snapshot, count_changes, diff_snapshots, format_change_message
+
+
+def make_event(event_id, start, title, location='', time=None):
+    return {'id': event_id, 'start': start, 'time': time or start[11:16], 'title': title, 'location': location}
+
+
+BASE = [
+    make_event('standup', '2026-03-02T09:00:00', 'Standup'),
+    make_event('review', '2026-03-02T14:00:00', 'Review', 'Room 1'),
+    make_event('lunch', '2026-03-02T12:00:00', 'Lunch')
+]
+
+
+def test_identical_snapshots_have_no_changes():
+    changes = diff_snapshots(build_snapshot(BASE), build_snapshot(list(BASE)))
+
+    assert count_changes(changes) == 0
+    assert format_change_message(changes) is None
+
+
+def test_invisible_edits_are_ignored():
+    edited = [dict(event, description='Agenda', attendees=['bob']) for event in BASE]
+
+    assert count_changes(diff_snapshots(build_snapshot(BASE), build_snapshot(edited))) == 0
+
+
+def test_visible_edits_are_grouped():
+    new = [
+        make_event('standup', '2026-03-02T09:30:00', 'Standup'),
+        make_event('review', '2026-03-02T14:00:00', 'Design review', 'Room 2'),
+        make_event('retro', '2026-03-02T16:00:00', 'Retro', 'Room 3')
+    ]
+
+    changes = diff_snapshots(build_snapshot(BASE), build_snapshot(new))
+
+    assert [event['title'] for event in changes['added']] == ['Retro']
+    assert [event['title'] for event in changes['removed']] == ['Lunch']
+    assert [(previous['time'], event['time']) for previous, event in changes['moved']] == [('09:00', '09:30')]
+    assert [(previous['title'], event['title']) for previous, event in changes['renamed']] == [('Review', 'Design review')]
+    assert [event['location'] for _, event in changes['relocated']] == ['Room 2']
+    assert count_changes(changes) == 5
+
+
+def test_change_message_lists_additions_and_removals_in_start_order():
+    new = [
+        make_event('late', '2026-03-02T18:00:00', 'Late'),
+        make_event('early', '2026-03-02T08:00:00', 'Early', 'Cafe'),
+        make_event('review', '2026-03-02T14:00:00', 'Review')
+    ]
+
+    message = format_change_message(diff_snapshots(build_snapshot(BASE), build_snapshot(new)))
+
+    assert message == (
+        "➕ 08:00 - Early (Cafe)\n"
+        "➕ 18:00 - Late\n"
+        "➖ 09:00 - Standup (cancelled)\n"
+        "➖ 12:00 - Lunch (cancelled)\n"
+        "📍 14:00 - Review now at no location\n"
+    )
@@ -0,0 +1,174 @@
+import json
+
+import channels
+from channels import INDEX_KEY, ChannelManager, load_index
+from store import BUCKET_BYTES, JsonFileStore
+
+NOW = 1_800_000_000.0
+ADDRESS = 'https://example.lambda-url.eu-west-2.on.aws/'
+
+
+class FakeRequest:
+    def __init__(self, call):
+        self.call = call
+
+    def execute(self):
+        return self.call()
+
+
+class FakeCalendarService:
+    """
+    The REST client's shape: no batch support, one execute() per request
+    """
+
+    def __init__(self, calls, failing_calendars=()):
+        self.calls = calls
+        self.failing_calendars = set(failing_calendars)
+
+    def events(self):
+        return self
+
+    def channels(self):
+        return self
+
+    def watch(self, calendarId, body):
+        def call():
+            self.calls.append(('watch', calendarId))
+            if calendarId in self.failing_calendars:
+                raise RuntimeError('watch failed')
+            return {'id': body['id'], 'resourceId': f"resource-{calendarId}", 'expiration': str(body['expiration'])}
+        return FakeRequest(call)
+
+    def stop(self, body):
+        def call():
+            self.calls.append(('stop', body['id']))
+            return {}
+        return FakeRequest(call)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_manager(store, calls, clock, failing_calendars=()):
+    return ChannelManager(store, lambda credentials: FakeCalendarService(calls, failing_calendars),
+                          address=ADDRESS, clock=clock)
+
+
+def make_tenant(tenant_id, calendars):
+    return {'id': tenant_id, 'google_credentials': 'creds', 'calendars': calendars}
+
+
+def test_channels_are_created_once_and_kept_in_expiry_order(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    calls = []
+    clock = Clock(NOW)
+    manager = make_manager(store, calls, clock)
+    tenants = [make_tenant('alice', ['primary', 'team']), make_tenant('bob', ['primary'])]
+
+    summary = manager.sync(tenants)
+    assert (summary['created'], summary['active']) == (3, 3)
+
+    clock.now += 3600
+    manager.sync([make_tenant('carol', ['primary'])] + tenants)
+
+    index, _ = load_index(store)
+    assert [channel['key'] for channel in index] == ['alice:primary', 'alice:team', 'bob:primary', 'carol:primary']
+    assert [channel['expiration'] for channel in index] == sorted(channel['expiration'] for channel in index)
+
+    calls.clear()
+    assert manager.sync(tenants + [make_tenant('carol', ['primary'])])['active'] == 4
+    assert calls == []
+
+
+def test_only_due_channels_are_renewed_and_replaced_after_their_successor(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    calls = []
+    clock = Clock(NOW)
+    manager = make_manager(store, calls, clock)
+    manager.sync([make_tenant('alice', ['primary'])])
+    clock.now += 86400
+    manager.sync([make_tenant('alice', ['primary', 'team'])])
+    old = {channel['key']: channel['channel_id'] for channel in load_index(store)[0]}
+
+    # Only the older channel is inside the renewal window
+    clock.now = NOW + channels.CHANNEL_TTL_DAYS * 86400 - channels.RENEW_AHEAD_HOURS * 3600 + 60
+    calls.clear()
+    summary = manager.sync([make_tenant('alice', ['primary', 'team'])])
+
+    assert (summary['renewed'], summary['stopped'], summary['active']) == (1, 1, 2)
+    assert calls == [('watch', 'primary'), ('stop', old['alice:primary'])]
+    index = {channel['key']: channel['channel_id'] for channel in load_index(store)[0]}
+    assert index['alice:team'] == old['alice:team']
+    assert index['alice:primary'] != old['alice:primary']
+
+
+def test_failed_renewal_keeps_the_old_channel(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    calls = []
+    clock = Clock(NOW)
+    make_manager(store, calls, clock).sync([make_tenant('alice', ['primary'])])
+    old = load_index(store)[0][0]
+
+    clock.now = old['expiration'] - 60
+    calls.clear()
+    summary = make_manager(store, calls, clock, failing_calendars=['primary']).sync([make_tenant('alice', ['primary'])])
+
+    assert (summary['failed'], summary['stopped']) == (1, 0)
+    assert calls == [('watch', 'primary')]
+    assert load_index(store)[0] == [old]
+
+
+def test_removed_calendars_are_stopped_and_removed_tenants_dropped(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    calls = []
+    clock = Clock(NOW)
+    manager = make_manager(store, calls, clock)
+    manager.sync([make_tenant('alice', ['primary', 'team']), make_tenant('bob', ['primary'])])
+
+    calls.clear()
+    summary = manager.sync([make_tenant('alice', ['primary'])])
+
+    assert (summary['stopped'], summary['dropped'], summary['active']) == (1, 1, 1)
+    assert [call[0] for call in calls] == ['stop']
+    assert [channel['key'] for channel in load_index(store)[0]] == ['alice:primary']
+
+
+def test_large_index_is_split_across_buckets(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    calls = []
+    clock = Clock(NOW)
+    manager = make_manager(store, calls, clock)
+    calendars = [f"calendar-{index}@group.calendar.google.com" for index in range(1500)]
+
+    manager.sync([make_tenant('alice', calendars)])
+
+    head = store.get(INDEX_KEY)
+    assert head['buckets'] > 1
+    for index in range(head['buckets']):
+        assert len(json.dumps(store.get(f"{INDEX_KEY}:{head['buckets']}:{index}"))) <= BUCKET_BYTES
+    assert len(load_index(store)[0]) == 1500
+
+    calls.clear()
+    manager.sync([make_tenant('alice', calendars)])
+    assert calls == []
+
+
+def test_index_written_before_buckets_is_read(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    calls = []
+    clock = Clock(NOW)
+    manager = make_manager(store, calls, clock)
+    manager.sync([make_tenant('alice', ['primary'])])
+    channel = load_index(store)[0][0]
+    store.put(INDEX_KEY, {'channels': [channel]})
+
+    calls.clear()
+    assert manager.sync([make_tenant('alice', ['primary'])])['active'] == 1
+    assert calls == []
+    assert load_index(store)[0] == [channel]
+    assert 'buckets' in store.get(INDEX_KEY)
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+from coldstart import measure_import_time, parse_importtime, summarize
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda')
+
+# Loaded only inside the code paths that use them
+LAZY_MODULES = ('google', 'googleapiclient', 'requests', 'urllib3', 'boto3', 'asyncio', 'sqlite3', 'smtplib',
+                'cryptography')
+
+
+def test_importing_the_handler_skips_the_heavy_libraries():
+    result = subprocess.run(
+        [sys.executable, '-c', 'import sys, lambda_function; print(" ".join(sys.modules))'],
+        cwd=LAMBDA_DIR, capture_output=True, text=True, check=True
+    )
+
+    loaded = {module.split('.')[0] for module in result.stdout.split()}
+    assert loaded.isdisjoint(LAZY_MODULES), sorted(loaded.intersection(LAZY_MODULES))
+
+
+def test_importtime_output_is_parsed_and_summarised():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |     _json\n"
+        "import time:      2000 |       2100 |   json\n"
+        "import time:       500 |        500 | store\n"
+        "import time:      3000 |       5100 | lambda_function\n"
+    )
+
+    modules = parse_importtime(stderr)
+    assert modules[0] == ('_json', 100, 100, 2)
+    assert summarize(modules, top=1) == {
+        'total_ms': 5.6,
+        'modules': [{'module': 'lambda_function', 'cumulative_ms': 5.1}],
+        'self': [{'module': 'lambda_function', 'self_ms': 3.0}]
+    }
+
+
+def test_interpreter_startup_modules_are_left_out():
+    modules = {module[0] for module in measure_import_time('import store')}
+
+    assert 'store' in modules
+    assert 'encodings' not in modules
@@ -0,0 +1,53 @@
+from datetime import date
+
+import pytest
+
+from digests import covers_today, digest_title, digest_window, group_events_by_day, parse_digest_mode
+from timezones import rfc3339
+
+MONDAY = date(2026, 10, 19)
+
+
+def test_digest_modes_pick_their_days():
+    assert parse_digest_mode('today') == (0, 1)
+    assert parse_digest_mode('tomorrow') == (1, 1)
+    assert parse_digest_mode('weekly') == (0, 7)
+    assert parse_digest_mode('days:3') == (0, 3)
+    assert covers_today('weekly') and not covers_today('tomorrow')
+
+
+@pytest.mark.parametrize('mode', ['days:0', 'days:32', 'days:x', 'monthly'])
+def test_unknown_digest_modes_are_rejected(mode):
+    with pytest.raises(ValueError, match='Unknown digest mode'):
+        parse_digest_mode(mode)
+
+
+def test_digest_window_covers_whole_local_days():
+    start, end = digest_window(date(2026, 10, 24), 'Europe/London', 'tomorrow')
+    assert (rfc3339(start), rfc3339(end)) == ('2026-10-24T23:00:00Z', '2026-10-26T00:00:00Z')
+
+    start, end = digest_window(MONDAY, 'America/New_York', 'weekly')
+    assert (rfc3339(start), rfc3339(end)) == ('2026-10-19T04:00:00Z', '2026-10-26T04:00:00Z')
+
+
+def test_digest_titles():
+    assert digest_title(MONDAY, 'today') == 'Daily Schedule - Monday, October 19'
+    assert digest_title(MONDAY, 'tomorrow') == "Tomorrow's Schedule - Tuesday, October 20"
+    assert digest_title(MONDAY, 'weekly') == 'Weekly Schedule - Week of Monday, October 19'
+    assert digest_title(MONDAY, 'days:3') == 'Schedule - Mon Oct 19 to Wed Oct 21'
+
+
+def test_events_are_grouped_by_local_day():
+    events = [
+        {'start': '2026-10-17', 'title': 'Conference'},
+        {'start': '2026-10-19T09:00:00+01:00', 'title': 'Standup'},
+        {'start': '2026-10-19T23:30:00+01:00', 'title': 'Late call'},
+        {'start': '2026-10-21T10:00:00+01:00', 'title': 'Review'}
+    ]
+
+    groups = group_events_by_day(events, MONDAY)
+
+    assert [(day, [event['title'] for event in day_events]) for day, day_events in groups] == [
+        ('2026-10-19', ['Conference', 'Standup', 'Late call']),
+        ('2026-10-21', ['Review'])
+    ]
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+import lambda_function
+from lambda_function import LambdaScheduleNotifier
+from store import JsonFileStore, bucket_of
+
+
+class CountingStore(JsonFileStore):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.puts = []
+
+    def put(self, key, value):
+        self.puts.append(key)
+        super().put(key, value)
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeEvents:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, **params):
+        if 'syncToken' in params:
+            items, self.service.changes = self.service.changes, []
+        else:
+            items = list(self.service.calendar.values())
+        return FakeRequest({'items': items, 'nextSyncToken': f"token-{len(self.service.calendar)}"})
+
+
+class FakeService:
+    def __init__(self, events):
+        self.calendar = {event['id']: event for event in events}
+        self.changes = []
+
+    def events(self):
+        return FakeEvents(self)
+
+
+def make_event(index, start):
+    return {
+        'id': f"event{index}",
+        'status': 'confirmed',
+        'summary': f"Event {index} " + 'x' * 200,
+        'start': {'dateTime': (start + timedelta(hours=index)).isoformat()},
+        'end': {'dateTime': (start + timedelta(hours=index, minutes=30)).isoformat()}
+    }
+
+
+def test_large_calendar_is_split_and_only_changed_buckets_are_rewritten(tmp_path, monkeypatch):
+    monkeypatch.setattr(lambda_function, 'EVENT_BUCKET_BYTES', 64 * 1024)
+    store = CountingStore(str(tmp_path))
+    notifier = LambdaScheduleNotifier(store=store, backends=[])
+    today_start, _ = notifier.get_today_window('UTC')
+    service = FakeService([make_event(index, today_start) for index in range(2000)])
+
+    events = notifier.sync_calendar(service, 'shared', 'alice', 'UTC')
+    assert len(events) == 2000
+    head = store.get('events:alice:shared')
+    assert head['buckets'] > 1
+    assert 'events' not in head
+
+    # One changed event rewrites its own bucket and the head, nothing else
+    changed = dict(make_event(7, today_start), summary='Moved')
+    service.changes = [changed, {'id': 'event8', 'status': 'cancelled'}]
+    store.puts = []
+    events = notifier.sync_calendar(service, 'shared', 'alice', 'UTC')
+    assert events['event7']['summary'] == 'Moved'
+    assert 'event8' not in events
+    assert len(events) == 1999
+    assert sorted(store.puts) == sorted({f"events:alice:shared:{head['buckets']}:"
+                                         f"{bucket_of(event_id, head['buckets'])}"
+                                         for event_id in ('event7', 'event8')} | {'events:alice:shared'})
+
+
+def test_shrinking_calendar_moves_to_fewer_buckets(tmp_path, monkeypatch):
+    monkeypatch.setattr(lambda_function, 'EVENT_BUCKET_BYTES', 64 * 1024)
+    store = CountingStore(str(tmp_path))
+    notifier = LambdaScheduleNotifier(store=store, backends=[])
+    today_start, _ = notifier.get_today_window('UTC')
+    service = FakeService([make_event(index, today_start) for index in range(2000)])
+    notifier.sync_calendar(service, 'shared', 'alice', 'UTC')
+    old_count = store.get('events:alice:shared')['buckets']
+
+    service.changes = [{'id': f"event{index}", 'status': 'cancelled'} for index in range(10, 2000)]
+    events = notifier.sync_calendar(service, 'shared', 'alice', 'UTC')
+
+    assert len(events) == 10
+    assert store.get('events:alice:shared')['buckets'] == 1
+    assert all(store.get(f"events:alice:shared:{old_count}:{index}") is None for index in range(old_count))
+    assert notifier.load_event_copy('events:alice:shared')[1] == events
+
+
+def test_copy_written_as_one_document_is_still_read(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    notifier = LambdaScheduleNotifier(store=store, backends=[])
+    today_start, _ = notifier.get_today_window('UTC')
+    event = make_event(1, today_start)
+    store.put('events:alice:primary', {'sync_token': 'old', 'events': {event['id']: event}})
+
+    events = notifier.sync_calendar(FakeService([event]), 'primary', 'alice', 'UTC')
+
+    assert list(events) == ['event1']
+    assert store.get('events:alice:primary') == {'sync_token': 'token-1', 'buckets': 1}
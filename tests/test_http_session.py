@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+import http_session
+from http_session import POOL_HOSTS, POOL_SIZE, get_session
+
+pytest.importorskip('requests')
+
+
+@pytest.fixture(autouse=True)
+def fresh_session(monkeypatch):
+    monkeypatch.setattr(http_session, '_session', None)
+
+
+def test_one_session_is_shared_by_every_caller():
+    sessions = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        sessions.append(get_session())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(session) for session in sessions}) == 1
+    assert get_session() is sessions[0]
+
+
+def test_session_pools_connections_for_every_worker():
+    session = get_session()
+
+    for prefix in ('https://', 'http://'):
+        adapter = session.get_adapter(f"{prefix}api.pushover.net")
+        assert adapter._pool_connections == POOL_HOSTS
+        assert adapter._pool_maxsize == POOL_SIZE
+    assert session.get_adapter('https://a.example') is session.get_adapter('https://b.example')
@@ -0,0 +1,88 @@
+import contextvars
+import json
+import threading
+
+import instrumentation
+from instrumentation import MAX_SAMPLES, ContextThreadPoolExecutor, Instrumentation
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_phases_and_counters_are_summarised_in_milliseconds():
+    clock = Clock()
+    metrics = Instrumentation(clock=clock)
+
+    for seconds in (0.1, 0.3):
+        with metrics.timer('calendar_fetch'):
+            clock.now += seconds
+    metrics.count('calendar_pages', 2)
+    metrics.count('calendar_pages')
+
+    assert metrics.summary() == {
+        'duration_ms': 400.0,
+        'phases': {'calendar_fetch': {'count': 2, 'total_ms': 400.0, 'max_ms': 300.0}},
+        'counters': {'calendar_pages': 3}
+    }
+
+
+def test_emf_document_lists_every_metric_with_capped_samples():
+    metrics = Instrumentation(clock=Clock())
+    for _ in range(MAX_SAMPLES + 20):
+        metrics.record('pushover_send', 0.05)
+    metrics.record('handler', 1.5)
+    metrics.count('calendar_bytes', 2048)
+
+    document = metrics.emf(namespace='Test', dimensions={'FunctionName': 'notifier'}, properties={'action': 'daily'})
+
+    assert document['pushover_send_ms'] == [50.0] * MAX_SAMPLES
+    assert document['handler_ms'] == 1500.0
+    assert document['calendar_bytes'] == 2048
+    assert (document['FunctionName'], document['action']) == ('notifier', 'daily')
+    directive = document['_aws']['CloudWatchMetrics'][0]
+    assert (directive['Namespace'], directive['Dimensions']) == ('Test', [['FunctionName']])
+    assert {metric['Name']: metric['Unit'] for metric in directive['Metrics']} == {
+        'duration_ms': 'Milliseconds',
+        'pushover_send_ms': 'Milliseconds',
+        'handler_ms': 'Milliseconds',
+        'calendar_bytes': 'Bytes'
+    }
+    assert json.loads(json.dumps(document)) == document
+
+
+def test_worker_threads_record_into_the_invocation_that_submitted_them():
+    def invocation(results):
+        metrics = instrumentation.start_invocation()
+        with ContextThreadPoolExecutor(max_workers=4) as executor:
+            for future in [executor.submit(instrumentation.count, 'api_calls') for _ in range(10)]:
+                future.result()
+        results.append(metrics.summary()['counters'])
+
+    results = []
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(invocation, results)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{'api_calls': 10}] * 3
+
+
+def test_emit_prints_one_json_line(capsys, monkeypatch):
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'notifier')
+
+    def invocation():
+        instrumentation.start_invocation()
+        instrumentation.count('reminders_sent')
+        return instrumentation.emit({'action': 'send_reminders'})
+
+    summary = contextvars.copy_context().run(invocation)
+
+    line = json.loads(capsys.readouterr().out)
+    assert summary['counters'] == {'reminders_sent': 1}
+    assert (line['FunctionName'], line['reminders_sent']) == ('notifier', 1)
@@ -0,0 +1,171 @@
+import pytest
+
+from reconciler import EventBridgeScheduleBackend, SqliteScheduleBackend, desired_schedules, reconcile, schedule_name
+from store import JsonFileStore
+
+
+class RecordingBackend(SqliteScheduleBackend):
+    def __init__(self):
+        super().__init__()
+        self.applied = []
+
+    def apply(self, creates, updates, deletes):
+        self.applied.append(([s['name'] for s in creates], [s['name'] for s in updates], [s['name'] for s in deletes]))
+        super().apply(creates, updates, deletes)
+
+
+def make_reminder(tenant_id, event_id, fire_at, message='Starts soon'):
+    return {
+        'key': f"{tenant_id}:{event_id}",
+        'fire_at': fire_at,
+        'tenant_id': tenant_id,
+        'recipient': f"{tenant_id}-user",
+        'title': 'Event Reminder',
+        'message': message
+    }
+
+
+def test_first_reconcile_creates_every_schedule():
+    backend = RecordingBackend()
+    reminders = [make_reminder('alice', 'a', 1000), make_reminder('alice', 'b', 2000)]
+
+    counts = reconcile(desired_schedules(reminders), backend, ['alice'])
+
+    assert counts == {'created': 2, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    assert set(backend.list_schedules(['alice'])) == {schedule_name('alice:a'), schedule_name('alice:b')}
+    assert backend.api_calls == 2
+
+
+def test_only_changed_schedules_are_applied():
+    backend = RecordingBackend()
+    reconcile(desired_schedules([
+        make_reminder('alice', 'same', 1000),
+        make_reminder('alice', 'moved', 2000),
+        make_reminder('alice', 'reworded', 3000),
+        make_reminder('alice', 'cancelled', 4000)
+    ]), backend, ['alice'])
+    backend.applied.clear()
+    calls = backend.api_calls
+
+    counts = reconcile(desired_schedules([
+        make_reminder('alice', 'same', 1000),
+        make_reminder('alice', 'moved', 2500),
+        make_reminder('alice', 'reworded', 3000, message='Moved to room 2'),
+        make_reminder('alice', 'new', 5000)
+    ]), backend, ['alice'])
+
+    assert counts == {'created': 1, 'updated': 2, 'deleted': 1, 'unchanged': 1}
+    assert backend.applied == [(
+        [schedule_name('alice:new')],
+        [schedule_name('alice:moved'), schedule_name('alice:reworded')],
+        [schedule_name('alice:cancelled')]
+    )]
+    assert backend.api_calls - calls == 4
+    assert backend.list_schedules(['alice'])[schedule_name('alice:moved')]['fire_at'] == 2500
+
+
+def test_nothing_is_applied_when_nothing_changed():
+    backend = RecordingBackend()
+    desired = desired_schedules([make_reminder('alice', 'a', 1000)])
+    reconcile(desired, backend, ['alice'])
+    backend.applied.clear()
+
+    counts = reconcile(desired_schedules([make_reminder('alice', 'a', 1000)]), backend, ['alice'])
+
+    assert counts == {'created': 0, 'updated': 0, 'deleted': 0, 'unchanged': 1}
+    assert backend.applied == []
+
+
+def test_reconciling_one_tenant_leaves_other_tenants_alone():
+    backend = RecordingBackend()
+    reconcile(desired_schedules([make_reminder('alice', 'a', 1000)]), backend, ['alice'])
+    reconcile(desired_schedules([make_reminder('bob', 'b', 1000)]), backend, ['bob'])
+
+    counts = reconcile({}, backend, ['alice'])
+
+    assert counts == {'created': 0, 'updated': 0, 'deleted': 1, 'unchanged': 0}
+    assert list(backend.list_schedules()) == [schedule_name('bob:b')]
+
+
+def test_schedule_payload_names_the_tenant():
+    schedule = desired_schedules([make_reminder('alice', 'a', 1000)])[schedule_name('alice:a')]
+
+    assert schedule['payload'] == {
+        'action': 'send_reminder',
+        'tenant_id': 'alice',
+        'recipient': 'alice-user',
+        'title': 'Event Reminder',
+        'message': 'Starts soon'
+    }
+
+
+class ConflictException(Exception):
+    pass
+
+
+class ResourceNotFoundException(Exception):
+    pass
+
+
+class FakeSchedulerClient:
+    class exceptions:
+        ConflictException = ConflictException
+        ResourceNotFoundException = ResourceNotFoundException
+
+    def __init__(self, create_error=None, update_error=None, delete_error=None):
+        self.errors = {'create': create_error, 'update': update_error, 'delete': delete_error}
+        self.calls = []
+
+    def call(self, operation):
+        self.calls.append(operation)
+        if self.errors[operation]:
+            raise self.errors[operation]()
+
+    def create_schedule(self, **request):
+        self.call('create')
+
+    def update_schedule(self, **request):
+        self.call('update')
+
+    def delete_schedule(self, **request):
+        self.call('delete')
+
+
+def make_eventbridge_backend(tmp_path, client):
+    return EventBridgeScheduleBackend(JsonFileStore(str(tmp_path)), target_arn='arn:target', role_arn='arn:role',
+                                      client=client)
+
+
+def test_eventbridge_falls_back_between_create_and_update_once(tmp_path):
+    schedule = desired_schedules([make_reminder('alice', 'a', 2_000_000_000)])[schedule_name('alice:a')]
+
+    client = FakeSchedulerClient(create_error=ConflictException)
+    make_eventbridge_backend(tmp_path, client).call('create', schedule)
+    assert client.calls == ['create', 'update']
+
+    client = FakeSchedulerClient(update_error=ResourceNotFoundException)
+    make_eventbridge_backend(tmp_path, client).call('update', schedule)
+    assert client.calls == ['update', 'create']
+
+    client = FakeSchedulerClient(delete_error=ResourceNotFoundException)
+    make_eventbridge_backend(tmp_path, client).call('delete', schedule)
+    assert client.calls == ['delete']
+
+
+def test_eventbridge_conflicting_fallback_raises_instead_of_recursing(tmp_path):
+    schedule = desired_schedules([make_reminder('alice', 'a', 2_000_000_000)])[schedule_name('alice:a')]
+
+    client = FakeSchedulerClient(create_error=ConflictException, update_error=ConflictException)
+    with pytest.raises(ConflictException):
+        make_eventbridge_backend(tmp_path, client).call('update', schedule)
+    assert client.calls == ['update']
+
+    client = FakeSchedulerClient(create_error=ConflictException, update_error=ResourceNotFoundException)
+    with pytest.raises(ResourceNotFoundException):
+        make_eventbridge_backend(tmp_path, client).call('create', schedule)
+    assert client.calls == ['create', 'update']
+
+    # A failed change is reported and left out of the mirror, to be retried on the next run
+    backend = make_eventbridge_backend(tmp_path, client)
+    backend.apply([schedule], [], [])
+    assert backend.list_schedules(['alice']) == {}
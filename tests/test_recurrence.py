@@ -0,0 +1,127 @@
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import recurrence
+
+pytest.importorskip('dateutil')
+
+NEW_YORK = ZoneInfo('America/New_York')
+
+
+def make_master(rules, start='2012-01-31T09:00:00-05:00', end='2012-01-31T10:00:00-05:00', event_id='series'):
+    if 'T' in start:
+        start_value = {'dateTime': start, 'timeZone': 'America/New_York'}
+        end_value = {'dateTime': end, 'timeZone': 'America/New_York'}
+    else:
+        start_value, end_value = {'date': start}, {'date': end}
+    return {'id': event_id, 'summary': 'Standup', 'recurrence': rules, 'start': start_value, 'end': end_value}
+
+
+def local_day(year, month, day):
+    return datetime(year, month, day, tzinfo=NEW_YORK)
+
+
+def instances(master, window_start, window_end):
+    return list(recurrence.iter_instances(master, window_start, window_end, 'America/New_York'))
+
+
+@pytest.mark.parametrize('rule', [
+    'RRULE:FREQ=DAILY',
+    'RRULE:FREQ=DAILY;INTERVAL=3',
+    'RRULE:FREQ=DAILY;BYHOUR=8,17;BYMINUTE=30',
+    'RRULE:FREQ=WEEKLY',
+    'RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE,FR',
+    'RRULE:FREQ=WEEKLY;INTERVAL=3;WKST=SU;BYDAY=SU,SA',
+    'RRULE:FREQ=MONTHLY',
+    'RRULE:FREQ=MONTHLY;INTERVAL=5',
+    'RRULE:FREQ=MONTHLY;BYDAY=-1FR',
+    'RRULE:FREQ=MONTHLY;BYMONTHDAY=-1',
+    'RRULE:FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1',
+    'RRULE:FREQ=YEARLY',
+    'RRULE:FREQ=YEARLY;INTERVAL=2;BYMONTH=3;BYDAY=2SU',
+    'RRULE:FREQ=YEARLY;BYWEEKNO=20;BYDAY=MO',
+    'RRULE:FREQ=DAILY;UNTIL=20261101T000000Z',
+    'RRULE:FREQ=WEEKLY;COUNT=800',
+])
+@pytest.mark.parametrize('window_start', [
+    local_day(2026, 3, 8),
+    local_day(2026, 11, 1),
+    local_day(2027, 1, 1),
+    datetime(2026, 10, 1, 2, tzinfo=timezone.utc),
+])
+def test_rules_started_long_ago_expand_exactly_as_from_dtstart(monkeypatch, rule, window_start):
+    master = make_master([rule, 'EXDATE;TZID=America/New_York:20261102T090000'])
+    window_end = window_start + timedelta(days=45)
+
+    fast = instances(master, window_start, window_end)
+    with monkeypatch.context() as patch:
+        # Without an anchor every rule walks from DTSTART
+        patch.setattr(recurrence, 'month_before', lambda moment: None)
+        expected = instances(master, window_start, window_end)
+
+    assert fast == expected
+
+
+def test_all_day_series_expand_exactly_as_from_dtstart(monkeypatch):
+    master = make_master(['RRULE:FREQ=MONTHLY;BYMONTHDAY=29'], start='2012-02-29', end='2012-03-01')
+    window_start, window_end = local_day(2026, 1, 1), local_day(2027, 1, 1)
+
+    fast = instances(master, window_start, window_end)
+    monkeypatch.setattr(recurrence, 'month_before', lambda moment: None)
+
+    assert fast == instances(master, window_start, window_end)
+    assert date(2026, 2, 28) not in [start for start, _ in fast] and len(fast) == 11
+
+
+def test_instances_keep_their_local_time_across_dst():
+    master = make_master(['RRULE:FREQ=DAILY'])
+
+    starts = [start for start, _ in instances(master, local_day(2026, 3, 7), local_day(2026, 3, 10))]
+
+    assert [start.astimezone(NEW_YORK).hour for start in starts] == [9, 9, 9]
+    assert [start.utcoffset() for start in starts] == [timedelta(hours=-5), timedelta(hours=-4), timedelta(hours=-4)]
+
+
+def test_expand_applies_exdates_overrides_and_cancellations():
+    master = make_master([
+        'RRULE:FREQ=DAILY',
+        'EXDATE;TZID=America/New_York:20261019T090000'
+    ])
+    moved = {
+        'id': 'series_20261020T130000Z',
+        'recurringEventId': 'series',
+        'originalStartTime': {'dateTime': '2026-10-20T09:00:00-04:00'},
+        'start': {'dateTime': '2026-10-20T15:00:00-04:00'},
+        'end': {'dateTime': '2026-10-20T16:00:00-04:00'},
+        'summary': 'Standup (moved)'
+    }
+    cancelled = {
+        'id': 'series_20261021T130000Z',
+        'recurringEventId': 'series',
+        'originalStartTime': {'dateTime': '2026-10-21T09:00:00-04:00'},
+        'status': 'cancelled'
+    }
+
+    events = list(recurrence.expand_events([master, moved, cancelled], local_day(2026, 10, 18),
+                                           local_day(2026, 10, 23), 'America/New_York'))
+
+    by_start = {event['start']['dateTime']: event['summary'] for event in events}
+    assert by_start == {
+        '2026-10-18T09:00:00-04:00': 'Standup',
+        '2026-10-20T15:00:00-04:00': 'Standup (moved)',
+        '2026-10-22T09:00:00-04:00': 'Standup'
+    }
+    assert 'series_20261018T130000Z' in {event['id'] for event in events}
+
+
+def test_has_instances_after_sees_ended_and_continuing_series():
+    today = local_day(2026, 10, 17)
+
+    assert recurrence.has_instances_after(make_master(['RRULE:FREQ=DAILY']), today)
+    assert not recurrence.has_instances_after(make_master(['RRULE:FREQ=DAILY;UNTIL=20151231T000000Z']), today)
+    assert not recurrence.has_instances_after(make_master(['RRULE:FREQ=WEEKLY;COUNT=10']), today)
+    # Leap days come round every four years, well inside the horizon
+    assert recurrence.has_instances_after(make_master(['RRULE:FREQ=YEARLY'], start='2012-02-29', end='2012-03-01'),
+                                          today)
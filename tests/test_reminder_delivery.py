@@ -0,0 +1,79 @@
+import lambda_function
+import timesource
+from backends import MemoryBackend
+from dispatcher import summarize_results
+from lambda_function import LambdaScheduleNotifier
+from reminders import ReminderScheduler
+from store import JsonFileStore
+
+NOW = 1_800_000_000.0
+
+
+class FixedClock:
+    def time(self):
+        return NOW
+
+    def sleep(self, seconds):
+        pass
+
+
+class FailingBackend(MemoryBackend):
+    name = 'failing'
+
+    async def send_many(self, jobs):
+        results = [{'recipient': recipient, 'title': title, 'sent': False, 'latency_ms': 0.0, 'error': 'down'}
+                   for recipient, title, _ in jobs]
+        return summarize_results(results, 0)
+
+
+def schedule_reminders(store, fire_times):
+    scheduler = ReminderScheduler()
+    for index, fire_at in enumerate(fire_times):
+        scheduler.schedule(f"alice:event{index}", fire_at, 'alice', 'pushover-user', f"Event {index}", 'Soon')
+    scheduler.save(store)
+
+
+def run_tick(monkeypatch, store, backends):
+    tenants = [{'id': 'alice', 'email': 'alice@example.com'}]
+    monkeypatch.setattr(lambda_function, 'load_tenants', lambda: tenants)
+    timesource.install(FixedClock())
+    try:
+        return LambdaScheduleNotifier(store=store, backends=backends).send_due_reminders()
+    finally:
+        timesource.install()
+
+
+def test_due_reminders_go_through_the_configured_backends(tmp_path, monkeypatch):
+    store = JsonFileStore(str(tmp_path))
+    schedule_reminders(store, [NOW - 60, NOW + 600])
+    backend = MemoryBackend()
+
+    result = run_tick(monkeypatch, store, [backend])
+
+    assert result == {'reminders_count': 1, 'sent_count': 1}
+    assert [message['title'] for message in backend.sent] == ['Event 0']
+    assert [r['key'] for r in ReminderScheduler.load(store, ['alice']).reminders_for('alice')] == ['alice:event1']
+
+
+def test_unsent_reminders_stay_scheduled_until_their_event_starts(tmp_path, monkeypatch):
+    store = JsonFileStore(str(tmp_path))
+    lead = ReminderScheduler().lead.total_seconds()
+    # The first event is still ahead, the second has already started
+    schedule_reminders(store, [NOW - 60, NOW - lead - 60])
+
+    result = run_tick(monkeypatch, store, [FailingBackend()])
+
+    assert result == {'reminders_count': 2, 'sent_count': 0}
+    assert [r['key'] for r in ReminderScheduler.load(store, ['alice']).reminders_for('alice')] == ['alice:event0']
+
+    backend = MemoryBackend()
+    assert run_tick(monkeypatch, store, [backend]) == {'reminders_count': 1, 'sent_count': 1}
+    assert [message['title'] for message in backend.sent] == ['Event 0']
+
+
+def test_reminders_are_kept_when_no_backend_is_configured(tmp_path, monkeypatch):
+    store = JsonFileStore(str(tmp_path))
+    schedule_reminders(store, [NOW - 60])
+
+    assert run_tick(monkeypatch, store, []) == {'reminders_count': 1, 'sent_count': 0}
+    assert len(ReminderScheduler.load(store, ['alice'])) == 1
@@ -0,0 +1,253 @@
+from datetime import datetime, timedelta, timezone
+
+from reminders import LocalReminderRunner, ReminderScheduler, build_reminder
+from store import JsonFileStore
+
+START = datetime(2026, 10, 19, 9, 0, tzinfo=timezone.utc)
+NOW = START.timestamp() - 3600
+
+
+def schedule(scheduler, key, fire_at, tenant_id='alice'):
+    scheduler.schedule(key, fire_at, tenant_id, f"{tenant_id}-user", 'Event Reminder', f"Reminder for {key}")
+
+
+def make_event(event_id, start, title='Standup'):
+    return {
+        'id': event_id,
+        'title': title,
+        'time': start.strftime('%H:%M'),
+        'location': '',
+        'start': start.isoformat()
+    }
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_pop_due_returns_due_reminders_earliest_first():
+    scheduler = ReminderScheduler()
+    schedule(scheduler, 'c', 300)
+    schedule(scheduler, 'a', 100)
+    schedule(scheduler, 'b', 200)
+    schedule(scheduler, 'later', 1000)
+
+    assert [r['key'] for r in scheduler.pop_due(300)] == ['a', 'b', 'c']
+    assert scheduler.pop_due(300) == []
+    assert len(scheduler) == 1
+    assert scheduler.next_fire_time() == 1000
+
+
+def test_cancelled_reminders_are_skipped_lazily():
+    scheduler = ReminderScheduler()
+    schedule(scheduler, 'a', 100)
+    schedule(scheduler, 'b', 200)
+
+    assert scheduler.cancel('a')
+    assert not scheduler.cancel('a')
+    assert 'a' not in scheduler
+    # The cancelled entry is still in the heap until it reaches the top
+    assert len(scheduler._heap) == 2
+
+    assert scheduler.next_fire_time() == 200
+    assert [r['key'] for r in scheduler.pop_due(1000)] == ['b']
+
+
+def test_rescheduling_fires_only_at_the_new_time():
+    scheduler = ReminderScheduler()
+    schedule(scheduler, 'a', 100)
+    schedule(scheduler, 'a', 500)
+
+    assert scheduler.next_fire_time() == 500
+    assert scheduler.pop_due(100) == []
+    assert [r['fire_at'] for r in scheduler.pop_due(500)] == [500]
+
+    # Moving a reminder earlier wins over its older, later entry too
+    schedule(scheduler, 'b', 900)
+    schedule(scheduler, 'b', 600)
+    assert [r['fire_at'] for r in scheduler.pop_due(600)] == [600]
+    assert scheduler.pop_due(900) == []
+
+
+def test_heap_is_rebuilt_once_stale_entries_dominate():
+    scheduler = ReminderScheduler()
+    for index in range(200):
+        schedule(scheduler, f"event{index}", index)
+    for index in range(190):
+        scheduler.cancel(f"event{index}")
+
+    assert len(scheduler._heap) <= 2 * len(scheduler) + 64
+    assert [r['key'] for r in scheduler.pop_due(1000)] == [f"event{index}" for index in range(190, 200)]
+
+
+def test_save_only_writes_changed_tenants_and_load_restores_them(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    scheduler = ReminderScheduler()
+    schedule(scheduler, 'alice:a', 100, 'alice')
+    schedule(scheduler, 'bob:b', 200, 'bob')
+    scheduler.save(store)
+
+    scheduler.cancel('alice:a')
+    store.put('reminders:bob', 'untouched')
+    scheduler.save(store)
+
+    assert store.get('reminders:alice') == {'next_fire_at': None, 'reminders': []}
+    assert store.get('reminders:bob') == 'untouched'
+
+    loaded = ReminderScheduler.load(store, ['alice'])
+    schedule(loaded, 'alice:c', 300, 'alice')
+    loaded.save(store)
+    loaded = ReminderScheduler.load(store, ['alice'])
+    assert [r['key'] for r in loaded.pop_due(1000)] == ['alice:c']
+
+
+def test_loading_due_reminders_skips_tenants_with_nothing_due(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    scheduler = ReminderScheduler()
+    schedule(scheduler, 'alice:a', 100, 'alice')
+    schedule(scheduler, 'alice:b', 900, 'alice')
+    schedule(scheduler, 'bob:b', 500, 'bob')
+    scheduler.save(store)
+    store.put('reminders:carol', {'next_fire_at': None, 'reminders': []})
+
+    loaded = ReminderScheduler.load(store, ['alice', 'bob', 'carol'], due_by=200)
+    assert sorted(r['key'] for r in loaded.reminders_for('alice')) == ['alice:a', 'alice:b']
+    assert loaded.reminders_for('bob') == []
+
+    # Skipped tenants are not rewritten
+    assert [r['key'] for r in loaded.pop_due(200)] == ['alice:a']
+    loaded.save(store)
+    assert store.get('reminders:alice')['next_fire_at'] == 900
+    assert store.get('reminders:bob')['next_fire_at'] == 500
+
+
+def test_reminders_saved_as_a_list_are_still_loaded(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    store.put('reminders:alice', [
+        {'key': 'alice:a', 'fire_at': 100, 'tenant_id': 'alice', 'recipient': 'alice-user',
+         'title': 'Event Reminder', 'message': 'Soon'}
+    ])
+
+    assert ReminderScheduler.load(store, ['alice'], due_by=50).reminders_for('alice') == []
+    assert [r['key'] for r in ReminderScheduler.load(store, ['alice'], due_by=100).pop_due(100)] == ['alice:a']
+
+
+def test_sync_tenant_events_schedules_moves_and_cancels():
+    scheduler = ReminderScheduler(lead_minutes=30)
+    tenant = {'id': 'alice', 'pushover_user': 'alice-user'}
+    events = [make_event('standup', START), make_event('review', START + timedelta(hours=2))]
+
+    assert scheduler.sync_tenant_events(tenant, events, now=NOW) == (2, 0)
+    assert scheduler.get('alice:standup')['fire_at'] == (START - timedelta(minutes=30)).timestamp()
+
+    # Unchanged events are left alone
+    assert scheduler.sync_tenant_events(tenant, events, now=NOW) == (0, 0)
+
+    moved = [make_event('standup', START + timedelta(minutes=15))]
+    assert scheduler.sync_tenant_events(tenant, moved, now=NOW) == (1, 1)
+    assert 'alice:review' not in scheduler
+    assert scheduler.next_fire_time() == (START - timedelta(minutes=15)).timestamp()
+
+
+def test_sync_tenant_events_skips_all_day_and_past_reminders():
+    scheduler = ReminderScheduler(lead_minutes=30)
+    tenant = {'id': 'alice', 'pushover_user': 'alice-user'}
+    all_day = dict(make_event('holiday', START), time='All day')
+    soon = make_event('soon', datetime.fromtimestamp(NOW, timezone.utc) + timedelta(minutes=10))
+
+    assert scheduler.sync_tenant_events(tenant, [all_day, soon], now=NOW) == (0, 0)
+    assert len(scheduler) == 0
+
+
+def test_local_runner_sends_reminders_as_they_come_due():
+    scheduler = ReminderScheduler()
+    schedule(scheduler, 'a', NOW + 30)
+    schedule(scheduler, 'b', NOW + 90)
+    clock = FakeClock(NOW)
+    batches = []
+
+    def send(reminders):
+        batches.append([(r['key'], clock.now) for r in reminders])
+        return [True] * len(reminders)
+
+    LocalReminderRunner(scheduler, send, clock=clock.time, sleep=clock.sleep, max_sleep=60).run()
+
+    assert batches == [[('a', NOW + 30)], [('b', NOW + 90)]]
+    assert clock.sleeps == [30, 60]
+
+
+def test_local_runner_retries_unsent_reminders_until_the_event_starts():
+    scheduler = ReminderScheduler(lead_minutes=5)
+    schedule(scheduler, 'a', NOW)
+    clock = FakeClock(NOW)
+    attempts = []
+
+    def send(reminders):
+        attempts.append(clock.now)
+        return [len(attempts) == 3] * len(reminders)
+
+    runner = LocalReminderRunner(scheduler, send, clock=clock.time, sleep=clock.sleep, retry_delay=60)
+    runner.run()
+    assert attempts == [NOW, NOW + 60, NOW + 120]
+
+    # Never sent: given up on once the event has started
+    schedule(scheduler, 'b', clock.now)
+    attempts.clear()
+    runner.send = lambda reminders: attempts.append(clock.now) or [False] * len(reminders)
+    started = clock.now
+    runner.run()
+    assert attempts == [started + 60 * n for n in range(6)]
+    assert len(scheduler) == 0
+
+
+def test_sync_between_fire_time_and_delivery_keeps_due_reminders():
+    scheduler = ReminderScheduler(lead_minutes=30)
+    tenant = {'id': 'alice', 'pushover_user': 'alice-user'}
+    events = [make_event('standup', START)]
+    fire_at = (START - timedelta(minutes=30)).timestamp()
+    scheduler.sync_tenant_events(tenant, events, now=NOW)
+
+    # Due but not sent yet: a sync must not drop it
+    assert scheduler.sync_tenant_events(tenant, events, now=fire_at + 60) == (0, 0)
+    assert [r['key'] for r in scheduler.pop_due(fire_at + 120)] == ['alice:standup']
+
+    # Put back after a failed send: still kept by the next sync
+    scheduler.schedule('alice:standup', fire_at, 'alice', 'alice-user', *build_reminder(events[0], 30))
+    assert scheduler.sync_tenant_events(tenant, events, now=fire_at + 180) == (0, 0)
+    assert [r['key'] for r in scheduler.pop_due(fire_at + 240)] == ['alice:standup']
+
+    # Sent: not recreated by a later sync
+    assert scheduler.sync_tenant_events(tenant, events, now=fire_at + 300) == (0, 0)
+    assert len(scheduler) == 0
+
+
+def test_sync_drops_reminders_once_their_event_starts_or_changes():
+    scheduler = ReminderScheduler(lead_minutes=30)
+    tenant = {'id': 'alice', 'pushover_user': 'alice-user'}
+    events = [make_event('standup', START), make_event('review', START)]
+    scheduler.sync_tenant_events(tenant, events, now=NOW)
+
+    renamed = [make_event('standup', START), make_event('review', START, title='Design review')]
+    assert scheduler.sync_tenant_events(tenant, renamed, now=START.timestamp() - 60) == (0, 1)
+    assert 'alice:standup' in scheduler
+
+    assert scheduler.sync_tenant_events(tenant, renamed, now=START.timestamp()) == (0, 1)
+    assert len(scheduler) == 0
+
+
+def test_tenants_without_a_pushover_user_get_reminders():
+    scheduler = ReminderScheduler(lead_minutes=30)
+    tenant = {'id': 'alice', 'email': 'alice@example.com'}
+
+    assert scheduler.sync_tenant_events(tenant, [make_event('standup', START)], now=NOW) == (1, 0)
+    assert scheduler.sync_tenant_events(tenant, [make_event('standup', START)], now=NOW) == (0, 0)
+    assert scheduler.get('alice:standup')['tenant_id'] == 'alice'
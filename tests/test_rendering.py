@@ -0,0 +1,79 @@
+from rendering import ELLIPSIS, Markup, Renderer
+
+
+def make_events(count, title='Meeting'):
+    return [{'time': f"{9 + index // 60:02d}:{index % 60:02d}", 'title': f"{title} {index}", 'location': ''}
+            for index in range(count)]
+
+
+def test_short_document_is_one_message():
+    document = Renderer().schedule('Daily Schedule', make_events(3))
+
+    pages = document.paginate(250, 1024)
+
+    assert pages == [('Daily Schedule', document.text)]
+    assert pages[0][1].startswith("Today's Schedule (3 events):")
+
+
+def test_unlimited_backends_get_the_whole_document():
+    document = Renderer().schedule('Daily Schedule', make_events(200))
+
+    assert document.paginate(None, None) == [('Daily Schedule', document.text)]
+
+
+def test_long_document_is_split_into_numbered_pages_within_the_limit():
+    document = Renderer().schedule('Daily Schedule', make_events(60))
+
+    pages = document.paginate(250, 400, max_messages=10)
+
+    assert len(pages) > 1
+    assert [title for title, _ in pages] == [f"Daily Schedule ({n}/{len(pages)})" for n in range(1, len(pages) + 1)]
+    assert all(len(message) <= 400 for _, message in pages)
+    assert all(message.startswith('(continued)') for _, message in pages[1:])
+
+    # Every event appears exactly once, in order
+    lines = [line for _, message in pages for line in message.splitlines() if line.startswith('•')]
+    assert lines == [Renderer().event_line(event) for event in make_events(60)]
+
+
+def test_pages_past_max_messages_are_summed_up():
+    document = Renderer().schedule('Daily Schedule', make_events(100))
+
+    pages = document.paginate(250, 300, max_messages=2)
+
+    assert len(pages) == 2
+    assert all(len(message) <= 300 for _, message in pages)
+    shown = sum(1 for _, message in pages for line in message.splitlines() if line.startswith('•'))
+    assert pages[-1][1].rstrip('\n').endswith(f"…and {100 - shown} more events")
+
+
+def test_line_longer_than_a_message_is_abbreviated():
+    document = Renderer().lines('Calendar Update', ['x' * 500])
+
+    pages = document.paginate(250, 100)
+
+    assert len(pages) == 1
+    assert len(pages[0][1]) <= 100
+    assert pages[0][1].rstrip('\n').endswith(ELLIPSIS)
+
+
+def test_title_is_abbreviated_to_fit_with_its_page_number():
+    document = Renderer().schedule('T' * 40, make_events(30))
+
+    pages = document.paginate(20, 300, max_messages=10)
+
+    assert all(len(title) <= 20 for title, _ in pages)
+    assert pages[0][0] == 'T' * 13 + ELLIPSIS + f" (1/{len(pages)})"
+
+
+def test_html_pages_are_markup_and_abbreviation_keeps_tags_balanced():
+    renderer = Renderer('html')
+    events = make_events(40, title='Q&A <session>')
+
+    pages = renderer.schedule('Daily Schedule', events).paginate(250, 300, max_messages=3)
+
+    assert all(isinstance(message, Markup) and len(message) <= 300 for _, message in pages)
+    assert '&amp;' in pages[0][1] and '<session>' not in pages[0][1]
+
+    line = renderer.abbreviate_line(renderer.event_line(events[0]), 20)
+    assert len(line) <= 20 and '<' not in line
@@ -0,0 +1,158 @@
+import json
+import os
+
+from response_cache import DiskTier, ResponseCache
+from rest_calendar import RestCalendarError
+
+NOW = 1_800_000_000.0
+
+
+class Clock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Calendar:
+    """
+    A calendar page served with an ETag, answering 304 to a matching If-None-Match
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.version = 1
+        self.requests = []
+
+    def request(self):
+        calendar = self
+
+        class Request:
+            def __init__(self):
+                self.headers = {}
+                self.etag = None
+
+            def execute(self):
+                calendar.requests.append(dict(self.headers))
+                etag = f'"v{calendar.version}"'
+                if self.headers.get('If-None-Match') == etag:
+                    raise RestCalendarError(304, '')
+                self.etag = etag
+                return {'items': list(calendar.items)}
+
+        return Request()
+
+
+def page_size(body):
+    return len(json.dumps(body, separators=(',', ':')))
+
+
+def test_unchanged_page_is_served_from_the_cache_after_a_304():
+    cache = ResponseCache(1024 * 1024, clock=Clock())
+    calendar = Calendar([{'id': 'a'}])
+
+    first = cache.execute(calendar.request(), 'key')
+    second = cache.execute(calendar.request(), 'key')
+
+    assert second is first
+    assert calendar.requests == [{}, {'If-None-Match': '"v1"'}]
+
+
+def test_changed_page_replaces_the_cached_one():
+    cache = ResponseCache(1024 * 1024, clock=Clock())
+    calendar = Calendar([{'id': 'a'}])
+    cache.execute(calendar.request(), 'key')
+
+    calendar.items.append({'id': 'b'})
+    calendar.version = 2
+
+    assert cache.execute(calendar.request(), 'key') == {'items': [{'id': 'a'}, {'id': 'b'}]}
+    assert cache.get('key')[0] == '"v2"'
+
+
+def test_least_recently_used_pages_are_evicted_over_budget():
+    body = {'items': [{'id': 'x' * 100}]}
+    cache = ResponseCache(3 * page_size(body), clock=Clock())
+    for key in ('a', 'b', 'c'):
+        cache.put(key, '"v1"', body)
+
+    cache.get('a')
+    cache.put('d', '"v1"', body)
+
+    assert len(cache) == 3
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in ('a', 'c', 'd'))
+
+    # A page bigger than the whole budget is never cached
+    cache.put('huge', '"v1"', {'items': [{'id': 'x' * 1000}]})
+    assert cache.get('huge') is None and len(cache) == 3
+
+
+def test_entries_expire_ttl_after_they_were_last_validated():
+    clock = Clock()
+    cache = ResponseCache(1024 * 1024, ttl=600, clock=clock)
+    calendar = Calendar([{'id': 'a'}])
+    cache.execute(calendar.request(), 'key')
+
+    clock.now += 500
+    cache.execute(calendar.request(), 'key')
+    clock.now += 500
+    assert cache.get('key') is not None
+
+    clock.now += 601
+    cache.execute(calendar.request(), 'key')
+    assert calendar.requests[-1] == {}
+
+
+def test_response_without_etag_drops_the_cached_page():
+    cache = ResponseCache(1024 * 1024, clock=Clock())
+    cache.put('key', '"v1"', {'items': []})
+
+    class Request:
+        headers = {}
+        etag = None
+
+        def execute(self):
+            return {'items': [{'id': 'a'}]}
+
+    assert cache.execute(Request(), 'key') == {'items': [{'id': 'a'}]}
+    assert cache.get('key') is None
+
+
+def test_disk_tier_outlives_the_memory_layer(tmp_path):
+    clock = Clock()
+    disk = DiskTier(str(tmp_path), 1024 * 1024)
+    ResponseCache(1024 * 1024, disk=disk, clock=clock).put('key', '"v1"', {'items': [{'id': 'a'}]})
+
+    restarted = ResponseCache(1024 * 1024, disk=DiskTier(str(tmp_path), 1024 * 1024), clock=clock)
+    calendar = Calendar([{'id': 'a'}])
+    assert restarted.execute(calendar.request(), 'key') == {'items': [{'id': 'a'}]}
+    assert calendar.requests == [{'If-None-Match': '"v1"'}]
+
+
+def test_expired_disk_entries_are_deleted(tmp_path):
+    clock = Clock()
+    disk = DiskTier(str(tmp_path), 1024 * 1024)
+    ResponseCache(1024 * 1024, ttl=600, disk=disk, clock=clock).put('key', '"v1"', {'items': []})
+
+    clock.now += 601
+    assert ResponseCache(1024 * 1024, ttl=600, disk=disk, clock=clock).get('key') is None
+    assert not os.path.exists(disk.path('key'))
+
+
+def test_disk_tier_prunes_least_recently_validated_files(tmp_path):
+    clock = Clock()
+    body = {'items': [{'id': 'x' * 200}]}
+    disk = DiskTier(str(tmp_path), 3 * (page_size(body) + 30))
+    cache = ResponseCache(1024 * 1024, disk=disk, clock=clock)
+    for key in ('a', 'b', 'c'):
+        clock.now += 10
+        cache.put(key, '"v1"', body)
+
+    clock.now += 10
+    cache.revalidated('a', cache.get('a'))
+    clock.now += 10
+    cache.put('d', '"v1"', body)
+
+    assert sorted(name[:-len('.json')] for name in os.listdir(tmp_path)) == ['a', 'c', 'd']
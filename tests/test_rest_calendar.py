@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import token_cache
+from rest_calendar import RestCalendarClient, RestCalendarError
+from token_cache import TokenCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.text = self.content.decode('utf-8')
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.token_requests = 0
+
+    def post(self, url, data, timeout):
+        self.token_requests += 1
+        return FakeResponse(200, {'access_token': f"token-{self.token_requests}", 'expires_in': 3600})
+
+    def request(self, method, url, params, json, headers, timeout):
+        self.requests.append((method, url, params, headers))
+        return self.responses.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def memory_token_cache(monkeypatch):
+    monkeypatch.setattr(token_cache, '_token_cache', TokenCache())
+
+
+def make_client(session):
+    return RestCalendarClient({'client_id': 'client', 'client_secret': 'secret', 'refresh_token': 'refresh'},
+                              api_url='https://calendar.test/v3', session=session)
+
+
+def test_list_sends_query_and_headers_and_keeps_the_etag():
+    session = FakeSession([FakeResponse(200, {'items': [{'id': 'a'}]}, {'ETag': '"v1"'})])
+    request = make_client(session).events().list(calendarId='team@group.calendar.google.com', singleEvents=True,
+                                                  pageToken=None, maxResults=250)
+    request.headers['If-None-Match'] = '"v0"'
+
+    assert request.execute() == {'items': [{'id': 'a'}]}
+    assert request.etag == '"v1"'
+
+    method, url, params, headers = session.requests[0]
+    assert (method, url) == ('GET', 'https://calendar.test/v3/calendars/team%40group.calendar.google.com/events')
+    assert params == {'singleEvents': 'true', 'maxResults': 250}
+    assert headers == {'If-None-Match': '"v0"', 'Authorization': 'Bearer token-1'}
+
+
+def test_rejected_token_is_refreshed_once():
+    session = FakeSession([FakeResponse(401, {}), FakeResponse(200, {'items': []})])
+
+    assert make_client(session).events().list(calendarId='primary').execute() == {'items': []}
+    assert [request[3]['Authorization'] for request in session.requests] == ['Bearer token-1', 'Bearer token-2']
+
+
+def test_error_responses_carry_the_status():
+    session = FakeSession([FakeResponse(304), FakeResponse(204)])
+    client = make_client(session)
+
+    with pytest.raises(RestCalendarError) as error:
+        client.events().list(calendarId='primary').execute()
+    assert error.value.resp.status == 304
+
+    assert client.channels().stop(body={'id': 'channel', 'resourceId': 'resource'}).execute() == {}
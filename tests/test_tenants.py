@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from backends import MemoryBackend, PushoverBackend, SmtpBackend, WebhookBackend
+from tenants import parse_tenants_config
+
+
+def config(**fields):
+    return json.dumps([dict({'id': 'alice', 'google_credentials': 'creds'}, **fields)])
+
+
+def test_email_only_tenant_is_accepted_with_the_smtp_backend():
+    tenants = parse_tenants_config(config(email='alice@example.com'), [SmtpBackend(default_to='')])
+
+    assert tenants[0]['email'] == 'alice@example.com'
+    assert 'pushover_user' not in tenants[0]
+    assert tenants[0]['calendars'] == ['primary']
+
+
+def test_tenant_needs_an_address_an_enabled_backend_can_use():
+    with pytest.raises(ValueError, match='no address for the enabled notification backends \\(pushover\\)'):
+        parse_tenants_config(config(email='alice@example.com'), [PushoverBackend(token='token')])
+
+    backends = [PushoverBackend(token='token'), WebhookBackend(default_url='')]
+    tenants = parse_tenants_config(config(webhook_url='https://example.com/hook'), backends)
+    assert tenants[0]['webhook_url'] == 'https://example.com/hook'
+
+
+def test_backend_defaults_count_as_an_address():
+    tenants = parse_tenants_config(config(), [WebhookBackend(default_url='https://example.com/hook')])
+
+    assert tenants[0]['id'] == 'alice'
+
+
+def test_tenant_needs_google_credentials():
+    with pytest.raises(ValueError, match='needs google_credentials'):
+        parse_tenants_config(json.dumps([{'id': 'alice', 'pushover_user': 'key'}]), [MemoryBackend()])
@@ -0,0 +1,48 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from timezones import day_window, format_event_time, local_date, localize_event_start, parse_event_start, rfc3339
+
+
+def hours(window):
+    start, end = (moment.astimezone(timezone.utc) for moment in window)
+    return (end - start).total_seconds() / 3600
+
+
+def test_day_window_is_23_or_25_hours_on_clock_change_days():
+    assert hours(day_window(date(2026, 3, 29), 'Europe/London')) == 23
+    assert hours(day_window(date(2026, 10, 25), 'Europe/London')) == 25
+    assert hours(day_window(date(2026, 3, 8), 'America/New_York')) == 23
+    assert hours(day_window(date(2026, 6, 1), 'Europe/London')) == 24
+
+
+def test_day_window_runs_from_local_midnight_to_local_midnight():
+    start, end = day_window(date(2026, 10, 25), 'Europe/London', days=7)
+
+    assert rfc3339(start) == '2026-10-24T23:00:00Z'
+    assert rfc3339(end) == '2026-11-01T00:00:00Z'
+
+
+def test_local_date_depends_on_the_tenant_timezone():
+    now = datetime(2026, 3, 2, 23, 30, tzinfo=timezone.utc)
+
+    assert local_date(now, 'Europe/London') == date(2026, 3, 2)
+    assert local_date(now, 'Asia/Tokyo') == date(2026, 3, 3)
+    assert local_date(now, 'America/Los_Angeles') == date(2026, 3, 2)
+
+
+def test_event_starts_are_shown_in_local_time():
+    assert format_event_time('2026-07-01T08:00:00Z', 'Europe/London') == '09:00'
+    assert format_event_time('2026-07-01T08:00:00Z', 'America/New_York') == '04:00'
+    assert format_event_time('2026-07-01', 'Europe/London') == 'All day'
+    assert localize_event_start('2026-07-01T08:00:00Z', 'Asia/Tokyo') == '2026-07-01T17:00:00+09:00'
+
+
+def test_all_day_events_start_at_local_midnight():
+    assert rfc3339(parse_event_start('2026-07-01', 'Asia/Tokyo')) == '2026-06-30T15:00:00Z'
+
+
+def test_unknown_timezone_is_rejected():
+    with pytest.raises(ValueError, match='Unknown timezone'):
+        day_window(date(2026, 3, 2), 'Mars/Olympus_Mons')
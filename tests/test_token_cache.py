@@ -0,0 +1,158 @@
+import threading
+
+import pytest
+
+import token_cache
+from store import JsonFileStore
+from token_cache import LEASE_SECONDS, REFRESH_MARGIN, TokenCache, cache_key
+
+pytest.importorskip('cryptography')
+
+NOW = 1_800_000_000.0
+KEY = cache_key('client', 'refresh-token')
+
+
+class Clock:
+    def __init__(self, now=NOW):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Refresher:
+    def __init__(self, clock, lifetime=3600):
+        self.clock = clock
+        self.lifetime = lifetime
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f"token-{self.calls}", self.clock.time() + self.lifetime
+
+
+def get_token(cache, refresh, **options):
+    return cache.get_token('client', 'refresh-token', 'secret', refresh, **options)
+
+
+@pytest.fixture(autouse=True)
+def derived_key(monkeypatch):
+    monkeypatch.delenv('TOKEN_CACHE_KEY', raising=False)
+
+
+def test_tokens_are_reused_until_shortly_before_they_expire():
+    clock = Clock()
+    refresh = Refresher(clock)
+    cache = TokenCache(clock=clock.time, sleep=clock.sleep)
+
+    assert get_token(cache, refresh) == ('token-1', NOW + 3600)
+    clock.now += 3600 - REFRESH_MARGIN - 1
+    assert get_token(cache, refresh)[0] == 'token-1'
+
+    clock.now += 2
+    assert get_token(cache, refresh)[0] == 'token-2'
+    assert get_token(cache, refresh, force=True)[0] == 'token-3'
+
+
+def test_concurrent_threads_refresh_once():
+    clock = Clock()
+    refresh = Refresher(clock)
+    cache = TokenCache(clock=clock.time, sleep=clock.sleep)
+    barrier = threading.Barrier(8)
+    tokens = []
+
+    def worker():
+        barrier.wait()
+        tokens.append(get_token(cache, refresh)[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert refresh.calls == 1
+    assert tokens == ['token-1'] * 8
+
+
+def test_shared_store_holds_tokens_encrypted_for_other_containers(tmp_path):
+    clock = Clock()
+    refresh = Refresher(clock)
+    store = JsonFileStore(str(tmp_path))
+
+    get_token(TokenCache(store, clock=clock.time, sleep=clock.sleep), refresh)
+    assert get_token(TokenCache(store, clock=clock.time, sleep=clock.sleep), refresh)[0] == 'token-1'
+    assert refresh.calls == 1
+
+    document = store.get(KEY)
+    assert set(document) == {'ciphertext'}
+    assert 'token-1' not in document['ciphertext']
+    assert not any('refresh-token' in path.name or 'token-1' in path.read_text() for path in tmp_path.iterdir())
+
+
+def test_tokens_written_with_another_key_are_a_miss(tmp_path, monkeypatch):
+    clock = Clock()
+    refresh = Refresher(clock)
+    store = JsonFileStore(str(tmp_path))
+    get_token(TokenCache(store, clock=clock.time, sleep=clock.sleep), refresh)
+
+    monkeypatch.setenv('TOKEN_CACHE_KEY', 'kYk8KHRxIbZtTlPVFVrZ1Qe5ne2y5H7Q1rGZJcSjmO0=')
+    assert get_token(TokenCache(store, clock=clock.time, sleep=clock.sleep), refresh)[0] == 'token-2'
+
+
+def test_waiting_for_another_containers_lease_uses_its_token(tmp_path):
+    clock = Clock()
+    store = JsonFileStore(str(tmp_path))
+    holder = TokenCache(store, clock=clock.time, sleep=clock.sleep)
+    store.add(f"{KEY}:lease", {'expires_at': NOW + LEASE_SECONDS})
+
+    def sleep(seconds):
+        clock.sleep(seconds)
+        if len(clock.sleeps) == 3:
+            # The lease holder finishes its refresh
+            store.delete(f"{KEY}:lease")
+            get_token(holder, Refresher(clock))
+
+    refresh = Refresher(clock)
+    assert get_token(TokenCache(store, clock=clock.time, sleep=sleep), refresh)[0] == 'token-1'
+    assert refresh.calls == 0
+
+
+def test_expired_lease_is_taken_over_and_released(tmp_path):
+    clock = Clock()
+    store = JsonFileStore(str(tmp_path))
+    store.add(f"{KEY}:lease", {'expires_at': NOW - 1})
+    refresh = Refresher(clock)
+
+    assert get_token(TokenCache(store, clock=clock.time, sleep=clock.sleep), refresh)[0] == 'token-1'
+    assert refresh.calls == 1
+    assert clock.sleeps == []
+    assert store.get(f"{KEY}:lease") is None
+
+
+def test_waiter_refreshes_itself_when_the_lease_holder_never_delivers(tmp_path):
+    clock = Clock()
+    store = JsonFileStore(str(tmp_path))
+    store.add(f"{KEY}:lease", {'expires_at': NOW + LEASE_SECONDS})
+    refresh = Refresher(clock)
+
+    assert get_token(TokenCache(store, clock=clock.time, sleep=clock.sleep), refresh)[0] == 'token-1'
+    assert refresh.calls == 1
+    assert sum(clock.sleeps) == pytest.approx(LEASE_SECONDS)
+
+
+def test_without_cryptography_tokens_stay_in_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(token_cache.TokenCipher, 'create', classmethod(lambda cls, secret: None))
+    clock = Clock()
+    refresh = Refresher(clock)
+    store = JsonFileStore(str(tmp_path))
+
+    get_token(TokenCache(store, clock=clock.time, sleep=clock.sleep), refresh)
+
+    assert store.get(KEY) is None
+    assert get_token(TokenCache(store, clock=clock.time, sleep=clock.sleep), refresh)[0] == 'token-2'
@@ -0,0 +1,84 @@
+import random
+import threading
+
+from store import DynamoDBStore, JsonFileStore
+from webhooks import WebhookDebouncer
+
+
+def ping(number, state='exists'):
+    return {'channel_id': 'channel-1', 'resource_id': 'resource-1', 'resource_state': state,
+            'message_number': number, 'channel_token': 'alice'}
+
+
+def test_concurrent_burst_syncs_once(tmp_path):
+    store = JsonFileStore(str(tmp_path))
+    debouncer = WebhookDebouncer(store, window=0.3)
+    debouncer.should_sync(ping(1, 'sync'))
+
+    numbers = list(range(2, 32))
+    random.Random(7).shuffle(numbers)
+    results = {}
+    start = threading.Barrier(len(numbers))
+
+    def send(number):
+        start.wait()
+        results[number] = debouncer.should_sync(ping(number))
+
+    threads = [threading.Thread(target=send, args=(number,)) for number in numbers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    synced = [number for number, (sync, _) in results.items() if sync]
+    assert synced == [31]
+    assert store.get('webhook:channel-1') == {'latest_message': 31}
+
+
+def test_redelivered_and_older_messages_are_dropped(tmp_path):
+    debouncer = WebhookDebouncer(JsonFileStore(str(tmp_path)), window=0)
+
+    assert debouncer.should_sync(ping(1, 'sync')) == (False, 'sync')
+    assert debouncer.should_sync(ping(3)) == (True, 'changed')
+    assert debouncer.should_sync(ping(3)) == (False, 'duplicate')
+    assert debouncer.should_sync(ping(2)) == (False, 'duplicate')
+    assert debouncer.should_sync(ping(4)) == (True, 'changed')
+
+
+class FakeDynamoDBClient:
+    """
+    put_item with the one condition DynamoDBStore.advance uses, evaluated under a lock like DynamoDB does
+    """
+
+    class exceptions:
+        class ConditionalCheckFailedException(Exception):
+            pass
+
+    def __init__(self):
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None):
+        with self._lock:
+            stored = self.items.get(Item['id']['S'])
+            if ConditionExpression == 'attribute_not_exists(#field) OR #field < :value':
+                field = ExpressionAttributeNames['#field']
+                value = float(ExpressionAttributeValues[':value']['N'])
+                if stored is not None and field in stored and float(stored[field]['N']) >= value:
+                    raise self.exceptions.ConditionalCheckFailedException()
+            self.items[Item['id']['S']] = Item
+
+    def get_item(self, TableName, Key):
+        item = self.items.get(Key['id']['S'])
+        return {'Item': item} if item else {}
+
+
+def test_dynamodb_advance_is_a_conditional_put():
+    store = DynamoDBStore('table', client=FakeDynamoDBClient())
+
+    assert store.advance('webhook:c', {'latest_message': 5}, 'latest_message')
+    assert not store.advance('webhook:c', {'latest_message': 5}, 'latest_message')
+    assert not store.advance('webhook:c', {'latest_message': 4}, 'latest_message')
+    assert store.advance('webhook:c', {'latest_message': 6}, 'latest_message')
+    assert store.get('webhook:c') == {'latest_message': 6}